@@ -0,0 +1,135 @@
+# File Path: apps/prediction-service/batching.py
+import asyncio
+import time
+
+from inference import QueueFullError
+from metrics import Histogram
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-row predictions into one vectorized model call.
+
+    Rows wait at most max_wait_ms for company (or until max_batch_size rows are
+    queued), then the batch is priced on the inference executor and each waiting
+    request gets its own result back. At most one model call per executor worker
+    is in flight; while they run, new rows keep queueing, so batches grow with
+    load instead of piling up in the executor.
+
+    Each row is priced by the model bundle it was submitted with: the served
+    model, one of the segment models or the text-aware model, and across a hot
+    reload the version the row was promised. A batch usually holds several, so
+    it is split into one predict_rows call per bundle, each on its own executor
+    slot, and the batch_size histogram counts rows per call.
+    """
+
+    def __init__(self, executor, max_batch_size, max_wait_ms, max_queue):
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32, 64, 128, 256])
+        self.queue_delay_ms = Histogram([0.5, 1, 2, 5, 10, 25, 50, 100, 250, 1000])
+        self.rejected = 0
+        self._queue = None
+        self._slots = None
+        self._task = None
+        self._in_flight = set()
+
+    @property
+    def enabled(self):
+        return self.max_batch_size > 1
+
+    def start(self):
+        """Starts the collector task; must be called from the running event loop."""
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._slots = asyncio.Semaphore(self.executor.max_workers)
+        self._task = asyncio.get_running_loop().create_task(self._collect())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, *self._in_flight, return_exceptions=True)
+            self._task = None
+
+    async def submit(self, bundle, row):
+        """Queues one canonical feature dict for bundle and waits for its price."""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((bundle, row, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFullError(
+                f"Prediction batch queue is full ({self.max_queue} requests waiting)."
+            )
+        return await future
+
+    async def _collect(self):
+        while True:
+            # Wait for a free executor slot first; rows arriving meanwhile join the
+            # next batch rather than queueing behind it.
+            await self._slots.acquire()
+            batch = [await self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            dispatched_at = time.perf_counter()
+            for _, _, _, enqueued_at in batch:
+                self.queue_delay_ms.observe((dispatched_at - enqueued_at) * 1000)
+
+            by_bundle = {}
+            for bundle, row, future, _ in batch:
+                by_bundle.setdefault(bundle, []).append((row, future))
+            for i, (bundle, items) in enumerate(by_bundle.items()):
+                # The slot taken above covers the first bundle's call; every other
+                # bundle's call waits for a slot of its own.
+                if i > 0:
+                    await self._slots.acquire()
+                self.batch_sizes.observe(len(items))
+                task = asyncio.create_task(self._dispatch(bundle, items))
+                self._in_flight.add(task)
+                task.add_done_callback(self._dispatch_done)
+
+    def _dispatch_done(self, task):
+        self._in_flight.discard(task)
+        self._slots.release()
+
+    async def _dispatch(self, bundle, items):
+        rows = [row for row, _ in items]
+        try:
+            prices, errors = await self.executor.run(bundle.predict_rows, rows)
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), price, error in zip(items, prices, errors):
+            if future.done():  # The request was cancelled, e.g. the client went away.
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(price)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batches_in_flight": len(self._in_flight),
+            "rejected": self.rejected,
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_delay_ms": self.queue_delay_ms.snapshot(),
+        }
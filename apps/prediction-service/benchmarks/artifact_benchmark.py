@@ -0,0 +1,102 @@
+# File Path: apps/prediction-service/benchmarks/artifact_benchmark.py
+"""
+Compares cold-start load time and memory of the pickled joblib model with the
+compact memory-mapped artifact. Each loader runs in a fresh interpreter so import
+and page-cache effects are measured the way a new container would see them.
+
+Usage (from apps/prediction-service):
+    python benchmarks/artifact_benchmark.py [--model property_price_model.joblib]
+        [--columns model_columns.joblib] [--artifact model_artifact]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from bench_utils import SERVICE_DIR
+from model_artifact import artifact_size_bytes
+
+LOADER_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {service_dir!r})
+import numpy as np
+from process_stats import rss_bytes
+
+rss_start = rss_bytes()
+start = time.perf_counter()
+if {kind!r} == "joblib":
+    import joblib
+    model = joblib.load({model!r})
+    n_columns = len(joblib.load({columns!r}))
+else:
+    from model_artifact import load_artifact
+    model = load_artifact({artifact!r})
+    n_columns = len(model.columns)
+load_s = time.perf_counter() - start
+rss_loaded = rss_bytes()
+
+start = time.perf_counter()
+model.predict(np.zeros((1, n_columns)))
+first_predict_s = time.perf_counter() - start
+
+print(json.dumps({{
+    "load_s": load_s,
+    "first_predict_s": first_predict_s,
+    "rss_after_load_mb": rss_loaded / 1e6,
+    "rss_load_delta_mb": (rss_loaded - rss_start) / 1e6,
+    "rss_after_predict_mb": rss_bytes() / 1e6,
+}}))
+"""
+
+
+def measure(kind, args):
+    script = LOADER_SCRIPT.format(
+        service_dir=SERVICE_DIR,
+        kind=kind,
+        model=args.model,
+        columns=args.columns,
+        artifact=args.artifact,
+    )
+    output = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", script],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model", default="property_price_model.joblib")
+    parser.add_argument("--columns", default="model_columns.joblib")
+    parser.add_argument("--artifact", default="model_artifact")
+    args = parser.parse_args()
+
+    results = {
+        "joblib": {
+            **measure("joblib", args),
+            "size_mb": os.path.getsize(args.model) / 1e6,
+        },
+        "artifact": {
+            **measure("artifact", args),
+            "size_mb": artifact_size_bytes(args.artifact) / 1e6,
+        },
+    }
+
+    print(
+        f"{'':<10}{'size MB':>10}{'load s':>10}{'1st pred s':>12}"
+        f"{'RSS MB':>10}{'RSS +load':>11}{'RSS +pred':>11}"
+    )
+    for kind, r in results.items():
+        print(
+            f"{kind:<10}{r['size_mb']:>10.1f}{r['load_s']:>10.3f}{r['first_predict_s']:>12.3f}"
+            f"{r['rss_after_load_mb']:>10.1f}{r['rss_load_delta_mb']:>11.1f}"
+            f"{r['rss_after_predict_mb']:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
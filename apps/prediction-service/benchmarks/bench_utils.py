@@ -0,0 +1,60 @@
+# File Path: apps/prediction-service/benchmarks/bench_utils.py
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+# Benchmarks are run from anywhere as plain scripts; make the service modules importable.
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVICE_DIR not in sys.path:
+    sys.path.insert(0, SERVICE_DIR)
+
+
+def sample_rows(encoder, n, seed=42):
+    """Builds n random, fully known feature dicts from a FeatureEncoder's vocabularies."""
+    from feature_encoder import CATEGORICAL_FEATURES
+
+    rng = random.Random(seed)
+    vocabularies = {f: encoder.vocabulary(f) for f in CATEGORICAL_FEATURES}
+    return [
+        {
+            "area_sqft": float(rng.randint(300, 5000)),
+            "bedrooms": rng.randint(1, 5),
+            "bathrooms": rng.randint(1, 4),
+            **{f: rng.choice(values) for f, values in vocabularies.items()},
+        }
+        for _ in range(n)
+    ]
+
+
+def time_calls(fn, iterations, warmup=20):
+    """Calls fn repeatedly and returns the per-call latencies in milliseconds."""
+    for _ in range(warmup):
+        fn()
+    samples = np.empty(iterations)
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples[i] = (time.perf_counter() - start) * 1000
+    return samples
+
+
+def summarize(samples_ms):
+    """Returns the p50/p99/mean of a latency sample in milliseconds."""
+    return {
+        "p50_ms": float(np.percentile(samples_ms, 50)),
+        "p99_ms": float(np.percentile(samples_ms, 99)),
+        "mean_ms": float(np.mean(samples_ms)),
+    }
+
+
+def print_table(title, rows):
+    """Prints {label: summary} rows as a small aligned table."""
+    print(f"\n--- {title} ---")
+    print(f"{'':<28}{'p50 (ms)':>12}{'p99 (ms)':>12}{'mean (ms)':>12}")
+    for label, stats in rows.items():
+        print(
+            f"{label:<28}{stats['p50_ms']:>12.4f}{stats['p99_ms']:>12.4f}{stats['mean_ms']:>12.4f}"
+        )
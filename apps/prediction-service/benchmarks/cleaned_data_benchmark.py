@@ -0,0 +1,117 @@
+# File Path: apps/prediction-service/benchmarks/cleaned_data_benchmark.py
+"""
+Compares file size, load time and memory of the cleaned training data stored as
+CSV, Parquet and Feather (Arrow IPC). The cleaned data is repeated --scale times;
+each load runs in a fresh interpreter so the page cache is the only thing shared.
+
+Usage (from apps/prediction-service):
+    python benchmarks/cleaned_data_benchmark.py [--scale 100] [--repeats 3]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import pandas as pd
+
+from bench_utils import SERVICE_DIR
+
+sys.path.insert(0, os.path.join(SERVICE_DIR, "train"))
+from data_cleaner import OUTPUT_FORMATS, load_cleaned_data, write_cleaned
+
+LOADER_SCRIPT = """
+import json, os, sys, time
+sys.path.insert(0, {train_dir!r})
+import pandas as pd
+import data_cleaner
+from process_stats import rss_bytes
+
+os.chdir({directory!r})
+rss_start = rss_bytes()
+start = time.perf_counter()
+if {plain_csv!r}:
+    df = pd.read_csv("properties_cleaned.csv")
+else:
+    df = data_cleaner.load_cleaned_data()
+load_s = time.perf_counter() - start
+print(json.dumps({{
+    "load_s": load_s,
+    "rss_delta_mb": (rss_bytes() - rss_start) / 1e6,
+    "rows": len(df),
+}}))
+"""
+
+
+def measure(directory, plain_csv=False):
+    script = LOADER_SCRIPT.format(
+        train_dir=os.path.join(SERVICE_DIR, "train"),
+        directory=directory,
+        plain_csv=plain_csv,
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def best_of(repeats, directory, plain_csv=False):
+    runs = [measure(directory, plain_csv) for _ in range(repeats)]
+    return min(runs, key=lambda run: run["load_s"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--input", default="train/properties_cleaned.csv")
+    parser.add_argument("--scale", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    cleaned = pd.read_csv(args.input)
+    scaled = pd.concat([cleaned] * args.scale, ignore_index=True)
+    for column in ("location", "listing_type", "property_type"):
+        scaled[column] = scaled[column].astype("category")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt, extension in OUTPUT_FORMATS.items():
+            # One format per directory, so load_cleaned_data has only that to pick.
+            directory = os.path.join(tmp, fmt)
+            os.makedirs(directory)
+            path = os.path.join(directory, "properties_cleaned" + extension)
+            write_cleaned(scaled, path)
+            size_mb = os.path.getsize(path) / 1e6
+            if fmt == "csv":
+                results["csv, plain pd.read_csv"] = {
+                    **best_of(args.repeats, directory, plain_csv=True),
+                    "size_mb": size_mb,
+                }
+            results[f"{fmt}, load_cleaned_data"] = {
+                **best_of(args.repeats, directory),
+                "size_mb": size_mb,
+            }
+            # Sanity check: every format must round-trip to the same frame.
+            cwd = os.getcwd()
+            os.chdir(directory)
+            try:
+                loaded = load_cleaned_data()
+            finally:
+                os.chdir(cwd)
+            if fmt == "csv":
+                expected = loaded
+            else:
+                pd.testing.assert_frame_equal(loaded, expected)
+
+    print(f"\n--- Loading {len(scaled)} cleaned rows ({args.scale}x) ---")
+    print(f"{'':<28}{'size (MB)':>11}{'load (s)':>10}{'RSS +MB':>10}")
+    for label, r in results.items():
+        print(
+            f"{label:<28}{r['size_mb']:>11.1f}{r['load_s']:>10.3f}"
+            f"{r['rss_delta_mb']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# File Path: apps/prediction-service/benchmarks/comparables_benchmark.py
+"""
+Query latency of the /comparables index as the cleaned data grows.
+
+The cleaned listings are repeated --scales times (1x, 10x and 100x by default),
+every copy after the first with its floor areas jittered by up to about +-10% so
+the index does not just hold duplicates. For each size it reports the time to
+build the index, single k-nearest query latency against it, the same query done
+by filtering and sorting the DataFrame (what a request would cost without the
+index), and the rate of incremental inserts in batches of --insert-batch rows.
+
+Usage (from apps/prediction-service):
+    python benchmarks/comparables_benchmark.py --data train/properties_cleaned.csv
+        [--scales 1 10 100] [--k 10] [--queries 2000]
+"""
+
+import argparse
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+
+from bench_utils import print_table, summarize, time_calls
+from comparables import (
+    AREA_LOG_SCALE,
+    PARTITION_COLUMNS,
+    ComparablesIndex,
+    read_listings,
+)
+
+
+def scaled(df, scale, seed=42):
+    rng = np.random.default_rng(seed)
+    copies = [df]
+    for _ in range(scale - 1):
+        copy = df.copy()
+        copy["area_sqft"] = copy["area_sqft"] * np.exp(rng.normal(0, 0.05, len(df)))
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+def brute_force(df, query, k):
+    """The k nearest listings by filtering the whole DataFrame, for comparison."""
+    match = df[
+        (df["location"] == query["location"])
+        & (df["listing_type"] == query["listing_type"])
+        & (df["property_type"] == query["property_type"])
+    ]
+    distances = np.sqrt(
+        (np.log(match["area_sqft"] / query["area_sqft"]) / AREA_LOG_SCALE) ** 2
+        + (match["bedrooms"] - query["bedrooms"]) ** 2
+        + (match["bathrooms"] - query["bathrooms"]) ** 2
+    )
+    return match.iloc[np.argsort(distances.to_numpy())[:k]]
+
+
+def sample_queries(df, n, seed=42):
+    """Properties like the listings (so their partition exists), resized a little."""
+    rng = np.random.default_rng(seed)
+    rows = df.iloc[rng.integers(0, len(df), n)]
+    return [
+        {
+            "location": row.location,
+            "listing_type": row.listing_type,
+            "property_type": row.property_type,
+            "area_sqft": float(row.area_sqft * np.exp(rng.normal(0, 0.1))),
+            "bedrooms": int(row.bedrooms),
+            "bathrooms": int(row.bathrooms),
+        }
+        for row in rows.itertuples()
+    ]
+
+
+def measure(df, queries, args):
+    start = time.perf_counter()
+    index = ComparablesIndex.from_frame(df)
+    build_seconds = time.perf_counter() - start
+    stats = index.stats()
+
+    calls = itertools.count()
+
+    def query_index():
+        index.query(**queries[next(calls) % len(queries)], k=args.k)
+
+    latency = summarize(time_calls(query_index, args.queries))
+    brute = summarize(
+        time_calls(
+            lambda: brute_force(df, queries[next(calls) % len(queries)], args.k),
+            max(args.queries // 20, 20),
+            warmup=5,
+        )
+    )
+
+    # Inserts land in the same partitions as the existing rows, as new scrapes do.
+    batches = [
+        df.iloc[start : start + args.insert_batch]
+        for start in range(0, min(len(df), args.inserts), args.insert_batch)
+    ]
+    start = time.perf_counter()
+    for batch in batches:
+        index.insert(batch)
+    insert_seconds = time.perf_counter() - start
+    inserted = sum(len(batch) for batch in batches)
+
+    # Queries right after the inserts also scan the rows not yet in a tree.
+    after_inserts = summarize(time_calls(query_index, args.queries))
+    return {
+        "build_seconds": build_seconds,
+        "query": latency,
+        "brute_force": brute,
+        "insert_rows_per_second": inserted / insert_seconds,
+        "query_after_inserts": after_inserts,
+        "stats": stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--data", default="properties_cleaned.csv")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--inserts", type=int, default=10000)
+    parser.add_argument("--insert-batch", type=int, default=100)
+    args = parser.parse_args()
+
+    base = read_listings(args.data)
+    base = base.dropna(subset=list(base.columns)).reset_index(drop=True)
+    for column in PARTITION_COLUMNS:
+        base[column] = base[column].astype(str)
+    queries = sample_queries(base, 1000)
+
+    results = {}
+    for scale in args.scales:
+        df = scaled(base, scale)
+        result = measure(df, queries, args)
+        stats = result["stats"]
+        print(
+            f"\n{scale}x: {len(df)} listings in {stats['partitions']} partitions "
+            f"(largest {stats['largest_partition']}); index built in "
+            f"{result['build_seconds']:.3f}s; {result['insert_rows_per_second']:.0f} "
+            f"rows/s inserted in batches of {args.insert_batch}."
+        )
+        results[f"{scale}x index"] = result["query"]
+        results[f"{scale}x index after inserts"] = result["query_after_inserts"]
+        results[f"{scale}x DataFrame scan"] = result["brute_force"]
+
+    print_table(f"k={args.k} nearest comparables, one query at a time", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# File Path: apps/prediction-service/benchmarks/data_cleaner_benchmark.py
+"""
+Compares the original row-wise data_cleaner (Series.apply with re per row) with
+the vectorized one on the rent/sale scrapes repeated --scale times, then the
+memory use of whole-file and streaming (--stream) ingestion of the same files.
+
+Usage (from apps/prediction-service):
+    python benchmarks/data_cleaner_benchmark.py [--scale 100] [--chunksize 100000]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from bench_utils import SERVICE_DIR
+
+sys.path.insert(0, os.path.join(SERVICE_DIR, "train"))
+from data_cleaner import clean_dataframe
+
+# Each ingestion mode runs in a fresh interpreter so its peak RSS is its own.
+INGEST_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {train_dir!r})
+import data_cleaner
+from process_stats import peak_rss_bytes
+
+start = time.perf_counter()
+if {chunksize!r}:
+    rows_read, _ = data_cleaner.clean_streaming({paths!r}, {output!r}, {chunksize!r})
+else:
+    rows_read, _ = data_cleaner.clean_in_memory({paths!r}, {output!r})
+print(json.dumps({{
+    "seconds": time.perf_counter() - start,
+    "rows": rows_read,
+    "peak_rss_mb": peak_rss_bytes() / 1e6,
+}}))
+"""
+
+
+# --- The original implementation, kept here as the reference ---
+def parse_price(price_str):
+    if not isinstance(price_str, str):
+        return None
+    price_numeric_str = re.sub(r"[^\d.]", "", price_str.split("/")[0])
+    if price_numeric_str:
+        return float(price_numeric_str)
+    return None
+
+
+def parse_size(size_str):
+    if not isinstance(size_str, str):
+        return None
+    match = re.search(r"([\d,]+)", size_str)
+    if match:
+        return float(match.group(1).replace(",", ""))
+    return None
+
+
+def legacy_clean_dataframe(df, listing_type):
+    df["listing_type"] = listing_type
+    df["price_cleaned"] = df["price"].apply(parse_price)
+    df["size_sqft_cleaned"] = df["size"].apply(parse_size)
+    df["bedrooms_cleaned"] = df["bedrooms"].replace("Studio", 1)
+    df["bedrooms_cleaned"] = pd.to_numeric(df["bedrooms_cleaned"], errors="coerce")
+    df["bathrooms_cleaned"] = pd.to_numeric(df["bathrooms"], errors="coerce")
+    df["location_primary"] = df["location"].str.split(",").str[0].str.strip()
+    df_final = df[
+        [
+            "price_cleaned",
+            "size_sqft_cleaned",
+            "bedrooms_cleaned",
+            "bathrooms_cleaned",
+            "location_primary",
+            "listing_type",
+            "property_type",
+        ]
+    ].copy()
+    df_final.columns = [
+        "price",
+        "area_sqft",
+        "bedrooms",
+        "bathrooms",
+        "location",
+        "listing_type",
+        "property_type",
+    ]
+    df_final.dropna(inplace=True)
+    return df_final
+
+
+def run(clean, paths):
+    """Reads, cleans and serializes both scrapes; returns (timings, CSV digest, rows)."""
+    timings = {}
+    start = time.perf_counter()
+    frames = {name: pd.read_csv(path) for name, path in paths.items()}
+    timings["read"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cleaned = [clean(df, name) for name, df in frames.items()]
+    timings["clean"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    csv_text = pd.concat(cleaned, ignore_index=True).to_csv(index=False)
+    timings["write"] = time.perf_counter() - start
+    digest = hashlib.md5(csv_text.encode()).hexdigest()
+    return timings, digest, sum(len(df) for df in frames.values())
+
+
+def measure_ingest(paths, output, chunksize):
+    script = INGEST_SCRIPT.format(
+        train_dir=os.path.join(SERVICE_DIR, "train"),
+        paths=paths,
+        output=output,
+        chunksize=chunksize,
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], check=True, capture_output=True, text=True
+    )
+    with open(output, "rb") as f:
+        digest = hashlib.md5(f.read()).hexdigest()
+    return json.loads(result.stdout.strip().splitlines()[-1]), digest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rent", default="train/dataset_for_rent.csv")
+    parser.add_argument("--sale", default="train/dataset_for_sale.csv")
+    parser.add_argument("--scale", type=int, default=100)
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {}
+        for name, path in (("rent", args.rent), ("sale", args.sale)):
+            scaled = pd.concat([pd.read_csv(path)] * args.scale, ignore_index=True)
+            paths[name] = os.path.join(tmp, f"{name}.csv")
+            scaled.to_csv(paths[name], index=False)
+
+        results = {}
+        for label, clean in (
+            ("row-wise apply", legacy_clean_dataframe),
+            ("vectorized", clean_dataframe),
+        ):
+            results[label] = run(clean, paths)
+
+        ingest = {
+            "whole file": measure_ingest(paths, os.path.join(tmp, "whole.csv"), None),
+            f"--stream ({args.chunksize} rows)": measure_ingest(
+                paths, os.path.join(tmp, "stream.csv"), args.chunksize
+            ),
+        }
+        input_mb = sum(os.path.getsize(path) for path in paths.values()) / 1e6
+
+    digests = {digest for _, digest, _ in results.values()}
+    assert len(digests) == 1, "The vectorized cleaner's CSV output differs"
+
+    n_rows = next(iter(results.values()))[2]
+    print(f"\n--- Cleaning {n_rows} raw rows ({args.scale}x the scrapes) ---")
+    print(f"{'':<18}{'read (s)':>10}{'clean (s)':>11}{'write (s)':>11}{'rows/s':>14}")
+    for label, (timings, _, _) in results.items():
+        print(
+            f"{label:<18}{timings['read']:>10.2f}{timings['clean']:>11.2f}"
+            f"{timings['write']:>11.2f}{n_rows / timings['clean']:>14,.0f}"
+        )
+    legacy, vectorized = (results[label][0]["clean"] for label in results)
+    print(f"Cleaning speedup: {legacy / vectorized:.1f}x (identical CSV output).")
+
+    assert len({digest for _, digest in ingest.values()}) == 1, "Streaming differs"
+    print(f"\n--- Ingesting {input_mb:.0f} MB of CSV end to end ---")
+    print(f"{'':<26}{'seconds':>10}{'rows/s':>14}{'peak RSS (MB)':>16}")
+    for label, (stats, _) in ingest.items():
+        print(
+            f"{label:<26}{stats['seconds']:>10.2f}"
+            f"{stats['rows'] / stats['seconds']:>14,.0f}{stats['peak_rss_mb']:>16.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# File Path: apps/prediction-service/benchmarks/encoder_benchmark.py
+"""
+Compares the pandas get_dummies/reindex encoding that /predict used to run per
+request with the precompiled FeatureEncoder.
+
+Usage (from apps/prediction-service):
+    python benchmarks/encoder_benchmark.py [--iterations 2000] [--batch-size 1000]
+"""
+
+import argparse
+
+import joblib
+import numpy as np
+import pandas as pd
+
+# bench_utils puts the service directory on sys.path, so import it first.
+from bench_utils import print_table, sample_rows, summarize, time_calls
+from feature_encoder import FeatureEncoder
+
+
+def pandas_encode(rows, model_columns):
+    """The original per-request encoding path from main.py."""
+    input_encoded = pd.get_dummies(pd.DataFrame(rows))
+    return input_encoded.reindex(columns=model_columns, fill_value=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--columns", default="model_columns.joblib")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    model_columns = joblib.load(args.columns)
+    encoder = FeatureEncoder(model_columns)
+    row = sample_rows(encoder, 1)
+    batch = sample_rows(encoder, args.batch_size)
+
+    # Sanity check: both paths must produce the same matrix.
+    expected = pandas_encode(batch, model_columns).to_numpy(dtype=float)
+    actual, _ = encoder.encode_batch(batch)
+    assert np.array_equal(expected, actual), "FeatureEncoder disagrees with pandas"
+
+    batch_iterations = max(args.iterations // 20, 10)
+    print_table(
+        f"Single row ({args.iterations} iterations)",
+        {
+            "pandas get_dummies/reindex": summarize(
+                time_calls(lambda: pandas_encode(row, model_columns), args.iterations)
+            ),
+            "FeatureEncoder.encode": summarize(
+                time_calls(lambda: encoder.encode(row[0]), args.iterations)
+            ),
+        },
+    )
+    print_table(
+        f"Batch of {args.batch_size} ({batch_iterations} iterations)",
+        {
+            "pandas get_dummies/reindex": summarize(
+                time_calls(
+                    lambda: pandas_encode(batch, model_columns), batch_iterations
+                )
+            ),
+            "FeatureEncoder.encode_batch": summarize(
+                time_calls(lambda: encoder.encode_batch(batch), batch_iterations)
+            ),
+        },
+    )
+
+
+if __name__ == "__main__":
+    main()
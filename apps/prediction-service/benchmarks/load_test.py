@@ -0,0 +1,102 @@
+# File Path: apps/prediction-service/benchmarks/load_test.py
+"""
+Drives concurrent /predict traffic at a running prediction service and reports
+latency percentiles, throughput and shed (503) requests per concurrency level.
+
+While the load runs, a probe calls GET / every 50 ms; its latency shows whether
+inference is blocking the event loop. Run it once against the old build and once
+against the new one to compare tail latency under concurrency.
+
+Usage (from apps/prediction-service, requires httpx):
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 \\
+        --concurrency 1 8 32 64 --requests 400
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+import joblib
+import numpy as np
+
+from bench_utils import sample_rows
+from feature_encoder import FeatureEncoder
+
+
+async def run_level(client, rows, concurrency, total_requests):
+    """Sends total_requests predictions with `concurrency` requests in flight."""
+    latencies = []
+    statuses = {}
+    probe_latencies = []
+    counter = iter(range(total_requests))
+    done = asyncio.Event()
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await client.post("/predict", json=rows[i % len(rows)])
+                status = response.status_code
+            except httpx.TransportError:
+                status = "connection error"
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    async def probe():
+        while not done.is_set():
+            start = time.perf_counter()
+            await client.get("/")
+            probe_latencies.append((time.perf_counter() - start) * 1000)
+            await asyncio.sleep(0.05)
+
+    probe_task = asyncio.create_task(probe())
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await probe_task
+
+    latencies = np.array(latencies)
+    return {
+        "concurrency": concurrency,
+        "throughput_rps": total_requests / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "rejected_503": statuses.get(503, 0),
+        "connection_errors": statuses.get("connection error", 0),
+        "root_p99_ms": float(np.percentile(probe_latencies, 99)),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--columns", default="model_columns.joblib")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--requests", type=int, default=400)
+    args = parser.parse_args()
+
+    # Distinct rows so the prediction cache does not hide the model cost.
+    rows = sample_rows(FeatureEncoder(joblib.load(args.columns)), args.requests)
+    limits = httpx.Limits(max_connections=max(args.concurrency) + 1)
+    async with httpx.AsyncClient(
+        base_url=args.url, limits=limits, timeout=60
+    ) as client:
+        print(
+            f"{'conc':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+            f"{'503s':>8}{'conn err':>10}{'GET / p99':>12}"
+        )
+        for concurrency in args.concurrency:
+            r = await run_level(client, rows, concurrency, args.requests)
+            print(
+                f"{r['concurrency']:>6}{r['throughput_rps']:>10.1f}{r['p50_ms']:>10.2f}"
+                f"{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['rejected_503']:>8}"
+                f"{r['connection_errors']:>10}"
+                f"{r['root_p99_ms']:>12.2f}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,127 @@
+# File Path: apps/prediction-service/benchmarks/out_of_core_benchmark.py
+"""
+Peak memory, wall time and accuracy of out-of-core training against train.py's.
+
+For each of --scales, the bundled rent/sale scrapes are repeated that many times
+in a scratch directory and cleaned into properties_cleaned.csv. Then, each in a
+fresh interpreter so its peak RSS is its own, train.train_and_evaluate (load the
+whole frame, fit the default models) and out_of_core.train_out_of_core (stream
+the file in --chunk-rows chunks) train on it. Both publish their best model in
+the scratch directory; the test R² and RMSE of each model are on actual prices.
+
+The two paths split train/test differently (train_test_split against a per-chunk
+draw), so compare accuracy across them model family by model family, not to the
+last digit. The repeated rows also appear on both sides of either split, which
+flatters the tree models at larger scales alike. The in-memory path is skipped
+above --max-in-memory-scale.
+
+Usage (from apps/prediction-service):
+    python benchmarks/out_of_core_benchmark.py [--scales 1 4 16]
+        [--chunk-rows 100000] [--max-sample-rows 1000000]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import pandas as pd
+
+from bench_utils import SERVICE_DIR
+from regression_benchmark import run_cleaner, timed, write_scaled_scrapes
+
+sys.path.insert(0, os.path.join(SERVICE_DIR, "train"))
+from out_of_core import DEFAULT_CHUNK_ROWS, DEFAULT_MAX_SAMPLE_ROWS
+
+# Runs in a fresh interpreter in the scratch directory; the training output goes
+# to stderr so the last line of stdout is the measurement.
+TRAINING_SCRIPT = """
+import contextlib, json, sys, time
+sys.path.insert(0, {train_dir!r})
+import train, out_of_core
+from process_stats import peak_rss_bytes
+start = time.perf_counter()
+with contextlib.redirect_stdout(sys.stderr):
+    results = {call}
+seconds = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": seconds,
+    "peak_rss_bytes": peak_rss_bytes(),
+    "results": {{name: {{k: float(v) for k, v in r.items()}} for name, r in results.items()}},
+}}))
+"""
+
+
+def measure_training(call, verbose):
+    script = TRAINING_SCRIPT.format(
+        train_dir=os.path.join(SERVICE_DIR, "train"), call=call
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=None if verbose else subprocess.DEVNULL,
+        text=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--max-sample-rows", type=int, default=DEFAULT_MAX_SAMPLE_ROWS)
+    parser.add_argument("--max-in-memory-scale", type=int, default=16)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    runs = {}
+    models = {}
+    cwd = os.getcwd()
+    for scale in args.scales:
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            try:
+                write_scaled_scrapes(workdir, scale)
+                clean_seconds = timed(run_cleaner, args.verbose)
+                with open("properties_cleaned.csv") as f:
+                    rows = sum(1 for _ in f) - 1
+                size_mb = os.path.getsize("properties_cleaned.csv") / 1e6
+                print(
+                    f"\n{scale}x: {rows} cleaned rows ({size_mb:.0f} MB CSV), "
+                    f"cleaned in {clean_seconds:.1f}s."
+                )
+                calls = {
+                    "out of core": (
+                        f"out_of_core.train_out_of_core(chunk_rows={args.chunk_rows}, "
+                        f"max_sample_rows={args.max_sample_rows})"
+                    )
+                }
+                if scale <= args.max_in_memory_scale:
+                    calls["in memory"] = "train.train_and_evaluate()"
+                for path, call in calls.items():
+                    run = measure_training(call, args.verbose)
+                    runs[(scale, path)] = {
+                        "rows": rows,
+                        "wall s": run["seconds"],
+                        "peak RSS MB": run["peak_rss_bytes"] / 1e6,
+                    }
+                    for name, result in run["results"].items():
+                        models[(scale, path, name)] = {
+                            "R²": result["R²"],
+                            "RMSE": result["RMSE"],
+                            "fit s": result["Time (s)"],
+                        }
+            finally:
+                os.chdir(cwd)
+
+    print("\n--- Training runs ---")
+    print(pd.DataFrame(runs).T.to_string(float_format="{:.1f}".format))
+    print("\n--- Test accuracy per model ---")
+    print(pd.DataFrame(models).T.to_string(float_format="{:.4g}".format))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# File Path: apps/prediction-service/benchmarks/prefork_benchmark.py
+"""
+Memory and throughput of serve.py's pre-forked workers against the alternatives.
+
+Starts, one after another, a single uvicorn process, `uvicorn --workers N` (N fresh
+interpreters, each loading its own models) and `serve.py --workers N` (models loaded
+once, workers forked from that process), all serving the models in --model-dir.
+Each is driven with the same concurrent /predict load (see load_test.py), then the
+RSS, PSS and private memory of every process in its tree is read from
+/proc/<pid>/smaps_rollup. PSS splits shared pages between the processes mapping
+them, so the PSS total is what the deployment really costs. The prediction cache
+is disabled so every request reaches the model.
+
+Usage (from apps/prediction-service, requires httpx):
+    python benchmarks/prefork_benchmark.py --model-dir . [--workers 4]
+        [--concurrency 32] [--requests 2000]
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+import joblib
+
+from bench_utils import SERVICE_DIR, sample_rows
+from feature_encoder import FeatureEncoder
+from load_test import run_level
+from process_stats import memory_breakdown
+from serve import available_cpus
+
+
+def process_tree(pid):
+    """pid and all of its descendants."""
+    pids = [pid]
+    for parent in pids:
+        try:
+            with open(f"/proc/{parent}/task/{parent}/children") as f:
+                pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            continue
+    return pids
+
+
+def is_helper(pid):
+    """multiprocessing's resource tracker, which uvicorn --workers also starts."""
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return b"resource_tracker" in f.read()
+    except OSError:
+        return False
+
+
+def wait_until_ready(url, process, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}.")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not come up within {timeout}s.")
+
+
+async def drive(url, rows, concurrency, requests):
+    limits = httpx.Limits(max_connections=concurrency + 1)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        await run_level(client, rows, concurrency, min(requests, 200))  # Warm-up.
+        return await run_level(client, rows, concurrency, requests)
+
+
+def measure(label, command, args, rows):
+    url = f"http://127.0.0.1:{args.port}"
+    env = {**os.environ, "PREDICTION_CACHE_MAX_ENTRIES": "0"}
+    process = subprocess.Popen(
+        command,
+        cwd=args.model_dir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready(url, process)
+        load = asyncio.run(drive(url, rows, args.concurrency, args.requests))
+        pids = process_tree(process.pid)
+        # The first process is the supervisor (or the only server); the rest serve.
+        servers = [pid for pid in pids[1:] if not is_helper(pid)] or pids
+        memory = {pid: memory_breakdown(pid) for pid in pids}
+    finally:
+        process.terminate()
+        process.wait(timeout=60)
+    workers = [memory[pid] for pid in servers if memory[pid] is not None]
+    memory = [stats for stats in memory.values() if stats is not None]
+    return {
+        "label": label,
+        "processes": len(memory),
+        "rss_mb": sum(m["rss"] for m in memory) / 1e6,
+        "pss_mb": sum(m["pss"] for m in memory) / 1e6,
+        "worker_rss_mb": sum(m["rss"] for m in workers) / len(workers) / 1e6,
+        "worker_private_mb": sum(m["private"] for m in workers) / len(workers) / 1e6,
+        **load,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model-dir", default=".")
+    parser.add_argument("--columns", default="model_columns.joblib")
+    parser.add_argument("--workers", type=int, default=available_cpus())
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+    args.model_dir = os.path.abspath(args.model_dir)
+
+    columns = joblib.load(os.path.join(args.model_dir, args.columns))
+    rows = sample_rows(FeatureEncoder(columns), args.requests)
+    uvicorn = [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", SERVICE_DIR]
+    port = ["--port", str(args.port), "--log-level", "warning"]
+    modes = [
+        ("single process", uvicorn + port),
+        (
+            f"uvicorn --workers {args.workers}",
+            uvicorn + port + ["--workers", str(args.workers)],
+        ),
+        (
+            f"serve.py --workers {args.workers}",
+            [sys.executable, os.path.join(SERVICE_DIR, "serve.py")]
+            + port
+            + ["--workers", str(args.workers)],
+        ),
+    ]
+    results = [measure(label, command, args, rows) for label, command in modes]
+
+    print(
+        f"\n--- {args.requests} /predict requests at concurrency {args.concurrency}, "
+        f"{available_cpus()} CPU(s) ---"
+    )
+    print(
+        f"{'':<24}{'procs':>6}{'RSS MB':>9}{'PSS MB':>9}{'worker RSS':>12}"
+        f"{'worker priv':>13}{'rps':>9}{'p50 ms':>9}{'p99 ms':>9}"
+    )
+    for r in results:
+        print(
+            f"{r['label']:<24}{r['processes']:>6}{r['rss_mb']:>9.0f}{r['pss_mb']:>9.0f}"
+            f"{r['worker_rss_mb']:>12.0f}{r['worker_private_mb']:>13.0f}"
+            f"{r['throughput_rps']:>9.0f}{r['p50_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+        )
+    single = results[0]["throughput_rps"]
+    for r in results[1:]:
+        print(f"{r['label']}: {r['throughput_rps'] / single:.2f}x single-process rps")
+
+
+if __name__ == "__main__":
+    main()
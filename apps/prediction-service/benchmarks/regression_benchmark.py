@@ -0,0 +1,261 @@
+# File Path: apps/prediction-service/benchmarks/regression_benchmark.py
+"""
+End-to-end benchmark of the service's hot paths, compared against a stored baseline.
+
+On the rent/sale scrapes repeated --scale times, in a scratch directory, it times:
+- data_cleaner.main (clean both scrapes into properties_cleaned.csv)
+- train.train_and_evaluate (fit the default models, publish the best one)
+- cold start: importing main and running its startup hooks in a fresh interpreter
+- single-row POST /predict latency through the ASGI app in-process (TestClient)
+- POST /predict/batch throughput, also in-process
+
+Results are written as JSON. With --baseline, each metric is compared with the
+stored run and the script exits with status 1 if any is worse by more than
+--tolerance, so a CI step can block a deploy on it. Refresh the baseline with
+--save-baseline after an intended change, on the machine the comparison runs on.
+The prediction cache is disabled so every request reaches the model.
+
+Usage (from apps/prediction-service):
+    python benchmarks/regression_benchmark.py [--scale 2] [--output results.json]
+        [--baseline benchmarks/baseline.json] [--tolerance 0.25] [--save-baseline]
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from bench_utils import SERVICE_DIR, sample_rows, summarize, time_calls
+
+sys.path.insert(0, os.path.join(SERVICE_DIR, "train"))
+import data_cleaner
+import train
+
+# Every metric and whether a smaller value is better.
+METRICS = {
+    "clean_seconds": "lower",
+    "train_seconds": "lower",
+    "cold_start_import_seconds": "lower",
+    "cold_start_startup_seconds": "lower",
+    "predict_p50_ms": "lower",
+    "predict_p99_ms": "lower",
+    "batch_rows_per_second": "higher",
+}
+
+# Runs in a fresh interpreter in the scratch directory, so nothing is imported or
+# loaded yet; startup covers the @app.on_event("startup") hooks (model loading).
+COLD_START_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {service_dir!r})
+start = time.perf_counter()
+import main
+from fastapi.testclient import TestClient
+imported = time.perf_counter()
+with TestClient(main.app):
+    started = time.perf_counter()
+print(json.dumps({{"import": imported - start, "startup": started - imported}}))
+"""
+
+
+def write_scaled_scrapes(directory, scale):
+    """Writes the bundled scrapes, repeated scale times, where data_cleaner reads them."""
+    rows = 0
+    for name, filename in data_cleaner.INPUT_FILES.items():
+        scrape = pd.read_csv(os.path.join(SERVICE_DIR, "train", filename))
+        scaled = pd.concat([scrape] * scale, ignore_index=True)
+        scaled.to_csv(os.path.join(directory, filename), index=False)
+        rows += len(scaled)
+    return rows
+
+
+def timed(fn, verbose):
+    """Runs fn() and returns its wall time; its output is hidden unless verbose."""
+    output = sys.stdout if verbose else io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        fn()
+    return time.perf_counter() - start
+
+
+def run_cleaner():
+    argv = sys.argv
+    sys.argv = ["data_cleaner.py"]
+    try:
+        data_cleaner.main()
+    finally:
+        sys.argv = argv
+
+
+def measure_cold_start(repeats):
+    """Median import and startup time over repeats fresh interpreters."""
+    script = COLD_START_SCRIPT.format(service_dir=SERVICE_DIR)
+    runs = []
+    for _ in range(repeats):
+        result = subprocess.run(
+            [sys.executable, "-c", script], check=True, capture_output=True, text=True
+        )
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    return (
+        float(np.median([run["import"] for run in runs])),
+        float(np.median([run["startup"] for run in runs])),
+    )
+
+
+def measure_serving(iterations, batch_size):
+    """Single-row latency and batch throughput through the in-process ASGI app."""
+    import main
+    from fastapi.testclient import TestClient
+
+    with TestClient(main.app) as client:
+        bundle = main.model_registry.current
+        if bundle is None:
+            raise RuntimeError("Training did not produce a model to serve.")
+        rows = sample_rows(bundle.encoder, batch_size)
+        calls = itertools.count()
+
+        def predict_one():
+            response = client.post("/predict", json=rows[next(calls) % len(rows)])
+            response.raise_for_status()
+
+        latency = summarize(time_calls(predict_one, iterations))
+
+        def predict_batch():
+            response = client.post("/predict/batch", json=rows)
+            response.raise_for_status()
+
+        batch_ms = time_calls(predict_batch, max(iterations // 100, 5), warmup=2)
+    return latency, batch_size / (float(np.median(batch_ms)) / 1000)
+
+
+def compare(results, baseline, tolerance):
+    """Returns {metric: (baseline, current, relative change, regressed)}."""
+    comparison = {}
+    for metric, better in METRICS.items():
+        if metric not in baseline or metric not in results:
+            continue
+        before, after = baseline[metric], results[metric]
+        change = (after - before) / before if before else 0.0
+        worse = change > tolerance if better == "lower" else change < -tolerance
+        comparison[metric] = (before, after, change, worse)
+    return comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", type=int, default=2)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--cold-starts", type=int, default=3)
+    parser.add_argument("--output", help="write the results JSON here")
+    parser.add_argument(
+        "--baseline",
+        default=os.path.join(SERVICE_DIR, "benchmarks", "baseline.json"),
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="allowed relative slowdown before a metric counts as a regression",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="store this run as the new baseline instead of comparing",
+    )
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    # main reads its configuration at import time; its model paths are relative
+    # to the scratch directory.
+    os.environ["PREDICTION_CACHE_MAX_ENTRIES"] = "0"
+
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            raw_rows = write_scaled_scrapes(workdir, args.scale)
+            results["clean_seconds"] = timed(run_cleaner, args.verbose)
+            results["train_seconds"] = timed(train.train_and_evaluate, args.verbose)
+            (
+                results["cold_start_import_seconds"],
+                results["cold_start_startup_seconds"],
+            ) = measure_cold_start(args.cold_starts)
+            with contextlib.redirect_stdout(
+                sys.stdout if args.verbose else io.StringIO()
+            ):
+                latency, throughput = measure_serving(args.iterations, args.batch_size)
+            results["predict_p50_ms"] = latency["p50_ms"]
+            results["predict_p99_ms"] = latency["p99_ms"]
+            results["batch_rows_per_second"] = throughput
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        "config": {
+            "scale": args.scale,
+            "raw_rows": raw_rows,
+            "iterations": args.iterations,
+            "batch_size": args.batch_size,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "results": results,
+    }
+
+    print(f"\n--- {raw_rows} raw rows ({args.scale}x the scrapes) ---")
+    for metric, value in results.items():
+        print(f"{metric:<30}{value:>14.4f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to '{args.output}'.")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"Baseline saved to '{args.baseline}'.")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at '{args.baseline}'; run with --save-baseline first.")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline["config"] != report["config"]:
+        print(f"Warning: the baseline was recorded with {baseline['config']}.")
+
+    comparison = compare(results, baseline["results"], args.tolerance)
+    print(f"\n--- Against the baseline of {baseline['timestamp']} ---")
+    print(f"{'':<30}{'baseline':>14}{'current':>14}{'change':>10}")
+    for metric, (before, after, change, worse) in comparison.items():
+        flag = "  REGRESSION" if worse else ""
+        print(f"{metric:<30}{before:>14.4f}{after:>14.4f}{change:>+10.1%}{flag}")
+    regressions = [metric for metric, (*_, worse) in comparison.items() if worse]
+    if regressions:
+        print(
+            f"{len(regressions)} metric(s) regressed by more than "
+            f"{args.tolerance:.0%}: {', '.join(regressions)}"
+        )
+        sys.exit(1)
+    print(f"No regressions beyond {args.tolerance:.0%}.")
+
+
+if __name__ == "__main__":
+    main()
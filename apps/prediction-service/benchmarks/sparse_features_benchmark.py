@@ -0,0 +1,140 @@
+# File Path: apps/prediction-service/benchmarks/sparse_features_benchmark.py
+"""
+Compares train.py's old dense pd.get_dummies(dtype=int) features with the sparse
+CSR path (feature_matrix.encode_features + model_input): matrix size, peak memory
+traced while encoding, splitting and fitting, and the fit time of every model.
+Runs on the cleaned data as is and with each location split into --factor
+random synthetic sub-locations (small locations cannot fill all of theirs, so the
+observed cardinality grows somewhat less than --factor times).
+
+Usage (from apps/prediction-service):
+    python benchmarks/sparse_features_benchmark.py [--factor 50]
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import r2_score
+from sklearn.model_selection import train_test_split
+
+from bench_utils import SERVICE_DIR
+
+sys.path.insert(0, os.path.join(SERVICE_DIR, "train"))
+from data_cleaner import read_cleaned
+from feature_matrix import (
+    CATEGORICAL_FEATURES,
+    encode_features,
+    matrix_nbytes,
+    model_input,
+)
+from train import default_models
+
+
+def dense_features(df):
+    """The original train.py encoding."""
+    X = pd.get_dummies(df, columns=CATEGORICAL_FEATURES, dtype=int).drop(
+        columns="price"
+    )
+    return X, X.to_numpy().nbytes
+
+
+def sparse_features(df):
+    X, _ = encode_features(df)
+    return X, matrix_nbytes(X)
+
+
+def run(df, encode, to_model_input):
+    """Encodes, splits and fits every model; returns timings, memory and test R²."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    X, matrix_bytes = encode(df)
+    y = np.log1p(df["price"].to_numpy())
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42
+    )
+    prepare_s = time.perf_counter() - start
+
+    fit_s = {}
+    r2 = {}
+    for name, model in default_models().items():
+        if "n_jobs" in model.get_params():
+            model.set_params(n_jobs=1)  # Time the fit itself, not the core count.
+        start = time.perf_counter()
+        model.fit(to_model_input(model, X_train), y_train)
+        fit_s[name] = time.perf_counter() - start
+        r2[name] = r2_score(y_test, model.predict(to_model_input(model, X_test)))
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "matrix_mb": matrix_bytes / 1e6,
+        "peak_mb": peak_bytes / 1e6,
+        "prepare_s": prepare_s,
+        "fit_s": fit_s,
+        "r2": r2,
+    }
+
+
+def with_location_factor(df, factor, seed=42):
+    """Splits every location into `factor` random sub-locations."""
+    if factor == 1:
+        return df
+    suffix = np.random.default_rng(seed).integers(0, factor, len(df))
+    location = (
+        df["location"].astype(str)
+        + " #"
+        + pd.Series(suffix, index=df.index).astype(str)
+    )
+    return df.assign(location=location.astype("category"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--input", default="train/properties_cleaned.csv")
+    parser.add_argument("--factor", type=int, default=50)
+    args = parser.parse_args()
+
+    df = read_cleaned(args.input)
+    # The same outlier filter train.py applies.
+    lower, upper = df["price"].quantile([0.01, 0.99])
+    df = df[df["price"].between(lower, upper)]
+    df = df.assign(
+        **{c: df[c].cat.remove_unused_categories() for c in CATEGORICAL_FEATURES}
+    )
+
+    for factor in (1, args.factor):
+        scaled = with_location_factor(df, factor)
+        n_locations = len(scaled["location"].cat.categories)
+        results = {
+            "dense int64 get_dummies": run(scaled, dense_features, lambda model, X: X),
+            "sparse CSR + model_input": run(scaled, sparse_features, model_input),
+        }
+
+        print(
+            f"\n--- {len(scaled)} rows, {n_locations} locations "
+            f"({factor}x the location cardinality) ---"
+        )
+        names = list(next(iter(results.values()))["fit_s"])
+        print(
+            f"{'':<26}{'matrix MB':>10}{'peak MB':>9}{'encode+split s':>16}"
+            + "".join(f"{name[:16]:>18}" for name in names)
+        )
+        for label, r in results.items():
+            print(
+                f"{label:<26}{r['matrix_mb']:>10.1f}{r['peak_mb']:>9.1f}"
+                f"{r['prepare_s']:>16.3f}"
+                + "".join(f"{r['fit_s'][name]:>17.3f}s" for name in names)
+            )
+        for label, r in results.items():
+            print(
+                f"Test R² (log price), {label}: "
+                + ", ".join(f"{name} {r['r2'][name]:.4f}" for name in names)
+            )
+
+
+if __name__ == "__main__":
+    main()
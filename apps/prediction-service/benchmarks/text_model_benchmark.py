@@ -0,0 +1,114 @@
+# File Path: apps/prediction-service/benchmarks/text_model_benchmark.py
+"""
+Per-request latency of both model families main.py serves: the tabular model
+behind /predict and the text-aware listing pipeline behind /predict/listing, the
+latter both as the sklearn Pipeline (DataFrame through ColumnTransformer) and as
+the precompiled TextModelBundle the service uses.
+
+Listings are sampled from a raw scrape, so descriptions and facilities have
+realistic lengths. Train the text model first with
+train/gemini_train_random_forest.py.
+
+Usage (from apps/prediction-service):
+    python benchmarks/text_model_benchmark.py [--text-model text_price_model.joblib]
+        [--listings train/dataset_for_rent.csv] [--iterations 1000]
+"""
+
+import argparse
+import itertools
+
+import joblib
+import numpy as np
+import pandas as pd
+
+# bench_utils puts the service directory on sys.path, so import it first.
+from bench_utils import print_table, sample_rows, summarize, time_calls
+from model_registry import load_bundle, load_text_bundle
+from text_features import engineer_features
+
+LISTING_FIELDS = [
+    "size",
+    "bedrooms",
+    "bathrooms",
+    "property_type",
+    "location",
+    "description",
+    "facilities",
+]
+
+
+def sample_listings(path, n, seed=42):
+    """n raw listing dicts (the /predict/listing payload) from a scrape CSV."""
+    scrape = pd.read_csv(path, usecols=LISTING_FIELDS)
+    scrape = scrape.sample(n, replace=len(scrape) < n, random_state=seed)
+    scrape = scrape.astype(object).where(scrape.notna(), None)
+    return scrape.to_dict("records")
+
+
+def pipeline_predict(pipeline, listings):
+    """Serving the pickled Pipeline directly: engineer, build a DataFrame, predict."""
+    frame = pd.DataFrame([engineer_features(listing) for listing in listings])
+    return np.round(pipeline.predict(frame), 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--text-model", default="text_price_model.joblib")
+    parser.add_argument("--listings", default="train/dataset_for_rent.csv")
+    parser.add_argument("--artifact", default="model_artifact")
+    parser.add_argument("--model", default="property_price_model.joblib")
+    parser.add_argument("--columns", default="model_columns.joblib")
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    tabular = load_bundle(args.artifact, args.model, args.columns)
+    text = load_text_bundle(args.text_model)
+    if tabular is None or text is None:
+        parser.error("Both the tabular model and the text model must exist.")
+    pipeline = joblib.load(args.text_model)
+
+    rows = sample_rows(tabular.encoder, args.batch_size)
+    listings = sample_listings(args.listings, args.batch_size)
+
+    # Sanity check: the precompiled path must price like the Pipeline.
+    expected = pipeline_predict(pipeline, listings)
+    actual = np.array(text.predict_rows(listings)[0])
+    assert np.allclose(expected, actual, atol=0.011), "TextModelBundle disagrees"
+
+    # Each call prices the next sampled row, so caches see realistic variety.
+    single = {}
+    for label, predict_one in {
+        "tabular ModelBundle": lambda i: tabular.predict_row(rows[i]),
+        "text sklearn Pipeline": lambda i: pipeline_predict(pipeline, [listings[i]]),
+        "text TextModelBundle": lambda i: text.predict_row(listings[i]),
+    }.items():
+        calls = itertools.count()
+        single[label] = summarize(
+            time_calls(
+                lambda: predict_one(next(calls) % args.batch_size), args.iterations
+            )
+        )
+    print_table(f"Single row ({args.iterations} iterations)", single)
+
+    batch_iterations = max(args.iterations // 50, 5)
+    print_table(
+        f"Batch of {args.batch_size} ({batch_iterations} iterations)",
+        {
+            "tabular ModelBundle": summarize(
+                time_calls(lambda: tabular.predict_rows(rows), batch_iterations, 2)
+            ),
+            "text sklearn Pipeline": summarize(
+                time_calls(
+                    lambda: pipeline_predict(pipeline, listings), batch_iterations, 2
+                )
+            ),
+            "text TextModelBundle": summarize(
+                time_calls(lambda: text.predict_rows(listings), batch_iterations, 2)
+            ),
+        },
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# File Path: apps/prediction-service/benchmarks/tree_engine_benchmark.py
+"""
+Checks that the NumPy tree engine reproduces model.predict on the cleaned
+training data, then benchmarks both at batch sizes 1, 32 and 1024.
+
+Usage (from apps/prediction-service):
+    python benchmarks/tree_engine_benchmark.py [--model property_price_model.joblib]
+        [--columns model_columns.joblib] [--data train/properties_cleaned.csv]
+"""
+
+import argparse
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from bench_utils import print_table, summarize, time_calls
+from tree_engine import compile_estimator
+
+BATCH_SIZES = [1, 32, 1024]
+TOLERANCE = 1e-9
+
+
+def encode_dataset(path, model_columns):
+    """One-hot encodes the cleaned dataset exactly the way train.py does."""
+    df = pd.read_csv(path).drop(columns=["price"])
+    encoded = pd.get_dummies(
+        df, columns=["location", "listing_type", "property_type"], dtype=int
+    )
+    return encoded.reindex(columns=model_columns, fill_value=0).to_numpy(float)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model", default="property_price_model.joblib")
+    parser.add_argument("--columns", default="model_columns.joblib")
+    parser.add_argument("--data", default="train/properties_cleaned.csv")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+    model = joblib.load(args.model)
+    model_columns = joblib.load(args.columns)
+    engine = compile_estimator(model, model_columns)
+    X = encode_dataset(args.data, model_columns)
+
+    max_diff = float(np.max(np.abs(model.predict(X) - engine.predict(X))))
+    print(
+        f"Parity on {len(X)} rows of '{args.data}': "
+        f"max |sklearn - engine| = {max_diff:.3e} (log scale)"
+    )
+    assert max_diff <= TOLERANCE, "Tree engine disagrees with model.predict"
+
+    rows = {}
+    for batch_size in BATCH_SIZES:
+        batch = X[:batch_size]
+        iterations = max(args.iterations // max(batch_size // 32, 1), 10)
+        rows[f"sklearn   batch={batch_size}"] = summarize(
+            time_calls(lambda: model.predict(batch), iterations, warmup=5)
+        )
+        rows[f"engine    batch={batch_size}"] = summarize(
+            time_calls(lambda: engine.predict(batch), iterations, warmup=5)
+        )
+    print_table(f"{type(model).__name__}: sklearn vs tree engine", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# File Path: apps/prediction-service/benchmarks/validation_benchmark.py
+"""
+What InputValidator.check adds to a /predict request, per kind of input.
+
+Rows are checked against the model columns and, when present, the training
+ranges train.py wrote: values already in the vocabulary, an alias ("KL"), a
+misspelling the fuzzy matcher resolves (first seen and memoized), one it
+rejects, and a numeric value that is clipped. The encode step that follows
+validation in the service is timed alongside for scale.
+
+Usage (from apps/prediction-service):
+    python benchmarks/validation_benchmark.py [--iterations 20000]
+        [--ranges model_input_ranges.json]
+"""
+
+import argparse
+
+import joblib
+
+# bench_utils puts the service directory on sys.path, so import it first.
+from bench_utils import print_table, sample_rows, summarize, time_calls
+from feature_encoder import FeatureEncoder, UnknownCategoryError
+from input_validation import InputValidator, load_input_ranges
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--columns", default="model_columns.joblib")
+    parser.add_argument("--ranges", default="model_input_ranges.json")
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    encoder = FeatureEncoder(joblib.load(args.columns))
+    ranges = load_input_ranges(args.ranges)
+    validator = InputValidator(encoder, ranges)
+    row = sample_rows(encoder, 1)[0]
+    rows = {
+        "known values": row,
+        "alias": {**row, "location": "kl"},
+        "fuzzy, memoized": {**row, "location": "Kuala Lumpor"},
+        "unknown, memoized": {**row, "location": "Narnia"},
+        "area clipped": {**row, "area_sqft": 1e7},
+    }
+
+    def check(row):
+        try:
+            validator.check(row)
+        except UnknownCategoryError:
+            pass
+
+    timings = {
+        label: summarize(time_calls(lambda row=row: check(row), args.iterations))
+        for label, row in rows.items()
+    }
+    typos = iter(f"Kuala Lumpor {i}" for i in range(args.iterations + 20))
+    timings["fuzzy, first seen"] = summarize(
+        time_calls(
+            lambda: check({**row, "location": next(typos)}),
+            args.iterations // 10,
+        )
+    )
+    timings["FeatureEncoder.encode"] = summarize(
+        time_calls(lambda: encoder.encode(row), args.iterations)
+    )
+    print(
+        "Training ranges: "
+        + (f"'{args.ranges}'" if ranges else "none (numbers only sanity-checked)")
+    )
+    print_table(f"InputValidator.check ({args.iterations} iterations)", timings)
+
+
+if __name__ == "__main__":
+    main()
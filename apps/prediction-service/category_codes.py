@@ -0,0 +1,77 @@
+# File Path: apps/prediction-service/category_codes.py
+"""
+Regressors fit on integer category codes, served in the one-hot column layout.
+
+train/out_of_core.py fits HistGradientBoostingRegressor on compact rows: the
+numeric features followed by one code per categorical feature, which sklearn
+splits on natively. Everything downstream (FeatureEncoder, the price table,
+model_columns.joblib) speaks the one-hot layout, so the fitted model is wrapped
+in CategoryCodeRegressor, which turns one-hot rows back into codes before
+predicting. tree_engine flattens the wrapper straight onto the one-hot columns.
+
+Training imports the wrapper from here, so the pickled model refers to this
+module and loads in the service.
+"""
+
+import numpy as np
+
+from feature_encoder import CATEGORICAL_FEATURES, FeatureEncoder, normalize_category
+
+NUMERIC_FEATURES = ["area_sqft", "bedrooms", "bathrooms"]
+
+
+def _dense(X):
+    return X.toarray() if hasattr(X, "toarray") else np.asarray(X)
+
+
+class CategoryCodeRegressor:
+    """
+    regressor predicts from rows of NUMERIC_FEATURES then one code per
+    CATEGORICAL_FEATURES; codes[feature] lists that feature's values in code
+    order. Values of the columns that have no code are passed on as NaN
+    (missing), as are rows with no hot column in a block.
+    """
+
+    def __init__(self, regressor, columns, codes):
+        self.regressor = regressor
+        self.columns = list(columns)
+        self.codes = {feature: list(codes[feature]) for feature in CATEGORICAL_FEATURES}
+
+        encoder = FeatureEncoder(self.columns)
+        self.numeric_columns = np.array(
+            [encoder.numeric_index[feature] for feature in NUMERIC_FEATURES]
+        )
+        # Per categorical feature: its one-hot columns, and the code of each.
+        self.blocks = []
+        for feature in CATEGORICAL_FEATURES:
+            code_of = {
+                normalize_category(value): code
+                for code, value in enumerate(self.codes[feature])
+            }
+            names = encoder.vocabulary(feature)
+            index = encoder.category_index[feature]
+            columns = np.array(
+                [index[normalize_category(name)] for name in names], dtype=np.intp
+            )
+            block_codes = np.array(
+                [code_of.get(normalize_category(name), np.nan) for name in names],
+                dtype=np.float64,
+            )
+            self.blocks.append((columns, block_codes))
+
+    def coded(self, X):
+        """The regressor's input for one-hot rows (dense or CSR)."""
+        n_rows = X.shape[0]
+        coded = np.empty((n_rows, len(NUMERIC_FEATURES) + len(self.blocks)))
+        coded[:, : len(NUMERIC_FEATURES)] = _dense(X[:, self.numeric_columns])
+        for i, (columns, block_codes) in enumerate(
+            self.blocks, start=len(NUMERIC_FEATURES)
+        ):
+            block = _dense(X[:, columns])
+            hot = block.argmax(axis=1)
+            present = block[np.arange(n_rows), hot] > 0
+            coded[:, i] = np.where(present, block_codes[hot], np.nan)
+        return coded
+
+    def predict(self, X):
+        return self.regressor.predict(self.coded(X))
@@ -0,0 +1,431 @@
+# File Path: apps/prediction-service/comparables.py
+"""
+In-memory nearest-neighbour index over the cleaned listings, behind /comparables.
+
+Listings are partitioned by (location, listing_type, property_type), the columns a
+comparable must match exactly. Within a partition every listing is a point
+(log(area_sqft) / AREA_LOG_SCALE, bedrooms, bathrooms), so a 25% difference in
+floor area weighs about as much as one bedroom, and a scipy cKDTree over those
+points answers a k-nearest query in tens of microseconds.
+
+Inserted rows go into preallocated arrays behind the rows the tree covers and are
+scanned by brute force until there are enough of them to be worth a rebuild. A
+partition publishes its arrays, row count and tree as one tuple, so readers never
+take a lock and never see a half-inserted row.
+
+ComparablesStore keeps the index in step with the cleaned-data file: rows that
+data_cleaner.py appends to a CSV are parsed from the byte offset read so far and
+inserted, while a rewritten file (or a Parquet/Feather one) is reloaded whole. A
+CSV rewritten in place looks like a grown one, so before appending the store
+checks that the bytes it has indexed are still the file's first bytes. The
+store's validator() matches requested category values against the listings' own
+(see input_validation.py), for when there is no model to match them against.
+"""
+
+import hashlib
+import io
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from feature_encoder import normalize_category
+from input_validation import InputValidator
+
+PARTITION_COLUMNS = ["location", "listing_type", "property_type"]
+NUMERIC_COLUMNS = ["price", "area_sqft", "bedrooms", "bathrooms"]
+# log(1.25): a quarter more or less floor area is as far away as one bedroom.
+AREA_LOG_SCALE = float(np.log(1.25))
+# Partitions smaller than this are scanned by brute force, which is faster than
+# walking a tree; larger ones rebuild once their unindexed rows exceed the same
+# bound or (for big partitions) MAX_PENDING_ROWS.
+MIN_TREE_ROWS = 64
+MAX_PENDING_ROWS = 1024
+
+
+def _points(area_sqft, bedrooms, bathrooms):
+    return np.column_stack(
+        [
+            np.log(np.maximum(np.asarray(area_sqft, dtype=float), 1.0))
+            / AREA_LOG_SCALE,
+            np.asarray(bedrooms, dtype=float),
+            np.asarray(bathrooms, dtype=float),
+        ]
+    )
+
+
+def _nearest(candidates, point, k):
+    """(distances, positions) of the k rows of candidates closest to point."""
+    distances = np.sqrt(((candidates - point) ** 2).sum(axis=1))
+    if len(distances) > k:
+        positions = np.argpartition(distances, k - 1)[:k]
+    else:
+        positions = np.arange(len(distances))
+    return distances[positions], positions
+
+
+class _Partition:
+    """The listings of one (location, listing_type, property_type)."""
+
+    def __init__(self):
+        # (points, listings, row count, tree, rows covered by the tree)
+        self._state = (np.empty((0, 3)), np.empty((0, 4)), 0, None, 0)
+        self.rebuilds = 0
+
+    @property
+    def size(self):
+        return self._state[2]
+
+    @property
+    def pending(self):
+        _, _, n, _, indexed = self._state
+        return n - indexed
+
+    def add(self, points, listings):
+        """Appends rows; callers serialize add() calls (ComparablesIndex's lock)."""
+        all_points, all_listings, n, tree, indexed = self._state
+        total = n + len(points)
+        if total > len(all_points):
+            # Grow geometrically so a stream of small inserts copies each row O(1)
+            # times; readers keep using the old arrays they already hold.
+            capacity = max(total, 2 * len(all_points), 16)
+            grown_points = np.empty((capacity, 3))
+            grown_listings = np.empty((capacity, 4))
+            grown_points[:n] = all_points[:n]
+            grown_listings[:n] = all_listings[:n]
+            all_points, all_listings = grown_points, grown_listings
+        # Rows below n never change, so readers and the tree can share the arrays;
+        # rows past n stay invisible to readers until the new state is published.
+        all_points[n:total] = points
+        all_listings[n:total] = listings
+        if total - indexed > max(MIN_TREE_ROWS, min(indexed, MAX_PENDING_ROWS)):
+            tree, indexed = cKDTree(all_points[:total]), total
+            self.rebuilds += 1
+        self._state = (all_points, all_listings, total, tree, indexed)
+
+    def query(self, point, k):
+        """(distances, listings) of the k nearest rows, nearest first."""
+        all_points, all_listings, n, tree, indexed = self._state
+        if n == 0:
+            return np.empty(0), np.empty((0, 4))
+        if tree is None:
+            distances, positions = _nearest(all_points[:n], point, k)
+        else:
+            distances, positions = tree.query(point, k=min(k, indexed))
+            distances = np.atleast_1d(distances)
+            positions = np.atleast_1d(positions)
+            if n > indexed:
+                pending_distances, pending_positions = _nearest(
+                    all_points[indexed:n], point, k
+                )
+                distances = np.concatenate([distances, pending_distances])
+                positions = np.concatenate([positions, pending_positions + indexed])
+        order = np.argsort(distances, kind="stable")[:k]
+        return distances[order], all_listings[positions[order]]
+
+
+class ComparablesIndex:
+    """Cleaned listings grouped into partitions, each searchable by nearest rows."""
+
+    def __init__(self):
+        self._partitions = {}
+        # {column: {normalized value: value}} of the partition columns' values.
+        self._values = {column: {} for column in PARTITION_COLUMNS}
+        self._lock = threading.Lock()
+        self.rows = 0
+        # Bumped whenever a partition column gains a value.
+        self.vocabulary_version = 0
+
+    @classmethod
+    def from_frame(cls, df):
+        index = cls()
+        index.insert(df)
+        return index
+
+    @staticmethod
+    def partition_key(location, listing_type, property_type):
+        # Case-folded like FeatureEncoder's category lookup.
+        return (
+            normalize_category(location),
+            normalize_category(listing_type),
+            normalize_category(property_type),
+        )
+
+    def insert(self, df):
+        """Adds cleaned rows (the columns data_cleaner.py writes); returns the count."""
+        df = df.dropna(subset=PARTITION_COLUMNS + NUMERIC_COLUMNS)
+        if df.empty:
+            return 0
+        keys = df[PARTITION_COLUMNS].astype(str)
+        points = _points(df["area_sqft"], df["bedrooms"], df["bathrooms"])
+        listings = df[NUMERIC_COLUMNS].to_numpy(dtype=float)
+        groups = keys.groupby(PARTITION_COLUMNS, sort=False).indices
+        with self._lock:
+            for raw_key, positions in groups.items():
+                key = self.partition_key(*raw_key)
+                partition = self._partitions.get(key)
+                if partition is None:
+                    partition = self._partitions[key] = _Partition()
+                    for column, value, normalized in zip(
+                        PARTITION_COLUMNS, raw_key, key
+                    ):
+                        if normalized not in self._values[column]:
+                            self._values[column][normalized] = value
+                            self.vocabulary_version += 1
+                partition.add(points[positions], listings[positions])
+            self.rows += len(df)
+        return len(df)
+
+    def vocabulary(self, feature):
+        """The values of a partition column among the listings, as InputValidator
+        reads a model's."""
+        with self._lock:
+            return list(self._values[feature].values())
+
+    def query(
+        self, location, listing_type, property_type, area_sqft, bedrooms, bathrooms, k
+    ):
+        """
+        The k listings nearest to the given one in its partition, nearest first,
+        as dicts of price, area_sqft, bedrooms, bathrooms and distance. Empty when
+        no listing shares the location, listing_type and property_type.
+        """
+        partition = self._partitions.get(
+            self.partition_key(location, listing_type, property_type)
+        )
+        if partition is None:
+            return []
+        point = np.array(
+            [np.log(max(area_sqft, 1.0)) / AREA_LOG_SCALE, bedrooms, bathrooms],
+            dtype=float,
+        )
+        distances, listings = partition.query(point, k)
+        return [
+            {
+                "price": price,
+                "area_sqft": area,
+                "bedrooms": int(beds),
+                "bathrooms": int(baths),
+                "distance": distance,
+            }
+            for distance, (price, area, beds, baths) in zip(
+                distances.tolist(), listings.tolist()
+            )
+        ]
+
+    def partition_size(self, location, listing_type, property_type):
+        partition = self._partitions.get(
+            self.partition_key(location, listing_type, property_type)
+        )
+        return partition.size if partition is not None else 0
+
+    def stats(self):
+        partitions = list(self._partitions.values())
+        return {
+            "rows": self.rows,
+            "partitions": len(partitions),
+            "largest_partition": max((p.size for p in partitions), default=0),
+            "pending_rows": sum(p.pending for p in partitions),
+            "tree_rebuilds": sum(p.rebuilds for p in partitions),
+        }
+
+
+def read_listings(path):
+    """Reads the listing columns of a cleaned-data CSV, Parquet or Feather file."""
+    columns = PARTITION_COLUMNS + NUMERIC_COLUMNS
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".parquet":
+        return pd.read_parquet(path, columns=columns)
+    if extension == ".feather":
+        return pd.read_feather(path, columns=columns)
+    return pd.read_csv(
+        path, usecols=columns, dtype={column: "float64" for column in NUMERIC_COLUMNS}
+    )
+
+
+def _complete_size(path, size):
+    """The length of the file's first size bytes up to and including the last line
+    break, so a row that is still being written is never read."""
+    with open(path, "rb") as f:
+        end = size
+        while end > 0:
+            start = max(0, end - (1 << 16))
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                return start + newline + 1
+            end = start
+    return 0
+
+
+def _prefix_digest(path, size):
+    """The SHA-256 digest of the file's first size bytes."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        remaining = size
+        while remaining > 0:
+            chunk = f.read(min(remaining, 1 << 20))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest.digest()
+
+
+class ComparablesStore:
+    """
+    The index built from the cleaned-data file at path, refreshed in place as the
+    file grows. Requests read store.index, which a full reload swaps atomically.
+    """
+
+    def __init__(self, path, aliases=None):
+        self.path = path
+        self.aliases = aliases
+        self.index = None
+        self.loaded_at = None
+        self.inserted_rows = 0
+        self.reloads = 0
+        self.last_error = None
+        self._file = None  # (device, inode, size, mtime) when last read.
+        self._offset = 0  # Bytes of a CSV already in the index.
+        self._indexed = hashlib.sha256()  # Hash of those bytes.
+        self._names = None  # Its header, or None until a complete one is read.
+        self._refresh_lock = threading.Lock()
+        self._validator = (None, None, None)  # (index, vocabulary version, validator)
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def is_csv(self):
+        return os.path.splitext(self.path)[1].lower() == ".csv"
+
+    def _read_csv_rows(self, start, end):
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            data = f.read(end - start)
+        self._indexed.update(data)
+        return pd.read_csv(
+            io.BytesIO(data),
+            header=None,
+            names=self._names,
+            # A malformed line would otherwise stop every later row being read.
+            on_bad_lines="skip",
+            usecols=PARTITION_COLUMNS + NUMERIC_COLUMNS,
+            dtype={column: "float64" for column in NUMERIC_COLUMNS},
+        )
+
+    def load(self):
+        """Builds a new index from the whole file; returns False if it is missing."""
+        if not os.path.exists(self.path):
+            return False
+        stat = os.stat(self.path)
+        index = ComparablesIndex()
+        if self.is_csv:
+            end = _complete_size(self.path, stat.st_size)
+            with open(self.path, "rb") as f:
+                header = f.readline()
+            self._indexed = hashlib.sha256()
+            if header.endswith(b"\n"):
+                self._names = header.decode().strip().split(",")
+                self._offset = len(header)
+                self._indexed.update(header)
+                if end > self._offset:
+                    index.insert(self._read_csv_rows(self._offset, end))
+                    self._offset = end
+            else:
+                self._names, self._offset = None, 0
+        else:
+            index.insert(read_listings(self.path))
+        self.index = index
+        self._file = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        self.loaded_at = time.time()
+        self.reloads += 1
+        return True
+
+    def refresh(self):
+        """
+        Brings the index up to date with the file: complete lines appended to a CSV
+        are inserted; any other change (a rewritten, truncated or non-CSV file, or
+        one whose indexed bytes changed in place) reloads it whole. Returns the
+        number of rows inserted, or None after a load.
+        """
+        with self._refresh_lock:
+            try:
+                stat = os.stat(self.path)
+            except OSError:
+                return 0  # Keep serving what we have while the file is replaced.
+            current = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+            if self.index is not None and current == self._file:
+                return 0
+            appended = (
+                self.index is not None
+                and self.is_csv
+                and self._names is not None
+                and self._file is not None
+                and self._file[:2] == current[:2]
+                and stat.st_size >= self._offset
+                # Rewritten in place (data_cleaner.py's to_csv does this) unless
+                # the rows already indexed are still there, byte for byte.
+                and _prefix_digest(self.path, self._offset) == self._indexed.digest()
+            )
+            if not appended:
+                self.load()
+                return None
+            end = _complete_size(self.path, stat.st_size)
+            inserted = 0
+            if end > self._offset:
+                inserted = self.index.insert(self._read_csv_rows(self._offset, end))
+                self.inserted_rows += inserted
+                self._offset = end
+            self._file = current
+            return inserted
+
+    def validator(self):
+        """
+        An InputValidator for the index's own category values, rebuilt when they
+        change; None before the index is loaded.
+        """
+        index = self.index
+        if index is None:
+            return None
+        cached_index, version, validator = self._validator
+        if cached_index is not index or version != index.vocabulary_version:
+            version = index.vocabulary_version
+            validator = InputValidator(index, aliases=self.aliases)
+            self._validator = (index, version, validator)
+        return validator
+
+    def start_watching(self, interval_seconds):
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(interval_seconds,),
+            name="comparables-watcher",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, interval_seconds):
+        while not self._stop.wait(interval_seconds):
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as e:
+                # Malformed or half-replaced files are retried on the next poll.
+                self.last_error = str(e)
+
+    def stats(self):
+        return {
+            "source": self.path,
+            "loaded": self.index is not None,
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads,
+            "inserted_rows": self.inserted_rows,
+            "last_error": self.last_error,
+            **(self.index.stats() if self.index is not None else {}),
+        }
@@ -0,0 +1,117 @@
+# File Path: apps/prediction-service/feature_encoder.py
+import numpy as np
+
+# The categorical inputs that train.py one-hot encodes with pd.get_dummies.
+# Their training columns are named "<feature>_<value>", e.g. "location_Ampang".
+CATEGORICAL_FEATURES = ["location", "listing_type", "property_type"]
+
+
+def normalize_category(value):
+    """Canonical form used to match category values: trimmed and case-folded."""
+    return value.strip().casefold()
+
+
+class UnknownCategoryError(ValueError):
+    """Raised when a request uses a category value the model was never trained on."""
+
+    def __init__(self, unknown, suggestions=None):
+        self.unknown = unknown
+        self.suggestions = suggestions or {}
+        details = ", ".join(f"{field} '{value}'" for field, value in unknown.items())
+        hints = "".join(
+            f" Did you mean {' or '.join(repr(value) for value in values)} "
+            f"for {field}?"
+            for field, values in self.suggestions.items()
+            if values
+        )
+        super().__init__(f"Unknown {details}.{hints}")
+
+
+class FeatureEncoder:
+    """
+    Encodes PropertyFeatures straight into the model's column layout.
+
+    Every category value is mapped to its one-hot column index once, at startup,
+    so encoding a request is a few dict lookups into a zeroed NumPy row instead of
+    building a DataFrame and running get_dummies/reindex. Lookups go through
+    normalize_category, so "kuala lumpur " and "Kuala Lumpur" hit the same column.
+    """
+
+    def __init__(self, model_columns):
+        self.columns = list(model_columns)
+        self.n_columns = len(self.columns)
+        self.numeric_index = {}
+        self.category_names = {feature: [] for feature in CATEGORICAL_FEATURES}
+        self.category_index = {feature: {} for feature in CATEGORICAL_FEATURES}
+
+        for idx, column in enumerate(self.columns):
+            for feature in CATEGORICAL_FEATURES:
+                prefix = f"{feature}_"
+                if column.startswith(prefix):
+                    value = column[len(prefix) :]
+                    self.category_names[feature].append(value)
+                    self.category_index[feature][normalize_category(value)] = idx
+                    break
+            else:
+                self.numeric_index[column] = idx
+
+    def vocabulary(self, feature):
+        """Returns the category values the model knows for a feature."""
+        return list(self.category_names[feature])
+
+    def find_unknown(self, row):
+        """Returns {feature: value} for every categorical value missing from the model."""
+        return {
+            feature: row[feature]
+            for feature in CATEGORICAL_FEATURES
+            if normalize_category(row[feature]) not in self.category_index[feature]
+        }
+
+    def encode(self, row):
+        """Encodes one feature dict into a 1 x n_columns matrix."""
+        unknown = self.find_unknown(row)
+        if unknown:
+            raise UnknownCategoryError(unknown)
+
+        encoded = np.zeros((1, self.n_columns))
+        for feature, idx in self.numeric_index.items():
+            encoded[0, idx] = row[feature]
+        for feature in CATEGORICAL_FEATURES:
+            encoded[
+                0, self.category_index[feature][normalize_category(row[feature])]
+            ] = 1.0
+        return encoded
+
+    def encode_batch(self, rows):
+        """
+        Encodes a list of feature dicts into an n_rows x n_columns matrix.
+
+        Returns (matrix, errors); errors[i] is an UnknownCategoryError for rows that
+        could not be encoded (their matrix row is left as zeros) and None otherwise.
+        """
+        encoded = np.zeros((len(rows), self.n_columns))
+        errors = [None] * len(rows)
+        if not rows:
+            return encoded, errors
+
+        for feature, idx in self.numeric_index.items():
+            encoded[:, idx] = [row[feature] for row in rows]
+
+        valid = np.ones(len(rows), dtype=bool)
+        hot_rows = []
+        hot_columns = []
+        for i, row in enumerate(rows):
+            unknown = self.find_unknown(row)
+            if unknown:
+                errors[i] = UnknownCategoryError(unknown)
+                valid[i] = False
+                continue
+            for feature in CATEGORICAL_FEATURES:
+                hot_rows.append(i)
+                hot_columns.append(
+                    self.category_index[feature][normalize_category(row[feature])]
+                )
+
+        encoded[hot_rows, hot_columns] = 1.0
+        encoded[~valid] = 0.0
+        return encoded, errors
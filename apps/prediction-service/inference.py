@@ -0,0 +1,65 @@
+# File Path: apps/prediction-service/inference.py
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the inference backlog is full and the request should be shed."""
+
+
+class InferenceExecutor:
+    """
+    Runs blocking model calls on a thread pool so they never stall the event loop.
+
+    At most max_workers calls run at once and at most max_queue more may wait for a
+    worker; anything beyond that is rejected immediately with QueueFullError so the
+    API can answer 503 instead of letting latency grow without bound. Requests are
+    priced by the NumPy tree engine, which only releases the GIL inside its array
+    operations; a single-row prediction is mostly interpreter time, so workers
+    mainly keep the event loop responsive, and throughput scales with processes
+    (serve.py's workers) rather than threads.
+    """
+
+    def __init__(self, max_workers, max_queue):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="inference"
+        )
+        # Only touched from the event loop thread, so no lock is needed.
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def pending(self):
+        return self._pending
+
+    async def run(self, fn, *args):
+        """Runs fn(*args) on the pool, or raises QueueFullError if the backlog is full."""
+        if self._pending >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(
+                f"Inference queue is full ({self.max_queue} requests waiting)."
+            )
+
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            self._pending -= 1
+            self.completed += 1
+
+    def stats(self):
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": min(self._pending, self.max_workers),
+            "queued": max(self._pending - self.max_workers, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
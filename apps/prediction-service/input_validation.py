@@ -0,0 +1,317 @@
+# File Path: apps/prediction-service/input_validation.py
+"""
+Checks /predict inputs against what the model was trained on, before any encoding.
+
+An InputValidator is built with each model bundle from its columns (and the
+model_input_ranges.json train.py publishes in its artifact, when there is one),
+so everything it matches against is precomputed once per model:
+
+- Category values are looked up exactly (trimmed and case-folded, as
+  FeatureEncoder does), then in an alias table: every value under a key that
+  ignores punctuation and spacing ("api api", "apiapi"), without a generic
+  prefix ("Bandar Petaling Jaya" as "petaling jaya"), as the initials of its
+  words ("kl"), plus ALIASES and any aliases the service is configured with.
+  Derived aliases that would name two values are dropped. A value still not
+  found is matched to the closest vocabulary entry with difflib if it is close
+  and unambiguous; those results are memoized, so a repeated typo costs one
+  dict lookup. A value with no match is rejected with suggestions.
+- Numbers must be finite, area_sqft positive and the counts non-negative. With
+  training ranges, values outside the RANGE_QUANTILES of the training data are
+  clipped into them ("clip", the default) or rejected ("reject").
+
+check() returns the row the model should price and the corrections made, so
+responses can tell clients which values were replaced.
+"""
+
+import difflib
+import json
+import math
+import os
+import re
+
+import numpy as np
+
+from feature_encoder import (
+    CATEGORICAL_FEATURES,
+    UnknownCategoryError,
+    normalize_category,
+)
+
+NUMERIC_FEATURES = ["area_sqft", "bedrooms", "bathrooms"]
+INTEGER_FEATURES = {"bedrooms", "bathrooms"}
+RANGE_QUANTILES = (0.001, 0.999)
+RANGE_POLICIES = ("clip", "reject", "off")
+
+# Words that only say what kind of place a location is; a value is also known
+# without them ("Bandar Klang" as "klang") unless another value is named that.
+GENERIC_PREFIXES = ("bandar", "bandaraya", "kampung", "taman")
+
+# Common names clients send for values in the training vocabulary. An alias is
+# only used when the model knows its target. These are other names for the same
+# thing only; mapping one kind of property onto another ("bungalow" priced as a
+# villa) is a deployment's call, made with main.py's INPUT_ALIASES_PATH.
+ALIASES = {
+    "location": {
+        "kl": "Kuala Lumpur",
+        "kuala lumpur city centre": "Bandar Kuala Lumpur",
+        "klcc": "Bandar Kuala Lumpur",
+        "pj": "Bandar Petaling Jaya",
+        "petaling jaya": "Bandar Petaling Jaya",
+        "jb": "Bandar Johor Bahru",
+        "johor bahru": "Bandar Johor Bahru",
+        "kk": "Kota Kinabalu",
+        "george town": "Bandaraya Georgetown",
+        "georgetown": "Bandaraya Georgetown",
+        "penang": "Bandaraya Georgetown",
+        "malacca": "Bandar Melaka",
+        "melaka": "Bandar Melaka",
+        "seremban": "Bandar Seremban",
+        "port dickson": "Port Dickson",
+        "pd": "Port Dickson",
+    },
+    "listing_type": {
+        "rental": "rent",
+        "for rent": "rent",
+        "to let": "rent",
+        "lease": "rent",
+        "for sale": "sale",
+        "buy": "sale",
+        "sell": "sale",
+    },
+    "property_type": {
+        "condominium": "Condo",
+        "serviced apartment": "Apartment",
+        "service apartment": "Apartment",
+    },
+}
+
+# difflib.SequenceMatcher ratio a fuzzy match must reach, and by how much it must
+# beat the runner-up.
+FUZZY_CUTOFF = 0.8
+FUZZY_MARGIN = 0.05
+# Memoized fuzzy lookups per feature; the memo is cleared when it fills up.
+FUZZY_MEMO_SIZE = 4096
+
+_NON_ALPHANUMERIC = re.compile(r"[^0-9a-z]+")
+
+
+def loose_key(value):
+    """A category value with case, punctuation and spacing ignored."""
+    return _NON_ALPHANUMERIC.sub(" ", value.casefold()).strip()
+
+
+class InvalidInputError(ValueError):
+    """Raised when a numeric input is impossible or outside the training range."""
+
+    def __init__(self, problems):
+        self.problems = problems
+        super().__init__(" ".join(f"{problem}." for problem in problems.values()))
+
+
+def input_ranges(values):
+    """
+    The ranges file train.py writes next to the model: for each numeric feature
+    in values ({feature: 1-D array of training values}), its RANGE_QUANTILES and
+    its minimum and maximum.
+    """
+    ranges = {}
+    for feature, column in values.items():
+        column = np.asarray(column, dtype=np.float64)
+        low, high = np.quantile(column, RANGE_QUANTILES)
+        ranges[feature] = {
+            "low": round(float(low), 2),
+            "high": round(float(high), 2),
+            "min": float(column.min()),
+            "max": float(column.max()),
+        }
+    return {"quantiles": list(RANGE_QUANTILES), "features": ranges}
+
+
+def save_input_ranges(path, ranges):
+    with open(path, "w") as f:
+        json.dump(ranges, f, indent=2)
+
+
+def load_input_ranges(path):
+    """The ranges at path, or None if there is no such file."""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _alias_candidates(value):
+    """(priority, key) pairs under which a vocabulary value is also known."""
+    key = loose_key(value)
+    yield 1, key
+    yield 1, key.replace(" ", "")
+    words = key.split()
+    if len(words) > 1 and all(word.isalpha() for word in words):
+        yield 2, "".join(word[0] for word in words)
+    if len(words) > 1 and words[0] in GENERIC_PREFIXES:
+        stripped = words[1:]
+        yield 3, " ".join(stripped)
+        if len(stripped) > 1 and all(word.isalpha() for word in stripped):
+            yield 4, "".join(word[0] for word in stripped)
+
+
+class InputValidator:
+    """Validates and corrects PropertyFeatures dicts for one model's columns."""
+
+    def __init__(self, encoder, ranges=None, aliases=None):
+        self.vocabulary = {
+            feature: encoder.vocabulary(feature) for feature in CATEGORICAL_FEATURES
+        }
+        self.exact = {
+            feature: {normalize_category(value): value for value in values}
+            for feature, values in self.vocabulary.items()
+        }
+        self.aliases = {}
+        for feature, values in self.vocabulary.items():
+            # Lower priority numbers win; a key two values claim at the same
+            # priority is ambiguous and left out.
+            claims = {}
+            for value in values:
+                for priority, key in _alias_candidates(value):
+                    claims.setdefault(key, {}).setdefault(priority, set()).add(value)
+            table = {}
+            for key, by_priority in claims.items():
+                targets = by_priority[min(by_priority)]
+                if len(targets) == 1:
+                    table[key] = next(iter(targets))
+            known = {loose_key(value): value for value in values}
+            for source in (ALIASES, aliases or {}):
+                for alias, target in source.get(feature, {}).items():
+                    target = known.get(loose_key(target))
+                    if target is not None:
+                        table[loose_key(alias)] = target
+            # The values' own names always win over another value's alias.
+            table.update(known)
+            self.aliases[feature] = table
+        self.fuzzy_keys = {
+            feature: sorted(table) for feature, table in self.aliases.items()
+        }
+        self._fuzzy_memo = {feature: {} for feature in CATEGORICAL_FEATURES}
+        self.ranges = (ranges or {}).get("features", {})
+
+    def match_category(self, feature, value):
+        """
+        (vocabulary value, how it was matched) for a requested category value,
+        with how None for an exact match. Raises UnknownCategoryError.
+        """
+        found = self.exact[feature].get(normalize_category(value))
+        if found is not None:
+            return found, None
+        key = loose_key(value)
+        found = self.aliases[feature].get(key)
+        if found is not None:
+            return found, "alias"
+        memo = self._fuzzy_memo[feature]
+        result = memo.get(key)
+        if result is None:
+            result = self._fuzzy_match(feature, key)
+            if len(memo) >= FUZZY_MEMO_SIZE:
+                memo.clear()
+            memo[key] = result
+        found, suggestions = result
+        if found is None:
+            raise UnknownCategoryError({feature: value}, {feature: suggestions})
+        return found, "fuzzy"
+
+    def _fuzzy_match(self, feature, key):
+        """(value or None, suggestions) for a key no exact or alias lookup found."""
+        matcher = difflib.SequenceMatcher(b=key, autojunk=False)
+        scored = []
+        for candidate in self.fuzzy_keys[feature]:
+            matcher.set_seq1(candidate)
+            if (
+                matcher.real_quick_ratio() >= FUZZY_CUTOFF
+                and matcher.quick_ratio() >= FUZZY_CUTOFF
+            ):
+                scored.append((matcher.ratio(), candidate))
+        scored.sort(reverse=True)
+        table = self.aliases[feature]
+        # Different keys of the same value are not rivals.
+        ranked = []
+        for score, candidate in scored:
+            if score < FUZZY_CUTOFF:
+                break
+            if table[candidate] not in (value for _, value in ranked):
+                ranked.append((score, table[candidate]))
+        suggestions = [value for _, value in ranked[:3]]
+        if ranked and (len(ranked) == 1 or ranked[0][0] - ranked[1][0] >= FUZZY_MARGIN):
+            return ranked[0][1], suggestions
+        if not suggestions:
+            suggestions = difflib.get_close_matches(
+                key, self.fuzzy_keys[feature], n=3, cutoff=0.6
+            )
+            suggestions = list(dict.fromkeys(table[key] for key in suggestions))
+        return None, suggestions
+
+    def check(self, row, range_policy="clip"):
+        """
+        (row to price, {feature: value used}) for a PropertyFeatures dict; the
+        second lists only values that were replaced. Raises UnknownCategoryError
+        or InvalidInputError.
+        """
+        checked = dict(row)
+        corrections = {}
+        unknown = {}
+        suggestions = {}
+        for feature in CATEGORICAL_FEATURES:
+            try:
+                value, how = self.match_category(feature, row[feature])
+            except UnknownCategoryError as e:
+                unknown.update(e.unknown)
+                suggestions.update(e.suggestions)
+                continue
+            checked[feature] = value
+            if how is not None:
+                corrections[feature] = value
+        if unknown:
+            raise UnknownCategoryError(unknown, suggestions)
+
+        problems = {}
+        for feature in NUMERIC_FEATURES:
+            value = float(row[feature])
+            if not math.isfinite(value):
+                problems[feature] = f"{feature} must be a finite number"
+                continue
+            if feature == "area_sqft" and value <= 0:
+                problems[feature] = "area_sqft must be positive"
+                continue
+            if value < 0:
+                problems[feature] = f"{feature} must not be negative"
+                continue
+            limits = self.ranges.get(feature)
+            if limits is None or range_policy == "off":
+                continue
+            low, high = limits["low"], limits["high"]
+            if feature in INTEGER_FEATURES:
+                low, high = math.ceil(low), math.floor(high)
+            if low <= value <= high:
+                continue
+            if range_policy == "reject":
+                problems[feature] = (
+                    f"{feature} {row[feature]:g} is outside the range the model was "
+                    f"trained on ({low:g} to {high:g})"
+                )
+                continue
+            clipped = min(max(value, low), high)
+            checked[feature] = int(clipped) if feature in INTEGER_FEATURES else clipped
+            corrections[feature] = checked[feature]
+        if problems:
+            raise InvalidInputError(problems)
+        return checked, corrections
+
+    def describe(self):
+        return {
+            "categories": {
+                feature: len(values) for feature, values in self.vocabulary.items()
+            },
+            "aliases": {
+                feature: len(table) - len(self.vocabulary[feature])
+                for feature, table in self.aliases.items()
+            },
+            "ranges": self.ranges,
+        }
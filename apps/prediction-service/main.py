@@ -1,10 +1,48 @@
 # File Path: apps/prediction-service/main.py
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-import joblib
-import pandas as pd
-import numpy as np
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from pydantic import BaseModel, ValidationError
+from typing import Dict, List, Optional, Union
+import asyncio
+import json
 import os
+import signal
+import time
+import warnings
+
+from batching import MicroBatcher
+from comparables import ComparablesStore
+from feature_encoder import UnknownCategoryError
+from inference import InferenceExecutor, QueueFullError
+from input_validation import RANGE_POLICIES, InvalidInputError
+from metrics import (
+    CONTENT_TYPE,
+    ERRORS,
+    MODEL_LOAD_RSS_BYTES,
+    MODEL_LOAD_SECONDS,
+    REGISTRY,
+    REQUEST_SECONDS,
+    REQUESTS,
+    time_stage,
+)
+from model_registry import (
+    ModelFileWatcher,
+    ModelRegistry,
+    ModelValidationError,
+    ReloadInProgressError,
+    load_bundle,
+    load_smoke_dataset,
+    load_text_bundle,
+    model_files_fingerprint,
+    validate_bundle,
+)
+from prediction_cache import PredictionCache, cache_key, canonicalize_features
+from price_table import PriceTableStore
+from process_stats import peak_rss_bytes, rss_bytes
+from profiler import SamplingProfiler
+from segment_models import SegmentModels
 
 # NEW: Import the CORSMiddleware
 from fastapi.middleware.cors import CORSMiddleware
@@ -32,20 +70,377 @@ app.add_middleware(
 # --- Model Loading ---
 MODEL_PATH = "property_price_model.joblib"
 COLUMNS_PATH = "model_columns.joblib"
-model = None
-model_columns = []
+# A compact artifact exported by train.py; preferred over the pickled model when
+# present because it loads in milliseconds and is memory-mapped, not unpickled.
+MODEL_ARTIFACT_DIR = os.getenv("MODEL_ARTIFACT_DIR", "model_artifact")
+# Pickled models are compiled into the NumPy tree engine at load time so requests
+# never go through sklearn's predict; set NATIVE_INFERENCE=0 to serve them as-is.
+NATIVE_INFERENCE = os.getenv("NATIVE_INFERENCE", "1") == "1"
+
+# --- Input Validation ---
+# /predict inputs are checked against the served model before the cache or the
+# model sees them (see input_validation.py): category values are matched to the
+# training vocabulary through aliases ("KL") and close spellings, and numbers
+# outside the training ranges are clipped into them (INPUT_RANGE_POLICY=clip),
+# rejected (reject) or let through (off). The ranges are those train.py publishes
+# in the model artifact; a pickled model uses the ones at INPUT_RANGES_PATH.
+# INPUT_ALIASES_PATH may name a JSON file of extra {feature: {alias: value}}.
+INPUT_RANGES_PATH = os.getenv("INPUT_RANGES_PATH", "model_input_ranges.json")
+INPUT_RANGE_POLICY = os.getenv("INPUT_RANGE_POLICY", "clip")
+if INPUT_RANGE_POLICY not in RANGE_POLICIES:
+    raise ValueError(
+        f"INPUT_RANGE_POLICY must be one of {', '.join(RANGE_POLICIES)}, "
+        f"not '{INPUT_RANGE_POLICY}'."
+    )
+INPUT_ALIASES_PATH = os.getenv("INPUT_ALIASES_PATH", "")
+INPUT_ALIASES = None
+if INPUT_ALIASES_PATH:
+    with open(INPUT_ALIASES_PATH) as f:
+        INPUT_ALIASES = json.load(f)
+
+# --- Hot Reload ---
+# A reloaded model must price the smoke dataset sensibly before it replaces the one
+# being served. POST /admin/reload needs the PREDICTION_ADMIN_TOKEN header value and
+# is disabled when no token is set; MODEL_WATCH_INTERVAL_SECONDS > 0 also reloads
+# automatically whenever train.py publishes a new model.
+SMOKE_DATASET_PATH = os.getenv("MODEL_SMOKE_DATASET", "smoke_dataset.csv")
+SMOKE_MAX_LOG_ERROR = float(os.getenv("MODEL_SMOKE_MAX_LOG_ERROR", "0.5"))
+ADMIN_TOKEN = os.getenv("PREDICTION_ADMIN_TOKEN", "")
+MODEL_WATCH_INTERVAL_SECONDS = float(os.getenv("MODEL_WATCH_INTERVAL_SECONDS", "0"))
+
+# --- Text-aware Listing Model ---
+# The description/facilities TF-IDF pipeline from train/gemini_train_random_forest.py,
+# served on /predict/listing next to the tabular model when the file is present.
+TEXT_MODEL_PATH = os.getenv("TEXT_MODEL_PATH", "text_price_model.joblib")
+
+# --- Comparables ---
+# POST /comparables returns the listings nearest to a property among those with
+# the same location, listing_type and property_type, from an index built over the
+# cleaned data at startup. Every COMPARABLES_WATCH_INTERVAL_SECONDS (0 disables)
+# rows appended to the file are inserted and a rewritten file is reloaded.
+# Comparables need no model: while none is loaded, category values are matched
+# against the listings' own instead of the served model's vocabulary.
+COMPARABLES_DATA_PATH = os.getenv("COMPARABLES_DATA_PATH", "properties_cleaned.csv")
+COMPARABLES_WATCH_INTERVAL_SECONDS = float(
+    os.getenv("COMPARABLES_WATCH_INTERVAL_SECONDS", "10")
+)
+COMPARABLES_MAX_K = int(os.getenv("COMPARABLES_MAX_K", "50"))
+comparables_store = ComparablesStore(COMPARABLES_DATA_PATH, INPUT_ALIASES)
+
+# --- Pre-fork Workers ---
+# serve.py loads the models once in a parent process and forks the uvicorn workers
+# from it, so they share the model memory. It sets PREFORK_PARENT_PID; workers then
+# leave loading, file watching and reloading to that parent.
+PREFORK_PARENT_PID = int(os.getenv("PREFORK_PARENT_PID", "0"))
+
+# --- Metrics and Profiling ---
+# GET /metrics serves request/error counters, per-stage latency histograms and
+# model/memory gauges in the Prometheus text format. The sampling profiler is off
+# until an admin starts it with POST /admin/profiler/start; every run stops by
+# itself after at most PROFILER_MAX_SECONDS.
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "5"))
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "300"))
+profiler = SamplingProfiler()
+
+
+def timed_load(family, loader):
+    """Runs a model loader and records its duration and RSS growth as gauges."""
+    start = time.perf_counter()
+    rss_before = rss_bytes()
+    bundle = loader()
+    if bundle is not None:
+        MODEL_LOAD_SECONDS.labels(family).set(time.perf_counter() - start)
+        MODEL_LOAD_RSS_BYTES.labels(family).set(max(rss_bytes() - rss_before, 0))
+    return bundle
+
+
+def load_current_bundle():
+    return timed_load(
+        "tabular",
+        lambda: load_bundle(
+            MODEL_ARTIFACT_DIR,
+            MODEL_PATH,
+            COLUMNS_PATH,
+            NATIVE_INFERENCE,
+            INPUT_RANGES_PATH,
+            INPUT_ALIASES,
+        ),
+    )
+
+
+def validate_candidate(bundle):
+    if os.path.exists(SMOKE_DATASET_PATH):
+        validate_bundle(
+            bundle, load_smoke_dataset(SMOKE_DATASET_PATH), SMOKE_MAX_LOG_ERROR
+        )
+
+
+def load_current_text_bundle():
+    return timed_load(
+        "text", lambda: load_text_bundle(TEXT_MODEL_PATH, NATIVE_INFERENCE)
+    )
+
+
+model_registry = ModelRegistry(load_current_bundle, validate_candidate)
+text_model_registry = ModelRegistry(load_current_text_bundle)
+model_watchers = []
+
+# --- Prediction Cache ---
+# Repeated estimates (e.g. the same unit re-priced while a form is edited) are
+# answered from memory. Set PREDICTION_CACHE_MAX_ENTRIES=0 to disable the cache.
+CACHE_AREA_DECIMALS = int(os.getenv("PREDICTION_CACHE_AREA_DECIMALS", "0"))
+prediction_cache = PredictionCache(
+    max_entries=int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "10000")),
+    ttl_seconds=float(os.getenv("PREDICTION_CACHE_TTL_SECONDS", "3600")),
+)
+
+# --- Price Lookup Table ---
+# Requests on the common feature grid are priced from a table precomputed with the
+# served model by train/build_price_table.py (see price_table.py), without running
+# the model; the rest fall back to live inference. PRICE_TABLE_DIR="" disables it.
+PRICE_TABLE_DIR = os.getenv("PRICE_TABLE_DIR", "price_table")
+price_table = PriceTableStore(PRICE_TABLE_DIR) if PRICE_TABLE_DIR else None
+
+# --- Segment Models ---
+# train.py --segment-by publishes a smaller model per segment of the listings (by
+# listing_type, say) to SEGMENT_MODELS_DIR, and /predict and /predict/batch then
+# price each request with its segment's model (see segment_models.py); the model
+# above still validates requests first and prices segments without a model. The
+# SEGMENT_PRELOAD segments with the most training rows load at startup, the rest
+# on their first request; at most SEGMENT_MAX_LOADED stay loaded.
+# SEGMENT_MODELS_DIR="" disables routing.
+SEGMENT_MODELS_DIR = os.getenv("SEGMENT_MODELS_DIR", "segment_models")
+segment_models = (
+    SegmentModels(
+        SEGMENT_MODELS_DIR,
+        max_loaded=int(os.getenv("SEGMENT_MAX_LOADED", "8")),
+        preload=int(os.getenv("SEGMENT_PRELOAD", "2")),
+        native_inference=NATIVE_INFERENCE,
+        aliases=INPUT_ALIASES,
+    )
+    if SEGMENT_MODELS_DIR
+    else None
+)
+
+# --- Inference Executor ---
+# model.predict is CPU-bound, so it runs on a bounded thread pool instead of the
+# event loop. When INFERENCE_QUEUE_SIZE requests are already waiting, new ones get
+# a 503 with Retry-After rather than queueing indefinitely.
+INFERENCE_RETRY_AFTER_SECONDS = int(os.getenv("INFERENCE_RETRY_AFTER_SECONDS", "1"))
+inference_executor = InferenceExecutor(
+    max_workers=int(os.getenv("INFERENCE_WORKERS", str(os.cpu_count() or 1))),
+    max_queue=int(os.getenv("INFERENCE_QUEUE_SIZE", "64")),
+)
+
+# The encoder hands the model plain NumPy rows already in model_columns order, so
+# sklearn's "fitted with feature names" check has nothing useful to say.
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+
+def on_model_swap(bundle, previous):
+    # Cache keys include the model version, so dropping the replaced model's prices
+    # only frees their memory; the other registry's model keeps its cached prices.
+    if previous is not None and previous.version != bundle.version:
+        prediction_cache.discard_version(previous.version)
+        print(f"Model version {previous.version} replaced by {bundle.version}.")
+
+
+model_registry.on_swap(on_model_swap)
+text_model_registry.on_swap(on_model_swap)
+
+
+def loaded_model_versions():
+    for family, registry in (
+        ("tabular", model_registry),
+        ("text", text_model_registry),
+    ):
+        if registry.current is not None:
+            yield (family, registry.current.version), 1
+
+
+# Gauges read at scrape time from the components that already keep the numbers.
+REGISTRY.gauge(
+    "prediction_model_info",
+    "The model version being served, per model family (always 1).",
+    ["model", "version"],
+    callback=loaded_model_versions,
+)
+REGISTRY.gauge(
+    "process_resident_memory_bytes",
+    "Resident memory of the service process.",
+    callback=lambda: [((), rss_bytes())],
+)
+REGISTRY.gauge(
+    "process_peak_resident_memory_bytes",
+    "Peak resident memory of the service process since it started.",
+    callback=lambda: [((), peak_rss_bytes())],
+)
+REGISTRY.counter(
+    "prediction_cache_lookups_total",
+    "Prediction cache lookups by result.",
+    ["result"],
+    callback=lambda: [
+        (("hit",), prediction_cache.stats()["hits"]),
+        (("miss",), prediction_cache.stats()["misses"]),
+    ],
+)
+REGISTRY.counter(
+    "prediction_price_table_lookups_total",
+    "Price lookup table lookups by result.",
+    ["result"],
+    callback=lambda: (
+        [(("hit",), price_table.hits), (("miss",), price_table.misses)]
+        if price_table is not None
+        else []
+    ),
+)
+REGISTRY.gauge(
+    "prediction_inference_in_flight",
+    "Model calls running on the inference pool.",
+    callback=lambda: [((), inference_executor.stats()["in_flight"])],
+)
+REGISTRY.gauge(
+    "prediction_inference_queued",
+    "Model calls waiting for an inference worker.",
+    callback=lambda: [((), inference_executor.stats()["queued"])],
+)
+
+
+def preload_models():
+    """Loads both model families into their registries, and the comparables index."""
+    start = time.perf_counter()
+    rss_before = rss_bytes()
+    # The first model is served even if it fails the smoke test, as before; only
+    # reloads are gated on validation.
+    bundle = load_current_bundle()
+    if bundle is None:
+        print(f"Warning: Model or columns file not found.")
+    else:
+        model_registry.swap(bundle)
+        print(
+            f"Machine learning model and training columns loaded successfully from "
+            f"{bundle.source} (version {bundle.version}) "
+            f"in {time.perf_counter() - start:.3f}s "
+            f"(RSS +{(rss_bytes() - rss_before) / 1e6:.1f} MB)."
+        )
+
+    start = time.perf_counter()
+    text_bundle = load_current_text_bundle()
+    if text_bundle is not None:
+        text_model_registry.swap(text_bundle)
+        print(
+            f"Text-aware listing model loaded from {text_bundle.source} "
+            f"(version {text_bundle.version}, {len(text_bundle.columns)} features) "
+            f"in {time.perf_counter() - start:.3f}s."
+        )
+
+    if price_table is not None and price_table.load():
+        table = price_table.table
+        print(
+            f"Price lookup table for model version {table.model_version} loaded "
+            f"from {PRICE_TABLE_DIR} ({table.prices.size} grid prices)."
+        )
+
+    start = time.perf_counter()
+    if segment_models is not None and segment_models.load():
+        warmed = segment_models.warm()
+        print(
+            f"Segment models by {', '.join(segment_models.segment_by)} found in "
+            f"{SEGMENT_MODELS_DIR} ({len(segment_models.segments)} segments); "
+            f"preloaded {', '.join(warmed) or 'none'} "
+            f"in {time.perf_counter() - start:.3f}s."
+        )
+
+    start = time.perf_counter()
+    if comparables_store.load():
+        stats = comparables_store.stats()
+        print(
+            f"Comparables index built from {COMPARABLES_DATA_PATH} "
+            f"({stats['rows']} listings in {stats['partitions']} partitions) "
+            f"in {time.perf_counter() - start:.3f}s."
+        )
+
+
+def start_model_watchers():
+    model_watchers.append(
+        ModelFileWatcher(
+            model_registry,
+            lambda: model_files_fingerprint(
+                MODEL_ARTIFACT_DIR, MODEL_PATH, COLUMNS_PATH, INPUT_RANGES_PATH
+            ),
+            MODEL_WATCH_INTERVAL_SECONDS,
+        )
+    )
+    model_watchers.append(
+        ModelFileWatcher(
+            text_model_registry,
+            lambda: model_files_fingerprint(None, TEXT_MODEL_PATH),
+            MODEL_WATCH_INTERVAL_SECONDS,
+        )
+    )
+    for watcher in model_watchers:
+        watcher.start()
 
 
 @app.on_event("startup")
 def load_model_and_columns():
     """Load the model and the training columns when the API starts."""
-    global model, model_columns
-    if os.path.exists(MODEL_PATH) and os.path.exists(COLUMNS_PATH):
-        model = joblib.load(MODEL_PATH)
-        model_columns = joblib.load(COLUMNS_PATH)
-        print("Machine learning model and training columns loaded successfully.")
-    else:
-        print(f"Warning: Model or columns file not found.")
+    # Pre-forked workers already hold the models and index their parent loaded.
+    if not PREFORK_PARENT_PID:
+        preload_models()
+        if MODEL_WATCH_INTERVAL_SECONDS > 0:
+            start_model_watchers()
+    # Every process follows the cleaned data itself; inserts made in a pre-fork
+    # parent after forking would not reach its workers.
+    if COMPARABLES_WATCH_INTERVAL_SECONDS > 0:
+        comparables_store.start_watching(COMPARABLES_WATCH_INTERVAL_SECONDS)
+
+
+@app.on_event("startup")
+async def start_micro_batcher():
+    if micro_batcher.enabled:
+        micro_batcher.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_inference():
+    for watcher in model_watchers:
+        watcher.stop()
+    comparables_store.stop()
+    await micro_batcher.stop()
+    inference_executor.shutdown()
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # The route template, not the raw path, keeps label cardinality bounded.
+        route = request.scope.get("route")
+        endpoint = route.path if route is not None else "unmatched"
+        REQUESTS.labels(endpoint, request.method, status).inc()
+        REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - start)
+
+
+@app.exception_handler(RequestValidationError)
+async def validation_error_handler(request: Request, exc: RequestValidationError):
+    ERRORS.labels(request.url.path, "validation").inc()
+    return await request_validation_exception_handler(request, exc)
+
+
+@app.exception_handler(QueueFullError)
+async def queue_full_handler(request: Request, exc: QueueFullError):
+    ERRORS.labels(request.url.path, "queue_full").inc()
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(INFERENCE_RETRY_AFTER_SECONDS)},
+    )
 
 
 # --- API Request and Response Models ---
@@ -58,27 +453,562 @@ class PropertyFeatures(BaseModel):
     property_type: str
 
 
+class ListingFeatures(BaseModel):
+    """A listing as scraped: size like "1,200 Sqft" (or a number of sqft),
+    bedrooms as a number or "Studio", and the full location string."""
+
+    size: Union[float, str]
+    bedrooms: Union[int, str]
+    bathrooms: Optional[float] = None
+    property_type: str
+    location: str
+    description: str = ""
+    facilities: str = ""
+
+
 class PredictionResponse(BaseModel):
     predicted_price_myr: float
+    model_version: Optional[str] = None
+    # Input values input validation replaced, with the value priced instead.
+    corrections: Optional[Dict[str, Union[int, float, str]]] = None
 
 
-# --- API Endpoint ---
-@app.post("/predict", response_model=PredictionResponse)
-async def predict_price(features: PropertyFeatures):
-    if model is None or not model_columns:
+class BatchPredictionItem(BaseModel):
+    index: int
+    predicted_price_myr: Optional[float] = None
+    error: Optional[str] = None
+    corrections: Optional[Dict[str, Union[int, float, str]]] = None
+    # Set when a segment model, not the response's model_version, priced the item.
+    model_version: Optional[str] = None
+
+
+class BatchPredictionResponse(BaseModel):
+    predictions: List[BatchPredictionItem]
+    model_version: Optional[str] = None
+
+
+class Comparable(BaseModel):
+    price: float
+    area_sqft: float
+    bedrooms: int
+    bathrooms: int
+    distance: float
+
+
+class ComparablesResponse(BaseModel):
+    comparables: List[Comparable]
+    partition_size: int
+
+
+class ReloadResponse(BaseModel):
+    model_version: str
+    previous_version: Optional[str] = None
+    reloaded: bool
+
+
+# --- Inference Helpers ---
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "10000"))
+
+
+def current_bundle(endpoint, registry=model_registry):
+    """The model bundle a request should use from start to finish."""
+    bundle = registry.current
+    if bundle is None:
+        ERRORS.labels(endpoint, "model_not_loaded").inc()
         raise HTTPException(status_code=503, detail="Model is not loaded.")
+    return bundle
+
+
+def parse_body(model_class, body, family):
+    """
+    Validates a JSON request body into model_class, timed as the "parse" stage.
+    Endpoints parse their own bodies (rather than declaring a body parameter) so
+    that this time is measurable; errors still get FastAPI's usual 422 response.
+    """
+    with time_stage("parse", family):
+        try:
+            return model_class.model_validate_json(body)
+        except ValidationError as e:
+            raise RequestValidationError(
+                [
+                    {**err, "loc": ("body", *err["loc"])}
+                    for err in e.errors(include_url=False)
+                ]
+            )
+
+
+def input_error_cause(error):
+    """The ERRORS cause of an input validation error."""
+    if isinstance(error, UnknownCategoryError):
+        return "unknown_category"
+    return "invalid_input"
+
+
+async def validate_and_route(bundle, features):
+    """
+    (model, row, corrections) for parsed PropertyFeatures: the row checked against
+    the served model bundle (timed as the "validate" stage), then routed to its
+    segment's model and checked against that model's vocabulary and training
+    ranges. The row stays with bundle when there are no segment models, its
+    segment has none, or that model does not know one of its categories. Raises
+    UnknownCategoryError or InvalidInputError.
+    """
+    with time_stage("validate", bundle.family):
+        row, corrections = bundle.validator.check(
+            features.model_dump(), INPUT_RANGE_POLICY
+        )
+    if segment_models is None:
+        return bundle, row, corrections
+    name = segment_models.segment_of(row)
+    if name is None:
+        return bundle, row, corrections
+    segment = segment_models.loaded(name)
+    if segment is None:
+        # The segment's first request since startup or its eviction; its model
+        # loads off the event loop.
+        with time_stage("segment_load", bundle.family):
+            segment = await asyncio.to_thread(segment_models.get, name)
+        if segment is None:
+            return bundle, row, corrections
+    try:
+        with time_stage("validate", bundle.family):
+            segment_row, segment_corrections = segment.validator.check(
+                row, INPUT_RANGE_POLICY
+            )
+    except UnknownCategoryError:
+        return bundle, row, corrections
+    return segment, segment_row, {**corrections, **segment_corrections}
+
+
+def table_price(bundle, row):
+    """The price lookup table's answer for a canonical row, or None to run the model."""
+    # Tables are built for the served model only, not its segments'.
+    if price_table is None or bundle.segment is not None:
+        return None
+    with time_stage("table_lookup", bundle.family):
+        return price_table.lookup(bundle.version, row)
+
+
+def json_response(content, family):
+    """Serializes a response model to a JSON Response, timed as "serialize"."""
+    with time_stage("serialize", family):
+        return Response(content.model_dump_json(), media_type="application/json")
+
+
+def json_body(model_class):
+    """OpenAPI request body for endpoints that parse model_class themselves."""
+    return {
+        "requestBody": {
+            "content": {
+                "application/json": {"schema": model_class.model_json_schema()}
+            },
+            "required": True,
+        }
+    }
 
+
+# --- Micro-batching ---
+# Concurrent /predict calls are coalesced into one vectorized model call: each row
+# waits up to PREDICT_BATCH_MAX_WAIT_MS for others, up to PREDICT_BATCH_MAX_SIZE
+# rows per call. PREDICT_BATCH_MAX_SIZE=1 sends every request straight to the pool.
+micro_batcher = MicroBatcher(
+    inference_executor,
+    max_batch_size=int(os.getenv("PREDICT_BATCH_MAX_SIZE", "64")),
+    max_wait_ms=float(os.getenv("PREDICT_BATCH_MAX_WAIT_MS", "2")),
+    max_queue=int(os.getenv("PREDICT_BATCH_QUEUE_SIZE", "1024")),
+)
+
+
+def format_validation_error(error):
+    """Flattens a pydantic ValidationError into a short 'field: message' string."""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}"
+        for err in error.errors()
+    )
+
+
+def parse_batch_body(body, content_type):
+    """Splits a batch request body (JSON array or NDJSON) into raw JSON items."""
+    if "ndjson" in content_type or "jsonl" in content_type:
+        items = []
+        for line in body.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                # Keep the slot so indices still line up with the input lines.
+                items.append(e)
+        return items
+
+    try:
+        items = json.loads(body)
+    except json.JSONDecodeError as e:
+        ERRORS.labels("/predict/batch", "validation").inc()
+        raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+    if not isinstance(items, list):
+        ERRORS.labels("/predict/batch", "validation").inc()
+        raise HTTPException(
+            status_code=400, detail="Batch body must be a JSON array of properties."
+        )
+    return items
+
+
+# --- API Endpoint ---
+@app.post(
+    "/predict",
+    response_model=PredictionResponse,
+    openapi_extra=json_body(PropertyFeatures),
+)
+async def predict_price(request: Request):
+    features = parse_body(PropertyFeatures, await request.body(), "tabular")
+    bundle = current_bundle("/predict")
     try:
-        input_df = pd.DataFrame([features.dict()])
-        input_encoded = pd.get_dummies(input_df)
-        final_df = input_encoded.reindex(columns=model_columns, fill_value=0)
+        bundle, row, corrections = await validate_and_route(bundle, features)
+    except (UnknownCategoryError, InvalidInputError) as e:
+        ERRORS.labels("/predict", input_error_cause(e)).inc()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # The row is valid for this model now, so anything that fails from here on is
+    # the service's fault, not the client's.
+    try:
+        row = canonicalize_features(row, CACHE_AREA_DECIMALS)
+        key = (bundle.version, cache_key(row))
+        prediction = prediction_cache.get(key)
+        if prediction is None:
+            prediction = table_price(bundle, row)
+        if prediction is None:
+            if micro_batcher.enabled:
+                prediction = await micro_batcher.submit(bundle, row)
+            else:
+                prediction = await inference_executor.run(bundle.predict_row, row)
+            prediction_cache.put(key, prediction)
+    except QueueFullError:
+        raise
+    except Exception as e:
+        ERRORS.labels("/predict", "prediction_failed").inc()
+        raise HTTPException(status_code=500, detail=f"Prediction failed: {e}")
+    return json_response(
+        PredictionResponse(
+            predicted_price_myr=prediction,
+            model_version=bundle.version,
+            corrections=corrections or None,
+        ),
+        "tabular",
+    )
+
+
+@app.post(
+    "/predict/batch",
+    response_model=BatchPredictionResponse,
+    openapi_extra={
+        "requestBody": {
+            "content": {
+                "application/json": {
+                    "schema": {
+                        "type": "array",
+                        "items": PropertyFeatures.model_json_schema(),
+                    }
+                },
+                "application/x-ndjson": {"schema": {"type": "string"}},
+            },
+            "required": True,
+        }
+    },
+)
+async def predict_price_batch(request: Request):
+    """
+    Prices a JSON array or NDJSON stream of properties with one model call per
+    model they are routed to.
+    """
+    bundle = current_bundle("/predict/batch")
+    body = await request.body()
+
+    with time_stage("parse", "tabular"):
+        items = parse_batch_body(body, request.headers.get("content-type", ""))
+        if len(items) > MAX_BATCH_SIZE:
+            ERRORS.labels("/predict/batch", "validation").inc()
+            raise HTTPException(
+                status_code=413,
+                detail=f"Batch of {len(items)} exceeds the limit of {MAX_BATCH_SIZE}.",
+            )
+
+        # Validate every item up front; invalid ones are reported without failing
+        # the batch.
+        results = [BatchPredictionItem(index=i) for i in range(len(items))]
+        parsed = []
+        for i, item in enumerate(items):
+            if isinstance(item, Exception):
+                results[i].error = f"Invalid JSON: {item}"
+            elif not isinstance(item, dict):
+                results[i].error = "Each item must be a JSON object."
+            else:
+                try:
+                    parsed.append((i, PropertyFeatures(**item)))
+                except ValidationError as e:
+                    results[i].error = f"Invalid property: {format_validation_error(e)}"
+    if len(parsed) < len(items):
+        ERRORS.labels("/predict/batch", "validation").inc(len(items) - len(parsed))
 
-        log_prediction = model.predict(final_df)[0]
-        prediction = np.expm1(log_prediction)
+    # {model: ([item index], [row])} of the rows neither cached nor in the table.
+    pending = {}
+    for i, features in parsed:
+        try:
+            row_bundle, row, corrections = await validate_and_route(bundle, features)
+        except (UnknownCategoryError, InvalidInputError) as e:
+            ERRORS.labels("/predict/batch", input_error_cause(e)).inc()
+            results[i].error = str(e)
+            continue
+        results[i].corrections = corrections or None
+        if row_bundle is not bundle:
+            results[i].model_version = row_bundle.version
+        row = canonicalize_features(row, CACHE_AREA_DECIMALS)
+        cached = prediction_cache.get((row_bundle.version, cache_key(row)))
+        if cached is None:
+            cached = table_price(row_bundle, row)
+        if cached is not None:
+            results[i].predicted_price_myr = cached
+        else:
+            indices, rows = pending.setdefault(row_bundle, ([], []))
+            indices.append(i)
+            rows.append(row)
 
-        return {"predicted_price_myr": round(prediction, 2)}
+    for row_bundle, (indices, rows) in pending.items():
+        try:
+            prices, errors = await inference_executor.run(row_bundle.predict_rows, rows)
+        except QueueFullError:
+            raise
+        except Exception as e:
+            prices = [None] * len(rows)
+            errors = [f"Prediction failed: {e}"] * len(rows)
+        for i, row, price, error in zip(indices, rows, prices, errors):
+            if error is not None:
+                ERRORS.labels("/predict/batch", "prediction_failed").inc()
+                results[i].error = str(error)
+            else:
+                results[i].predicted_price_myr = price
+                prediction_cache.put((row_bundle.version, cache_key(row)), price)
+
+    return json_response(
+        BatchPredictionResponse(predictions=results, model_version=bundle.version),
+        "tabular",
+    )
+
+
+@app.post(
+    "/predict/listing",
+    response_model=PredictionResponse,
+    openapi_extra=json_body(ListingFeatures),
+)
+async def predict_listing_price(request: Request):
+    """
+    Prices a raw listing with the text-aware model: size, bedrooms and location
+    are parsed server-side and the description/facilities text is TF-IDF encoded.
+    """
+    listing = parse_body(ListingFeatures, await request.body(), "text")
+    bundle = current_bundle("/predict/listing", text_model_registry)
+
+    try:
+        record = listing.model_dump()
+        key = (bundle.version, tuple(sorted(record.items())))
+        prediction = prediction_cache.get(key)
+        if prediction is None:
+            if micro_batcher.enabled:
+                prediction = await micro_batcher.submit(bundle, record)
+            else:
+                prediction = await inference_executor.run(bundle.predict_row, record)
+            prediction_cache.put(key, prediction)
+    except QueueFullError:
+        raise
     except Exception as e:
+        ERRORS.labels("/predict/listing", "invalid_input").inc()
         raise HTTPException(status_code=400, detail=f"Error processing input: {e}")
+    return json_response(
+        PredictionResponse(
+            predicted_price_myr=prediction, model_version=bundle.version
+        ),
+        "text",
+    )
+
+
+@app.post(
+    "/comparables",
+    response_model=ComparablesResponse,
+    openapi_extra=json_body(PropertyFeatures),
+)
+async def find_comparables(request: Request, k: int = Query(5, ge=1)):
+    """
+    The k listings most similar in size, bedrooms and bathrooms to the property,
+    among those with the same location, listing_type and property_type; nearest
+    first. partition_size is how many listings that group holds. Category values
+    are matched as /predict matches them, against the served model's vocabulary,
+    or the listings' own while no model is loaded.
+    """
+    features = parse_body(PropertyFeatures, await request.body(), "comparables")
+    index = comparables_store.index
+    if index is None:
+        ERRORS.labels("/comparables", "index_not_loaded").inc()
+        raise HTTPException(status_code=503, detail="Comparables index is not loaded.")
+    bundle = model_registry.current
+    validator = (
+        bundle.validator if bundle is not None else comparables_store.validator()
+    )
+    try:
+        # Sizes are only compared here, so training ranges do not apply.
+        with time_stage("validate", "comparables"):
+            row, _ = validator.check(features.model_dump(), "off")
+    except (UnknownCategoryError, InvalidInputError) as e:
+        ERRORS.labels("/comparables", input_error_cause(e)).inc()
+        raise HTTPException(status_code=400, detail=str(e))
+    key = (row["location"], row["listing_type"], row["property_type"])
+    # A tree query takes tens of microseconds, so it runs on the event loop.
+    with time_stage("query", "comparables"):
+        comparables = index.query(
+            *key,
+            row["area_sqft"],
+            row["bedrooms"],
+            row["bathrooms"],
+            min(k, COMPARABLES_MAX_K),
+        )
+    return json_response(
+        ComparablesResponse(
+            comparables=comparables, partition_size=index.partition_size(*key)
+        ),
+        "comparables",
+    )
+
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=403,
+            detail="Admin endpoints are disabled; set PREDICTION_ADMIN_TOKEN.",
+        )
+    if x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=401, detail="Invalid admin token.")
+
+
+@app.post(
+    "/admin/reload",
+    response_model=ReloadResponse,
+    dependencies=[Depends(require_admin_token)],
+)
+async def reload_model():
+    """
+    Loads and smoke-tests the model on disk, then swaps it in without dropping
+    requests; on any failure the current model keeps serving.
+    """
+    previous = model_registry.current
+    loop = asyncio.get_running_loop()
+    try:
+        # Loading and validating are blocking; keep them off the event loop.
+        bundle = await loop.run_in_executor(None, model_registry.reload)
+    except ReloadInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ModelValidationError as e:
+        raise HTTPException(status_code=422, detail=f"Model rejected: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Model reload failed: {e}")
+    if PREFORK_PARENT_PID:
+        # This worker has validated the new model; the parent now reloads it once
+        # and replaces every worker, so they all serve it from shared memory.
+        os.kill(PREFORK_PARENT_PID, signal.SIGHUP)
+    previous_version = previous.version if previous is not None else None
+    return {
+        "model_version": bundle.version,
+        "previous_version": previous_version,
+        "reloaded": bundle.version != previous_version,
+    }
+
+
+@app.post("/admin/profiler/start", dependencies=[Depends(require_admin_token)])
+def start_profiler(
+    interval_ms: float = Query(PROFILER_INTERVAL_MS, ge=1, le=1000),
+    duration_seconds: float = Query(30, gt=0),
+):
+    """Starts sampling every thread's stack; stops after duration_seconds."""
+    try:
+        profiler.start(interval_ms, min(duration_seconds, PROFILER_MAX_SECONDS))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return profiler.report()
+
+
+@app.post("/admin/profiler/stop", dependencies=[Depends(require_admin_token)])
+def stop_profiler():
+    profiler.stop()
+    return profiler.report()
+
+
+@app.get("/admin/profiler", dependencies=[Depends(require_admin_token)])
+def read_profile(format: str = Query("json", pattern="^(json|folded)$"), top: int = 20):
+    """
+    The hottest frames of the current or last profile, or with format=folded the
+    full folded stacks, ready for flamegraph.pl or speedscope.
+    """
+    if format == "folded":
+        return PlainTextResponse(profiler.folded())
+    return profiler.report(top)
+
+
+@app.get("/metrics")
+def read_metrics():
+    """Counters, latency histograms and gauges in the Prometheus text format."""
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/model")
+def read_model_info():
+    """The model version being served and the outcome of the last reload."""
+    bundle = model_registry.current
+    text_bundle = text_model_registry.current
+    return {
+        "model": bundle.describe() if bundle is not None else None,
+        "text_model": text_bundle.describe() if text_bundle is not None else None,
+        "last_reload_error": model_registry.last_reload_error,
+        "watch_interval_seconds": MODEL_WATCH_INTERVAL_SECONDS,
+    }
+
+
+@app.get("/cache/stats")
+def read_cache_stats():
+    """Hit/miss/eviction counters for the in-process prediction cache."""
+    return prediction_cache.stats()
+
+
+@app.get("/price-table/stats")
+def read_price_table_stats():
+    """Hit rate of the price lookup table, and the deviation from the model
+    measured when it was built."""
+    if price_table is None:
+        return {"enabled": False}
+    return {"enabled": True, **price_table.stats()}
+
+
+@app.get("/segments/stats")
+def read_segment_stats():
+    """The segment models published, which are loaded, and how often each is used."""
+    if segment_models is None:
+        return {"enabled": False}
+    return {"enabled": True, **segment_models.stats()}
+
+
+@app.get("/comparables/stats")
+def read_comparables_stats():
+    """Size of the comparables index and how it has kept up with the data file."""
+    return comparables_store.stats()
+
+
+@app.get("/inference/stats")
+def read_inference_stats():
+    """Occupancy and rejection counters for the inference thread pool."""
+    return inference_executor.stats()
+
+
+@app.get("/batching/stats")
+def read_batching_stats():
+    """Batch-size distribution and queueing delay of the /predict micro-batcher."""
+    return micro_batcher.stats()
 
 
 @app.get("/")
@@ -0,0 +1,259 @@
+# File Path: apps/prediction-service/metrics.py
+"""
+Prometheus text-format metrics for the prediction service.
+
+A deliberately small registry (counters, gauges, histograms with labels) rendered
+in the exposition format GET /metrics serves, so the service needs no client
+library. Metrics are defined once at import time; hot paths update them with
+lock-protected increments that cost about a microsecond.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from sub-millisecond encodes to multi-second batches.
+LATENCY_BUCKETS = [
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+]
+
+
+class Histogram:
+    """A fixed-bucket histogram; counts[i] holds observations <= buckets[i]."""
+
+    def __init__(self, buckets):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def snapshot(self):
+        labels = [str(b) for b in self.buckets] + ["+Inf"]
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Family:
+    """A named metric with a fixed set of label names and one child per label set."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # callback() -> [(label values, value)], read at scrape time instead of
+        # (or in addition to) values set through labels().
+        self.callback = callback
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}.")
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        if self.callback is not None:
+            for values, value in self.callback():
+                labels = _format_labels(self.labelnames, values)
+                lines.append(f"{self.name}{labels} {_format_value(value)}")
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+
+class Counter(_Family):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def _render_child(self, values, child):
+        labels = _format_labels(self.labelnames, values)
+        return [f"{self.name}{labels} {_format_value(child.value)}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.histogram = Histogram(buckets)
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.histogram.observe(value)
+
+    @contextmanager
+    def time(self):
+        """Observes the duration of the with-block in seconds, even if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class HistogramFamily(_Family):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = list(buckets)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _render_child(self, values, child):
+        with child._lock:
+            counts = list(child.histogram.counts)
+            total = child.histogram.total
+            count = child.histogram.count
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + [float("inf")], counts):
+            cumulative += bucket_count
+            labels = _format_labels(
+                self.labelnames, values, [("le", _format_value(float(bound)))]
+            )
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """The metric families the service exposes, rendered in registration order."""
+
+    def __init__(self):
+        self._families = []
+
+    def _register(self, family):
+        self._families.append(family)
+        return family
+
+    def counter(self, name, documentation, labelnames=(), callback=None):
+        return self._register(Counter(name, documentation, labelnames, callback))
+
+    def gauge(self, name, documentation, labelnames=(), callback=None):
+        return self._register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(HistogramFamily(name, documentation, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for family in self._families:
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# Content type of the Prometheus text exposition format.
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REQUESTS = REGISTRY.counter(
+    "prediction_http_requests_total",
+    "HTTP requests handled, by route template, method and status code.",
+    ["endpoint", "method", "status"],
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "prediction_http_request_duration_seconds",
+    "End-to-end handling time of HTTP requests, by route template.",
+    ["endpoint"],
+)
+ERRORS = REGISTRY.counter(
+    "prediction_errors_total",
+    "Rejected predictions by cause: unknown_category, validation, "
+    "model_not_loaded, queue_full, invalid_input or prediction_failed. Batch "
+    "items count one each.",
+    ["endpoint", "cause"],
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "prediction_stage_duration_seconds",
+    "Time per prediction stage: parse (JSON + pydantic), validate, segment_load, "
+    "encode, predict (one model call, which may cover a micro-batch) and serialize.",
+    ["stage", "model"],
+)
+MODEL_LOAD_SECONDS = REGISTRY.gauge(
+    "prediction_model_load_seconds",
+    "How long the most recent load of each model family took.",
+    ["model"],
+)
+MODEL_LOAD_RSS_BYTES = REGISTRY.gauge(
+    "prediction_model_load_rss_bytes",
+    "Resident memory added by the most recent load of each model family.",
+    ["model"],
+)
+
+
+def time_stage(stage, model):
+    """Context manager recording one prediction stage in STAGE_SECONDS."""
+    return STAGE_SECONDS.labels(stage, model).time()
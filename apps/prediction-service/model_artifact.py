@@ -0,0 +1,186 @@
+# File Path: apps/prediction-service/model_artifact.py
+"""
+Compact, memory-mappable model artifacts.
+
+An artifact is a directory holding a small manifest.json (column list, estimator
+type and how to combine tree outputs) plus one .npy file per node array, in the
+flattened layout tree_engine evaluates, and the model's training input ranges
+(model_input_ranges.json, see input_validation.py) when it was published with
+them, so they are versioned and reloaded with the model. Loading is a handful of
+np.load(mmap_mode="r") calls instead of unpickling an estimator, and every uvicorn
+worker that maps the same files shares their pages.
+
+Each published model gets its own <root>/<version>/ directory and <root>/CURRENT
+names the live one (see publish_artifact). Publish an existing joblib model with:
+    python model_artifact.py property_price_model.joblib model_columns.joblib model_artifact
+        [model_input_ranges.json]
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from input_validation import load_input_ranges, save_input_ranges
+from tree_engine import build_model, flatten_estimator
+
+# Node indices are intp with self-looping leaves (see tree_engine). Only this
+# version loads; older artifacts must be published again from their model.
+FORMAT_VERSION = 3
+MANIFEST_FILENAME = "manifest.json"
+RANGES_FILENAME = "model_input_ranges.json"
+# Published artifacts live in <root>/<version>/; <root>/CURRENT names the live one.
+POINTER_FILENAME = "CURRENT"
+KEEP_VERSIONS = 3
+
+
+def _content_version(fields, arrays, columns, input_ranges=None):
+    """
+    A short hash of everything that affects predictions, and of the format, so an
+    artifact published again in a new format does not reuse the old directory.
+    """
+    digest = hashlib.sha256()
+    digest.update(
+        json.dumps(
+            [FORMAT_VERSION, fields, list(columns), input_ranges], sort_keys=True
+        ).encode()
+    )
+    for name in sorted(arrays):
+        digest.update(np.ascontiguousarray(arrays[name]).tobytes())
+    return digest.hexdigest()[:12]
+
+
+def export_artifact(model, columns, path, target_transform="log1p", input_ranges=None):
+    """
+    Writes model, its training columns and, if given, its training input ranges
+    to the artifact directory at path.
+    """
+    fields, arrays = flatten_estimator(model)
+    os.makedirs(path, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f"{name}.npy"), array)
+    if input_ranges is not None:
+        save_input_ranges(os.path.join(path, RANGES_FILENAME), input_ranges)
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "version": _content_version(fields, arrays, columns, input_ranges),
+        "estimator": type(model).__name__,
+        **fields,
+        "target_transform": target_transform,
+        "columns": list(columns),
+        "arrays": sorted(arrays),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    with open(os.path.join(path, MANIFEST_FILENAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def publish_artifact(model, columns, root, target_transform="log1p", input_ranges=None):
+    """
+    Exports into <root>/<version>/ and then atomically repoints <root>/CURRENT.
+
+    Files a running server has memory-mapped are never rewritten in place, so a
+    hot reload can swap versions while in-flight requests finish on the old one.
+    Returns (manifest, artifact directory).
+    """
+    os.makedirs(root, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".staging-", dir=root)
+    manifest = export_artifact(model, columns, staging, target_transform, input_ranges)
+    path = os.path.join(root, manifest["version"])
+    if os.path.isdir(path):
+        shutil.rmtree(staging)  # The exact same model is already published.
+    else:
+        os.rename(staging, path)
+
+    pointer_tmp = os.path.join(root, f".{POINTER_FILENAME}.tmp")
+    with open(pointer_tmp, "w") as f:
+        f.write(manifest["version"])
+    os.replace(pointer_tmp, os.path.join(root, POINTER_FILENAME))
+    _prune_versions(root, keep=KEEP_VERSIONS, current=manifest["version"])
+    return manifest, path
+
+
+def _prune_versions(root, keep, current):
+    """Deletes all but the newest `keep` published versions (always keeping current)."""
+    versions = [
+        name
+        for name in os.listdir(root)
+        if not name.startswith(".")
+        and name != current
+        and os.path.isfile(os.path.join(root, name, MANIFEST_FILENAME))
+    ]
+    versions.sort(key=lambda name: os.path.getmtime(os.path.join(root, name)))
+    # Unlinking is safe even if a worker still maps these files.
+    for name in versions[: max(len(versions) - (keep - 1), 0)]:
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+# --- Loading ---
+def resolve_artifact_dir(path):
+    """
+    Returns the directory holding the live artifact under path: the version named
+    by a CURRENT pointer, or path itself for a plain exported artifact. Returns None
+    when there is no artifact.
+    """
+    pointer = os.path.join(path, POINTER_FILENAME)
+    if os.path.isfile(pointer):
+        with open(pointer) as f:
+            return os.path.join(path, f.read().strip())
+    if os.path.isfile(os.path.join(path, MANIFEST_FILENAME)):
+        return path
+    return None
+
+
+def load_artifact(path, mmap=True):
+    """Loads an artifact directory, memory-mapping its arrays read-only by default."""
+    with open(os.path.join(path, MANIFEST_FILENAME)) as f:
+        manifest = json.load(f)
+    if manifest["format_version"] != FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported artifact format {manifest['format_version']} in {path}; "
+            f"publish it again with this version of model_artifact.py."
+        )
+
+    arrays = {
+        name: np.load(
+            os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None
+        )
+        for name in manifest["arrays"]
+    }
+    return build_model(manifest, arrays)
+
+
+def load_artifact_ranges(path):
+    """The input ranges published in an artifact directory, or None."""
+    return load_input_ranges(os.path.join(path, RANGES_FILENAME))
+
+
+def artifact_size_bytes(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (4, 5):
+        print(__doc__)
+        sys.exit(1)
+
+    import joblib
+
+    model_path, columns_path, artifact_root = sys.argv[1:4]
+    manifest, artifact_dir = publish_artifact(
+        joblib.load(model_path),
+        joblib.load(columns_path),
+        artifact_root,
+        input_ranges=load_input_ranges(sys.argv[4]) if len(sys.argv) == 5 else None,
+    )
+    print(
+        f"Published {manifest['estimator']} version {manifest['version']} to "
+        f"'{artifact_dir}' ({artifact_size_bytes(artifact_dir) / 1e6:.1f} MB)."
+    )
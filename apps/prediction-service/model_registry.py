@@ -0,0 +1,386 @@
+# File Path: apps/prediction-service/model_registry.py
+import csv
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+
+from feature_encoder import CATEGORICAL_FEATURES, FeatureEncoder
+from input_validation import InputValidator, load_input_ranges
+from metrics import time_stage
+from model_artifact import load_artifact, load_artifact_ranges, resolve_artifact_dir
+from text_features import TextFeatureEncoder, engineer_features
+from tree_engine import compile_estimator
+
+
+class ModelValidationError(RuntimeError):
+    """Raised when a freshly loaded model fails its smoke test."""
+
+
+class ReloadInProgressError(RuntimeError):
+    """Raised when a reload is requested while another one is still running."""
+
+
+class ModelBundle:
+    """
+    An immutable (model, columns, encoder, version) snapshot.
+
+    validator checks requests against this model's vocabularies and the training
+    ranges it was given (see input_validation.py) before they are encoded.
+    Requests grab the registry's current bundle once and use it throughout, so a
+    reload never mixes one model's columns with another model's trees.
+    """
+
+    # Label of this model family in the stage-latency metrics.
+    family = "tabular"
+    # The segment this model serves, when it is one of segment_models' models.
+    segment = None
+
+    def __init__(
+        self, model, columns, version, source, input_ranges=None, aliases=None
+    ):
+        self.model = model
+        self.columns = list(columns)
+        self.encoder = FeatureEncoder(self.columns)
+        self.validator = InputValidator(self.encoder, input_ranges, aliases)
+        self.version = version
+        self.source = source
+        self.loaded_at = time.time()
+
+    def predict_matrix(self, encoded):
+        """Runs a single vectorized model call and returns prices in MYR, in row order."""
+        with time_stage("predict", self.family):
+            log_predictions = self.model.predict(encoded)
+        return np.round(np.expm1(log_predictions), 2)
+
+    def predict_rows(self, rows):
+        """
+        Encodes and prices a list of canonical feature dicts in one model call.
+
+        Returns (prices, errors) aligned with rows; rows with unknown categories get a
+        price of None and an UnknownCategoryError.
+        """
+        with time_stage("encode", self.family):
+            encoded, errors = self.encoder.encode_batch(rows)
+        known = [i for i, error in enumerate(errors) if error is None]
+        prices = [None] * len(rows)
+        if known:
+            for i, price in zip(known, self.predict_matrix(encoded[known])):
+                prices[i] = float(price)
+        return prices, errors
+
+    def predict_row(self, row):
+        """Encodes and prices a single canonical feature dict."""
+        with time_stage("encode", self.family):
+            encoded = self.encoder.encode(row)
+        return float(self.predict_matrix(encoded)[0])
+
+    def describe(self):
+        return {
+            "version": self.version,
+            "source": self.source,
+            "estimator": getattr(self.model, "manifest", {}).get(
+                "estimator", type(self.model).__name__
+            ),
+            "n_columns": len(self.columns),
+            "loaded_at": time.strftime(
+                "%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.loaded_at)
+            ),
+            "input_validation": self.validator.describe(),
+        }
+
+
+class TextModelBundle:
+    """
+    The text-aware listing pipeline (train/gemini_train_random_forest.py), split
+    for serving into a TextFeatureEncoder for its ColumnTransformer and its
+    regressor. Requests carry raw listing fields; the pipeline predicts prices in
+    MYR directly, not log prices.
+    """
+
+    family = "text"
+
+    def __init__(self, pipeline, version, source, native_inference=True):
+        if len(pipeline.steps) != 2:
+            raise ValueError("Expected a (preprocessor, regressor) pipeline.")
+        (_, preprocessor), (_, regressor) = pipeline.steps
+        self.encoder = TextFeatureEncoder(preprocessor)
+        self.columns = self.encoder.columns
+        self.model = regressor
+        self.version = version
+        self.source = source
+        self.loaded_at = time.time()
+        if native_inference:
+            try:
+                self.model = compile_estimator(regressor, self.columns, "none")
+                self.source += " (compiled to the tree engine)"
+            except ValueError as e:
+                print(f"Warning: {e} Serving it with sklearn instead.")
+
+    def predict_matrix(self, encoded):
+        with time_stage("predict", self.family):
+            return np.round(self.model.predict(encoded), 2)
+
+    def predict_rows(self, listings):
+        """
+        Prices a list of raw listing dicts in one model call. Returns (prices,
+        errors) like ModelBundle.predict_rows; unknown categories are not errors
+        here, the pipeline's one-hot encoder ignores them.
+        """
+        with time_stage("encode", self.family):
+            engineered = [engineer_features(listing) for listing in listings]
+            encoded = self.encoder.encode_batch(engineered)
+        prices = self.predict_matrix(encoded)
+        return [float(price) for price in prices], [None] * len(listings)
+
+    def predict_row(self, listing):
+        return self.predict_rows([listing])[0][0]
+
+    def describe(self):
+        return {
+            "version": self.version,
+            "source": self.source,
+            "estimator": type(self.model).__name__,
+            "n_columns": len(self.columns),
+            "loaded_at": time.strftime(
+                "%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.loaded_at)
+            ),
+        }
+
+
+def _file_version(*paths):
+    """A short content hash identifying a set of model files."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def load_bundle(
+    artifact_dir,
+    model_path,
+    columns_path,
+    native_inference=True,
+    ranges_path=None,
+    aliases=None,
+):
+    """
+    Loads the model the service should serve, preferring the compact artifact over
+    the pickled model. Returns None when neither is present. Requests are validated
+    against the training ranges published in the artifact, or for a pickled model
+    (or an artifact published without them) those at ranges_path when the file
+    exists; category aliases ({feature: {alias: value}}) are added to the built-in
+    ones.
+    """
+    resolved_dir = resolve_artifact_dir(artifact_dir)
+    if resolved_dir is not None:
+        model = load_artifact(resolved_dir)
+        input_ranges = load_artifact_ranges(resolved_dir)
+        if input_ranges is None:
+            input_ranges = load_input_ranges(ranges_path)
+        version = model.manifest.get("version") or _file_version(
+            os.path.join(resolved_dir, "manifest.json")
+        )
+        return ModelBundle(
+            model,
+            model.columns,
+            version,
+            f"artifact '{resolved_dir}'",
+            input_ranges,
+            aliases,
+        )
+
+    if not (os.path.exists(model_path) and os.path.exists(columns_path)):
+        return None
+
+    # Only the pickle fallback needs joblib (and, through it, sklearn).
+    import joblib
+
+    model = joblib.load(model_path)
+    columns = joblib.load(columns_path)
+    input_ranges = load_input_ranges(ranges_path)
+    source = f"'{model_path}'"
+    if native_inference:
+        try:
+            model = compile_estimator(model, columns)
+            source += " (compiled to the tree engine)"
+        except ValueError as e:
+            print(f"Warning: {e} Serving it with sklearn instead.")
+    return ModelBundle(
+        model,
+        columns,
+        _file_version(model_path, columns_path),
+        source,
+        input_ranges,
+        aliases,
+    )
+
+
+def load_text_bundle(model_path, native_inference=True):
+    """Loads the pickled text-aware pipeline, or returns None if it is absent."""
+    if not os.path.exists(model_path):
+        return None
+
+    import joblib
+
+    return TextModelBundle(
+        joblib.load(model_path),
+        _file_version(model_path),
+        f"'{model_path}'",
+        native_inference,
+    )
+
+
+def load_smoke_dataset(path):
+    """Reads the smoke-test rows (cleaned-data CSV layout, including price)."""
+    with open(path, newline="") as f:
+        return [
+            {
+                "area_sqft": float(record["area_sqft"]),
+                "bedrooms": int(float(record["bedrooms"])),
+                "bathrooms": int(float(record["bathrooms"])),
+                **{feature: record[feature] for feature in CATEGORICAL_FEATURES},
+                "price": float(record["price"]),
+            }
+            for record in csv.DictReader(f)
+        ]
+
+
+def validate_bundle(bundle, smoke_rows, max_median_log_error):
+    """
+    Smoke-tests a bundle before it is allowed to serve traffic: every row must
+    encode and get a finite, positive price, and the median |log error| against the
+    listed prices must stay within max_median_log_error.
+    """
+    if not smoke_rows:
+        return
+    prices, errors = bundle.predict_rows(smoke_rows)
+    failures = [str(e) for e in errors if e is not None]
+    if failures:
+        raise ModelValidationError(f"Smoke rows could not be encoded: {failures[0]}")
+
+    prices = np.asarray(prices, dtype=float)
+    if not np.all(np.isfinite(prices)) or np.any(prices <= 0):
+        raise ModelValidationError("Model returned non-finite or non-positive prices.")
+
+    actual = np.array([row["price"] for row in smoke_rows])
+    median_log_error = float(np.median(np.abs(np.log1p(prices) - np.log1p(actual))))
+    if median_log_error > max_median_log_error:
+        raise ModelValidationError(
+            f"Median |log error| on the smoke dataset is {median_log_error:.3f} "
+            f"(limit {max_median_log_error})."
+        )
+
+
+class ModelRegistry:
+    """
+    Holds the bundle currently being served and swaps in new ones atomically.
+
+    reload() loads and validates a candidate entirely off to the side; only once it
+    has passed is the single `current` reference replaced. Requests already running
+    keep the bundle they started with, so they finish on the old version.
+    """
+
+    def __init__(self, loader, validator=None):
+        self._loader = loader
+        self._validator = validator
+        self._reload_lock = threading.Lock()
+        self._listeners = []
+        self.current = None
+        self.last_reload_error = None
+
+    def on_swap(self, callback):
+        """Registers callback(new_bundle, old_bundle), called after every swap."""
+        self._listeners.append(callback)
+
+    def swap(self, bundle):
+        previous, self.current = self.current, bundle
+        for callback in self._listeners:
+            callback(bundle, previous)
+        return previous
+
+    def reload(self, validate=True):
+        """Loads, validates and swaps in the model on disk; returns the new bundle."""
+        if not self._reload_lock.acquire(blocking=False):
+            raise ReloadInProgressError("A model reload is already in progress.")
+        try:
+            bundle = self._loader()
+            if bundle is None:
+                raise FileNotFoundError("Model or columns file not found.")
+            if validate and self._validator is not None:
+                self._validator(bundle)
+            self.swap(bundle)
+            self.last_reload_error = None
+            return bundle
+        except Exception as e:
+            self.last_reload_error = str(e)
+            raise
+        finally:
+            self._reload_lock.release()
+
+
+def model_files_fingerprint(
+    artifact_dir, model_path, columns_path=None, ranges_path=None
+):
+    """Identifies the model files on disk, so a watcher can notice new ones."""
+    resolved_dir = resolve_artifact_dir(artifact_dir) if artifact_dir else None
+    paths = [
+        path for path in (model_path, columns_path, ranges_path) if path is not None
+    ]
+    if resolved_dir is not None:
+        paths.append(os.path.join(resolved_dir, "manifest.json"))
+    fingerprint = [resolved_dir]
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            fingerprint.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            fingerprint.append((path, None, None))
+    return tuple(fingerprint)
+
+
+class ModelFileWatcher:
+    """Polls the model files and hot-reloads the registry when they change."""
+
+    def __init__(self, registry, fingerprint, interval_seconds):
+        self.registry = registry
+        self.fingerprint = fingerprint
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._last_seen = self.fingerprint()
+        self._thread = threading.Thread(
+            target=self._run, name="model-file-watcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        pending = None
+        while not self._stop.wait(self.interval_seconds):
+            current = self.fingerprint()
+            if current == self._last_seen:
+                pending = None
+                continue
+            # Wait for the files to stay unchanged for one full interval, so a model
+            # that is still being written is never picked up half-way.
+            if current != pending:
+                pending = current
+                continue
+            self._last_seen = current
+            pending = None
+            try:
+                bundle = self.registry.reload()
+                print(f"Model files changed; now serving version {bundle.version}.")
+            except ReloadInProgressError:
+                self._last_seen = None  # Try again on the next tick.
+            except Exception as e:
+                print(f"Warning: model hot-reload failed, keeping current model: {e}")
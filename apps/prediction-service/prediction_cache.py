@@ -0,0 +1,111 @@
+# File Path: apps/prediction-service/prediction_cache.py
+import threading
+import time
+from collections import OrderedDict
+
+from feature_encoder import CATEGORICAL_FEATURES, normalize_category
+
+
+def canonicalize_features(row, area_decimals=0):
+    """
+    Returns the canonical form of a feature dict: category values trimmed and
+    area_sqft rounded. Predictions are made on this form, so a cached price is
+    exactly what a live prediction for the same request would return.
+    """
+    canonical = dict(row)
+    for feature in CATEGORICAL_FEATURES:
+        canonical[feature] = row[feature].strip()
+    canonical["area_sqft"] = round(float(row["area_sqft"]), area_decimals)
+    return canonical
+
+
+def cache_key(canonical):
+    """
+    Builds a hashable cache key from a canonicalized feature dict. Category values
+    are case-folded, matching how FeatureEncoder looks them up.
+    """
+    return tuple(
+        sorted(
+            (name, normalize_category(value) if name in CATEGORICAL_FEATURES else value)
+            for name, value in canonical.items()
+        )
+    )
+
+
+class PredictionCache:
+    """
+    A thread-safe, bounded LRU cache of predicted prices with a per-entry TTL.
+    Keys are (model version, request key) tuples, so one model's prices can be
+    dropped without touching another's.
+    """
+
+    def __init__(self, max_entries, ttl_seconds, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get(self, key):
+        """Returns the cached value for key, or None on a miss or expired entry."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Stores value under key, evicting the least recently used entry if full."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (value, self._clock() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drops every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def discard_version(self, version):
+        """Drops the prices of one model version, e.g. after it has been replaced."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == version]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
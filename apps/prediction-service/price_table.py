@@ -0,0 +1,234 @@
+# File Path: apps/prediction-service/price_table.py
+"""
+Precomputed prices for the common feature grid, looked up instead of running the model.
+
+A table is a directory holding manifest.json and prices.npy, a float32 array of
+shape (groups, bedrooms, bathrooms, area nodes) with the served model's price at
+every grid point. Groups are the (location, listing_type, property_type)
+combinations seen in the cleaned data, bedrooms and bathrooms the most common
+counts, and the area nodes are evenly spaced in log(area_sqft) between the rarest
+1% of sizes at either end. train/build_price_table.py writes it.
+
+A request inside the grid is priced by interpolating linearly in log(area_sqft)
+between the two nodes around it, in microseconds. Tree models are step
+functions of area, so an interval between two nodes can hide a jump; valid.npy
+flags the intervals where interpolation stayed within the build's max_deviation
+of the model on both sides of every area split inside them (at sampled areas
+for a model that is not a tree). Requests in other intervals, and anything
+off the grid (an unusual bedroom count, a very small or large unit, a
+combination the data never had), go to the model. A table only answers for the
+model version it was built from, so a reload never serves prices from the
+previous model; the manifest records the deviations measured at build time.
+
+prices.npy and valid.npy are memory-mapped, so pre-forked workers share one copy.
+"""
+
+import json
+import math
+import os
+import shutil
+import time
+
+import numpy as np
+
+from feature_encoder import CATEGORICAL_FEATURES, normalize_category
+
+FORMAT_VERSION = 1
+MANIFEST_FILENAME = "manifest.json"
+PRICES_FILENAME = "prices.npy"
+VALID_FILENAME = "valid.npy"
+# How often a missing or stale table is looked for again on disk.
+RECHECK_SECONDS = 1.0
+
+
+def save_table(path, prices, valid, manifest):
+    """Writes a table directory, replacing any table already at path."""
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    np.save(os.path.join(tmp_path, PRICES_FILENAME), prices.astype(np.float32))
+    np.save(os.path.join(tmp_path, VALID_FILENAME), valid.astype(bool))
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "shape": list(prices.shape),
+        **manifest,
+    }
+    with open(os.path.join(tmp_path, MANIFEST_FILENAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+    # Readers that find no table for a moment fall back to the model.
+    old_path = f"{path}.old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+class PriceTable:
+    """A loaded table; lookup() prices canonical feature dicts inside its grid."""
+
+    def __init__(self, prices, valid, manifest):
+        # Plain ndarray views of the mapped files: indexing np.memmap is much slower.
+        self.prices = np.asarray(prices)
+        self.valid = np.asarray(valid)
+        self.manifest = manifest
+        self.model_version = manifest["model_version"]
+        self.groups = {
+            tuple(normalize_category(value) for value in group): i
+            for i, group in enumerate(manifest["groups"])
+        }
+        self.bedrooms = {int(value): i for i, value in enumerate(manifest["bedrooms"])}
+        self.bathrooms = {
+            int(value): i for i, value in enumerate(manifest["bathrooms"])
+        }
+        self.log_area_min = manifest["log_area_min"]
+        self.log_area_step = manifest["log_area_step"]
+        self.last_node = manifest["area_nodes"] - 1
+        self.area_range = (
+            float(np.exp(self.log_area_min)),
+            float(np.exp(self.log_area_min + self.last_node * self.log_area_step)),
+        )
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        with open(os.path.join(path, MANIFEST_FILENAME)) as f:
+            manifest = json.load(f)
+        if manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported price table format {manifest.get('format_version')}."
+            )
+        mmap_mode = "r" if mmap else None
+        prices = np.load(os.path.join(path, PRICES_FILENAME), mmap_mode=mmap_mode)
+        valid = np.load(os.path.join(path, VALID_FILENAME), mmap_mode=mmap_mode)
+        shape = manifest["shape"]
+        intervals = shape[:-1] + [shape[-1] - 1]
+        if list(prices.shape) != shape or list(valid.shape) != intervals:
+            raise ValueError("The price table arrays do not match its manifest.")
+        return cls(prices, valid, manifest)
+
+    def locate(self, row):
+        """
+        (group, bedrooms, bathrooms, node, fraction) of a canonical feature dict:
+        its interval's index and where its area lies between the interval's two
+        nodes. None when it is off the grid.
+        """
+        group = self.groups.get(
+            tuple(normalize_category(row[feature]) for feature in CATEGORICAL_FEATURES)
+        )
+        bedrooms = self.bedrooms.get(row["bedrooms"])
+        bathrooms = self.bathrooms.get(row["bathrooms"])
+        if group is None or bedrooms is None or bathrooms is None:
+            return None
+        area_sqft = row["area_sqft"]
+        if area_sqft <= 0:
+            return None
+        position = (math.log(area_sqft) - self.log_area_min) / self.log_area_step
+        if not 0.0 <= position <= self.last_node:
+            return None
+        node = min(int(position), self.last_node - 1)
+        return group, bedrooms, bathrooms, node, position - node
+
+    def interpolate(self, located):
+        """The price at a locate() result, whether or not its interval is valid."""
+        group, bedrooms, bathrooms, node, fraction = located
+        low = float(self.prices[group, bedrooms, bathrooms, node])
+        high = float(self.prices[group, bedrooms, bathrooms, node + 1])
+        return round(low + (high - low) * fraction, 2)
+
+    def lookup(self, row):
+        """The table's price for a canonical feature dict, or None to run the model."""
+        located = self.locate(row)
+        if located is None or not self.valid[located[:4]]:
+            return None
+        return self.interpolate(located)
+
+    def describe(self):
+        return {
+            "model_version": self.model_version,
+            "created_at": self.manifest["created_at"],
+            "shape": self.manifest["shape"],
+            "max_deviation": self.manifest.get("max_deviation"),
+            "valid_intervals": self.manifest.get("valid_intervals"),
+            "area_range_sqft": [round(area, 1) for area in self.area_range],
+            "build_report": self.manifest.get("report", {}),
+        }
+
+
+class PriceTableStore:
+    """
+    The table at path, for whichever model version is being served. While there
+    is no table for that version, the directory is checked again at most every
+    RECHECK_SECONDS in case one has been built since.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.table = None
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.last_error = None
+        self._manifest_mtime = None
+        self._checked_at = None
+
+    def load(self):
+        """Loads the table if its files changed; returns whether one is loaded."""
+        self._checked_at = time.monotonic()
+        manifest_path = os.path.join(self.path, MANIFEST_FILENAME)
+        try:
+            mtime = os.stat(manifest_path).st_mtime_ns
+        except OSError:
+            self.table, self._manifest_mtime = None, None
+            return False
+        if mtime != self._manifest_mtime:
+            try:
+                self.table = PriceTable.load(self.path)
+                self.last_error = None
+            except (OSError, ValueError, KeyError) as e:
+                self.table, self.last_error = None, str(e)
+            self._manifest_mtime = mtime
+        return self.table is not None
+
+    def for_version(self, model_version):
+        """The table built from model_version, or None."""
+        table = self.table
+        if table is not None and table.model_version == model_version:
+            return table
+        if (
+            self._checked_at is not None
+            and time.monotonic() - self._checked_at < RECHECK_SECONDS
+        ):
+            return None
+        if self.load() and self.table.model_version == model_version:
+            return self.table
+        return None
+
+    def lookup(self, model_version, row):
+        """A table price for row under model_version, or None to run the model."""
+        table = self.for_version(model_version)
+        if table is None:
+            if self.table is not None:
+                self.stale += 1
+            self.misses += 1
+            return None
+        price = table.lookup(row)
+        if price is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return price
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        table = self.table
+        return {
+            "path": self.path,
+            "loaded": table is not None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_lookups": self.stale,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "last_error": self.last_error,
+            "table": table.describe() if table is not None else None,
+        }
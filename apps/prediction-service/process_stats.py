@@ -0,0 +1,54 @@
+# File Path: apps/prediction-service/process_stats.py
+import resource
+import sys
+
+
+def rss_bytes():
+    """Current resident set size of this process, in bytes."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * resource.getpagesize()
+    except (OSError, IndexError, ValueError):
+        # No procfs (e.g. macOS): fall back to the peak RSS, which is close enough.
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process, in bytes."""
+    # VmHWM belongs to the current process image; ru_maxrss survives exec on Linux,
+    # so a child started from a large parent would report the parent's peak.
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, IndexError, ValueError):
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def memory_breakdown(pid="self"):
+    """
+    RSS, PSS and private (USS) bytes of a process from /proc/<pid>/smaps_rollup.
+
+    Pages shared between forked workers count fully in each one's RSS but are split
+    between them in PSS, so summing PSS over a process tree gives its real footprint.
+    Returns None where smaps_rollup is unavailable (non-Linux, kernels before 4.14).
+    """
+    fields = {"Rss": 0, "Pss": 0, "Private_Clean": 0, "Private_Dirty": 0}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name in fields:
+                    fields[name] = int(value.split()[0]) * 1024
+    except (OSError, IndexError, ValueError):
+        return None
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "private": fields["Private_Clean"] + fields["Private_Dirty"],
+    }
@@ -0,0 +1,123 @@
+# File Path: apps/prediction-service/profiler.py
+"""
+An opt-in sampling profiler that can be switched on in a running service.
+
+A daemon thread wakes every interval, reads every other thread's current Python
+stack from sys._current_frames() and counts identical stacks. Nothing is traced
+between samples, so the only cost is the sampling thread itself, and only while
+a profile is running. Results come out as "folded" stacks (one
+"thread;outer;...;inner count" line per distinct stack), the input format of
+flamegraph.pl and speedscope, plus a short list of the hottest frames.
+"""
+
+import collections
+import os
+import sys
+import threading
+import time
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+
+
+class SamplingProfiler:
+    def __init__(self):
+        self.interval_seconds = None
+        self.started_at = None
+        self.stopped_at = None
+        self.samples = 0
+        self._stacks = collections.Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_ms, duration_seconds):
+        """
+        Starts a fresh profile, discarding the previous one. The sampler stops by
+        itself after duration_seconds, so a forgotten profile cannot keep running.
+        """
+        if self.running:
+            raise RuntimeError("The profiler is already running.")
+        with self._lock:
+            self._stacks.clear()
+            self.samples = 0
+        self.interval_seconds = interval_ms / 1000
+        self.started_at = time.time()
+        self.stopped_at = None
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(duration_seconds,),
+            name="sampling-profiler",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self, duration_seconds):
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + duration_seconds
+        while not self._stop.wait(self.interval_seconds):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            sampled = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                sampled.append(";".join(reversed(stack)))
+            with self._lock:
+                self._stacks.update(sampled)
+                self.samples += 1
+            if time.monotonic() >= deadline:
+                break
+        self.stopped_at = time.time()
+
+    def folded(self):
+        """The profile as folded stacks, most frequent first."""
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def report(self, top=20):
+        """Sampling status plus the frames most often on top of a stack ("self"
+        time) and anywhere in it ("total" time)."""
+        with self._lock:
+            stacks = list(self._stacks.items())
+            samples = self.samples
+        own = collections.Counter()
+        total = collections.Counter()
+        for stack, count in stacks:
+            frames = stack.split(";")[1:]  # Drop the thread name.
+            if frames:
+                own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        end = self.stopped_at or time.time()
+        return {
+            "running": self.running,
+            "interval_ms": (
+                self.interval_seconds * 1000 if self.interval_seconds else None
+            ),
+            "duration_seconds": (
+                round(end - self.started_at, 3) if self.started_at else 0.0
+            ),
+            "samples": samples,
+            "top_self": own.most_common(top),
+            "top_total": total.most_common(top),
+        }
@@ -0,0 +1,229 @@
+# File Path: apps/prediction-service/segment_models.py
+"""
+Per-segment models that /predict routes requests to by their category values.
+
+train/segments.py trains a model for each segment of the listings (by
+listing_type, say) into a directory holding manifest.json and one subdirectory
+per segment, laid out like the service's own model files (segment_files). A
+segment is named after its values ("rent", "sale-condo") and requests reach it
+by theirs, matched as FeatureEncoder matches categories.
+
+Segment models load on their first request, not at startup (but for the
+`preload` most-trained ones, see warm()), and at most max_loaded stay in
+memory, the least recently used evicted first, so rarely asked-for segments of
+a fine-grained split cost nothing until they are asked for. Requests in a segment with no
+model are left to the global model. When the manifest changes (a new training
+run), every loaded segment model is dropped and loaded again on demand.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from feature_encoder import normalize_category
+from model_registry import load_bundle
+
+FORMAT_VERSION = 1
+MANIFEST_FILENAME = "manifest.json"
+# Name of the global model in train/segments.py's report.
+GLOBAL_SEGMENT = "global"
+# How often the manifest is looked at again for a new training run.
+RECHECK_SECONDS = 1.0
+
+_NON_ALPHANUMERIC = re.compile(r"[^0-9a-z]+")
+
+
+def segment_name(values):
+    """The directory name of the segment with {feature: value} values."""
+    return "-".join(
+        _NON_ALPHANUMERIC.sub("-", normalize_category(value)).strip("-")
+        for value in values.values()
+    )
+
+
+def segment_files(directory):
+    """The model files of a segment directory, named as the service's own are."""
+    return {
+        "model": os.path.join(directory, "property_price_model.joblib"),
+        "columns": os.path.join(directory, "model_columns.joblib"),
+        "ranges": os.path.join(directory, "model_input_ranges.json"),
+        "artifact": os.path.join(directory, "model_artifact"),
+    }
+
+
+def load_segment_bundle(directory, native_inference=True, aliases=None):
+    files = segment_files(directory)
+    return load_bundle(
+        files["artifact"],
+        files["model"],
+        files["columns"],
+        native_inference,
+        files["ranges"],
+        aliases,
+    )
+
+
+class SegmentModels:
+    """
+    The segment models under path. segment_of() finds a validated row's segment;
+    loaded() returns its model if it is in memory and get() loads it if not,
+    which takes a model load, so callers on an event loop should run it in a
+    thread.
+    """
+
+    def __init__(
+        self, path, max_loaded=8, preload=0, native_inference=True, aliases=None
+    ):
+        self.path = path
+        self.max_loaded = max_loaded
+        self.preload = preload
+        self.native_inference = native_inference
+        self.aliases = aliases
+        self.manifest = None
+        self.segment_by = []
+        self.segments = {}
+        self.loads = 0
+        self.evictions = 0
+        self.last_error = None
+        self._bundles = OrderedDict()
+        self._requests = {}
+        # _lock guards the loaded models and is only held briefly; _load_lock
+        # makes concurrent first requests for a segment load it once.
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._manifest_mtime = None
+        self._checked_at = None
+
+    def load(self):
+        """Rereads the manifest if it changed; returns whether there are segments."""
+        self._checked_at = time.monotonic()
+        manifest_path = os.path.join(self.path, MANIFEST_FILENAME)
+        try:
+            mtime = os.stat(manifest_path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._manifest_mtime:
+            return bool(self.segments)
+        manifest, segments = None, {}
+        if mtime is not None:
+            try:
+                with open(manifest_path) as f:
+                    manifest = json.load(f)
+                if manifest.get("format_version") != FORMAT_VERSION:
+                    raise ValueError(
+                        f"Unsupported segment manifest format "
+                        f"{manifest.get('format_version')}."
+                    )
+                segments = {
+                    tuple(
+                        normalize_category(segment["values"][feature])
+                        for feature in manifest["segment_by"]
+                    ): name
+                    for name, segment in manifest["segments"].items()
+                }
+                self.last_error = None
+            except (OSError, ValueError, KeyError) as e:
+                manifest, segments, self.last_error = None, {}, str(e)
+        with self._lock:
+            self.manifest = manifest
+            self.segment_by = manifest["segment_by"] if manifest else []
+            self.segments = segments
+            self._bundles.clear()
+            self._requests = {name: 0 for name in segments.values()}
+        self._manifest_mtime = mtime
+        return bool(self.segments)
+
+    def warm(self):
+        """Loads the preload segments with the most training rows; returns them."""
+        manifest = self.manifest or {"segments": {}}
+        by_rows = sorted(
+            manifest["segments"],
+            key=lambda name: -manifest["segments"][name]["train_rows"],
+        )
+        return [
+            name
+            for name in by_rows[: min(self.preload, self.max_loaded)]
+            if self.get(name) is not None
+        ]
+
+    def segment_of(self, row):
+        """The name of a validated row's segment, or None to use the global model."""
+        if (
+            self._checked_at is None
+            or time.monotonic() - self._checked_at >= RECHECK_SECONDS
+        ):
+            self.load()
+        if not self.segments:
+            return None
+        name = self.segments.get(
+            tuple(normalize_category(row[feature]) for feature in self.segment_by)
+        )
+        if name is not None:
+            self._requests[name] = self._requests.get(name, 0) + 1
+        return name
+
+    def loaded(self, name):
+        """The segment's model if it is in memory, else None."""
+        bundle = self._bundles.get(name)
+        if bundle is not None:
+            with self._lock:
+                if name in self._bundles:
+                    self._bundles.move_to_end(name)
+        return bundle
+
+    def get(self, name):
+        """The segment's model, loaded now if need be; None if it fails to load."""
+        bundle = self.loaded(name)
+        if bundle is not None:
+            return bundle
+        with self._load_lock:
+            # Another request may have loaded it while this one waited.
+            bundle = self._bundles.get(name)
+            if bundle is not None:
+                return bundle
+            try:
+                bundle = load_segment_bundle(
+                    os.path.join(self.path, name),
+                    self.native_inference,
+                    self.aliases,
+                )
+            except Exception as e:
+                self.last_error = f"Segment '{name}': {e}"
+                return None
+            if bundle is None:
+                self.last_error = f"Segment '{name}' has no model files."
+                return None
+            bundle.segment = name
+            bundle.source += f" (segment '{name}')"
+            with self._lock:
+                self.loads += 1
+                self._bundles[name] = bundle
+                while len(self._bundles) > self.max_loaded:
+                    self._bundles.popitem(last=False)
+                    self.evictions += 1
+            return bundle
+
+    def stats(self):
+        manifest = self.manifest or {}
+        return {
+            "path": self.path,
+            "segment_by": self.segment_by,
+            "created_at": manifest.get("created_at"),
+            "segments": {
+                name: {
+                    **segment["values"],
+                    "train_rows": segment["train_rows"],
+                    "loaded": name in self._bundles,
+                    "requests": self._requests.get(name, 0),
+                }
+                for name, segment in manifest.get("segments", {}).items()
+            },
+            "max_loaded": self.max_loaded,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "last_error": self.last_error,
+            "report": manifest.get("report", {}).get("overall"),
+        }
@@ -0,0 +1,297 @@
+# File Path: apps/prediction-service/serve.py
+"""
+Production launcher: loads the models once, then forks uvicorn workers that share them.
+
+`uvicorn --workers N` starts N fresh interpreters that each unpickle or map their
+own copy of the models. Here the parent process imports main and loads both
+models first, freezes the garbage collector's view of them (so collections in the
+workers never write to, and thereby copy, the parent's object pages), binds the
+listening socket and only then forks. Every worker inherits the loaded models as
+copy-on-write pages it never writes to, so N workers cost little more model memory
+than one.
+
+The parent stays small and supervises: it restarts crashed workers, forwards
+SIGTERM/SIGINT for a graceful shutdown, and owns model reloads. On SIGHUP (sent by
+POST /admin/reload in any worker) or when MODEL_WATCH_INTERVAL_SECONDS notices new
+files, it reloads and validates the model itself, forks a fresh generation of
+workers from the new state and then retires the old one.
+
+Worker count: --workers, else WEB_CONCURRENCY, else sized automatically from the
+CPUs this process may use (affinity and cgroup quota) and the memory limit, with
+WORKER_MEMORY_MB (default 128) budgeted per worker on top of the shared model.
+
+Usage (from apps/prediction-service):
+    python serve.py [--workers auto] [--host 0.0.0.0] [--port 8000]
+"""
+
+import argparse
+import gc
+import math
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+
+import uvicorn
+
+from process_stats import rss_bytes
+
+# A worker that dies this soon after starting is crashing on startup; respawning it
+# in a tight loop would only burn CPU.
+MIN_WORKER_LIFETIME_SECONDS = 5
+MAX_QUICK_FAILURES = 5
+
+
+def _read_cpu_quota():
+    """(quota, period) in microseconds from cgroup v2 or v1, or None if unlimited."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+    except (OSError, ValueError):
+        try:
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                quota = f.read().strip()
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = f.read().strip()
+        except OSError:
+            return None
+    if quota in ("max", "-1"):
+        return None
+    return int(quota), int(period)
+
+
+def available_cpus():
+    """CPUs this process may run on, honouring affinity and a cgroup CPU quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # Not Linux.
+        cpus = os.cpu_count() or 1
+    quota = _read_cpu_quota()
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota[0] / quota[1])))
+    return cpus
+
+
+def memory_limit_bytes():
+    """The cgroup memory limit, or the machine's total memory when there is none."""
+    for path in (
+        "/sys/fs/cgroup/memory.max",
+        "/sys/fs/cgroup/memory/memory.limit_in_bytes",
+    ):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+            # cgroup v1 reports "no limit" as a huge page-aligned number.
+            if value != "max" and int(value) < 2**60:
+                return int(value)
+        except (OSError, ValueError):
+            continue
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, IndexError, ValueError):
+        pass
+    return None
+
+
+def auto_workers(cpus, shared_bytes, worker_bytes):
+    """One worker per CPU, as long as the shared model plus each worker's own
+    memory fits within the memory limit."""
+    limit = memory_limit_bytes()
+    if limit is None:
+        return cpus
+    return max(1, min(cpus, (limit - shared_bytes) // worker_bytes))
+
+
+class Supervisor:
+    """Forks the workers and keeps the configured number of them running."""
+
+    def __init__(self, app_module, sock, n_workers, log_level):
+        self.main = app_module
+        self.sock = sock
+        self.n_workers = n_workers
+        self.log_level = log_level
+        self.workers = {}  # pid -> (generation, start time)
+        self.generation = 0
+        self.quick_failures = 0
+        self.stopping = False
+        self.reload_requested = False
+        self.models_swapped = False
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker()
+        self.workers[pid] = (self.generation, time.monotonic())
+
+    def _run_worker(self):
+        # uvicorn installs its own SIGTERM/SIGINT handlers for a graceful stop.
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(signum, signal.SIG_DFL)
+        try:
+            config = uvicorn.Config(self.main.app, log_level=self.log_level)
+            uvicorn.Server(config).run(sockets=[self.sock])
+        except BaseException:
+            traceback.print_exc()
+            os._exit(1)
+        # Never return into the parent's supervision loop.
+        os._exit(0)
+
+    def request_stop(self, signum, frame):
+        self.stopping = True
+
+    def request_reload(self, signum, frame):
+        self.reload_requested = True
+
+    def on_model_swap(self, bundle, previous):
+        self.models_swapped = True
+
+    def reload_models(self):
+        """Reloads both registries in the parent; returns True if a version changed."""
+        gc.unfreeze()
+        registries = [self.main.model_registry]
+        if os.path.exists(self.main.TEXT_MODEL_PATH):
+            registries.append(self.main.text_model_registry)
+        changed = False
+        for registry in registries:
+            previous = registry.current
+            try:
+                bundle = registry.reload()
+            except Exception as e:
+                print(f"Model reload failed; workers keep the current model: {e}")
+                continue
+            if previous is None or previous.version != bundle.version:
+                print(f"Parent reloaded model version {bundle.version}.")
+                changed = True
+        gc.collect()
+        gc.freeze()
+        # Those swaps are handled here, not by the watcher path in run().
+        self.models_swapped = False
+        return changed
+
+    def replace_workers(self):
+        """Forks a full generation from the current models, then retires the old one."""
+        old = list(self.workers)
+        self.generation += 1
+        for _ in range(self.n_workers):
+            self.spawn()
+        for pid in old:
+            self._signal(pid, signal.SIGTERM)
+        print(f"Started worker generation {self.generation}; retiring {len(old)}.")
+
+    def _signal(self, pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def _reap(self):
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            generation, started = self.workers.pop(pid, (None, None))
+            if self.stopping or generation != self.generation:
+                continue  # Shut down on purpose.
+            if time.monotonic() - started < MIN_WORKER_LIFETIME_SECONDS:
+                self.quick_failures += 1
+                if self.quick_failures >= MAX_QUICK_FAILURES:
+                    print("Workers keep failing on startup; shutting down.")
+                    self.stopping = True
+                    return
+            print(f"Worker {pid} exited with status {status}; starting a new one.")
+            self.spawn()
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGINT, self.request_stop)
+        signal.signal(signal.SIGHUP, self.request_reload)
+        self.main.model_registry.on_swap(self.on_model_swap)
+        self.main.text_model_registry.on_swap(self.on_model_swap)
+        if self.main.MODEL_WATCH_INTERVAL_SECONDS > 0:
+            # The watcher threads only exist in the parent; fork does not copy them.
+            self.main.start_model_watchers()
+
+        for _ in range(self.n_workers):
+            self.spawn()
+        while not self.stopping:
+            time.sleep(0.2)
+            if self.reload_requested:
+                self.reload_requested = False
+                if self.reload_models():
+                    self.replace_workers()
+            elif self.models_swapped:
+                # A watcher reloaded a model in the parent.
+                self.models_swapped = False
+                gc.freeze()
+                self.replace_workers()
+            self._reap()
+
+        for pid in list(self.workers):
+            self._signal(pid, signal.SIGTERM)
+        while self.workers:
+            try:
+                pid, _ = os.wait()
+            except ChildProcessError:
+                break
+            self.workers.pop(pid, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--workers",
+        default=os.getenv("WEB_CONCURRENCY", "auto"),
+        help="number of worker processes, or 'auto' (default)",
+    )
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    cpus = available_cpus()
+    requested = None if args.workers == "auto" else int(args.workers)
+    # Split the CPUs between the workers' inference pools unless configured, so N
+    # workers do not each start a pool as large as the whole machine.
+    planned = requested or cpus
+    os.environ.setdefault("INFERENCE_WORKERS", str(max(1, cpus // planned)))
+    os.environ["PREFORK_PARENT_PID"] = str(os.getpid())
+
+    rss_before = rss_bytes()
+    import main as app_module
+
+    app_module.preload_models()
+    gc.collect()
+    gc.freeze()
+    shared = rss_bytes()
+
+    if requested is None:
+        worker_bytes = int(os.getenv("WORKER_MEMORY_MB", "128")) * 1024 * 1024
+        n_workers = auto_workers(cpus, shared, worker_bytes)
+    else:
+        n_workers = requested
+    print(
+        f"Parent {os.getpid()} loaded the models (RSS {shared / 1e6:.0f} MB, "
+        f"+{(shared - rss_before) / 1e6:.0f} MB for the service); "
+        f"forking {n_workers} worker(s) for {cpus} CPU(s) on {args.host}:{args.port}."
+    )
+
+    sock = socket.socket(socket.AF_INET6 if ":" in args.host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    Supervisor(app_module, sock, n_workers, args.log_level).run()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
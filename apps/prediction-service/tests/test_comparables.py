@@ -0,0 +1,104 @@
+# File Path: apps/prediction-service/tests/test_comparables.py
+"""ComparablesStore's refresh of a cleaned-data CSV that changes under it."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from comparables import ComparablesStore
+
+HEADER = "location,listing_type,property_type,price,area_sqft,bedrooms,bathrooms\n"
+
+
+def listing(listing_type, price, area_sqft=1000.0):
+    return f"Kuala Lumpur,{listing_type},Condo,{price:.1f},{area_sqft:.1f},3.0,2.0\n"
+
+
+def write(path, lines, mtime_ns):
+    # Opening with "w" truncates the same inode, as DataFrame.to_csv does.
+    with open(path, "w") as f:
+        f.write(HEADER + "".join(lines))
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def prices(store, listing_type):
+    comparables = store.index.query(
+        "Kuala Lumpur", listing_type, "Condo", 1000.0, 3, 2, 100
+    )
+    return sorted(c["price"] for c in comparables)
+
+
+def test_appended_rows_are_inserted(tmp_path):
+    path = str(tmp_path / "properties_cleaned.csv")
+    rows = [listing("rent", 1000 + i) for i in range(5)]
+    write(path, rows, 1_000_000_000)
+    store = ComparablesStore(path)
+    store.load()
+
+    with open(path, "a") as f:
+        f.write(listing("rent", 2000))
+    os.utime(path, ns=(2_000_000_000, 2_000_000_000))
+
+    assert store.refresh() == 1
+    assert store.reloads == 1
+    assert store.index.rows == 6
+
+
+def test_rows_inserted_mid_file_in_place_reload_it(tmp_path):
+    path = str(tmp_path / "properties_cleaned.csv")
+    rents = [listing("rent", 1000 + i) for i in range(5)]
+    sales = [listing("sale", 500000 + i) for i in range(5)]
+    write(path, rents + sales, 1_000_000_000)
+    store = ComparablesStore(path)
+    store.load()
+    inode = os.stat(path).st_ino
+
+    new_rents = [listing("rent", 3000 + i) for i in range(3)]
+    write(path, rents + new_rents + sales, 2_000_000_000)
+    assert os.stat(path).st_ino == inode
+
+    assert store.refresh() is None
+    assert store.index.rows == 13
+    assert prices(store, "rent") == sorted(
+        [1000.0 + i for i in range(5)] + [3000.0 + i for i in range(3)]
+    )
+    assert prices(store, "sale") == [500000.0 + i for i in range(5)]
+
+
+def test_same_size_edit_in_place_reloads_it(tmp_path):
+    path = str(tmp_path / "properties_cleaned.csv")
+    write(path, [listing("rent", 1000), listing("rent", 1100)], 1_000_000_000)
+    store = ComparablesStore(path)
+    store.load()
+    size = os.stat(path).st_size
+
+    write(path, [listing("rent", 1000), listing("rent", 1200)], 2_000_000_000)
+    assert os.stat(path).st_size == size
+
+    assert store.refresh() is None
+    assert prices(store, "rent") == [1000.0, 1200.0]
+
+
+def test_validator_matches_the_listings_own_values(tmp_path):
+    path = str(tmp_path / "properties_cleaned.csv")
+    write(path, [listing("rent", 1000)], 1_000_000_000)
+    store = ComparablesStore(path)
+    store.load()
+
+    row, corrections = store.validator().check(
+        {
+            "area_sqft": 900.0,
+            "bedrooms": 3,
+            "bathrooms": 2,
+            "location": "kuala lumpr",
+            "listing_type": "RENT",
+            "property_type": "condo",
+        },
+        "off",
+    )
+    assert (row["location"], row["listing_type"], row["property_type"]) == (
+        "Kuala Lumpur",
+        "rent",
+        "Condo",
+    )
+    assert corrections == {"location": "Kuala Lumpur"}
@@ -0,0 +1,215 @@
+# File Path: apps/prediction-service/text_features.py
+"""
+Feature engineering for the text-aware listing model that
+train/gemini_train_random_forest.py trains: size/bedroom parsing, city/state
+extraction and the facilities tokenizer. The training script (and
+train/gemini_compare_models.py) imports them from here, so the pickled pipeline
+refers to this module and the service computes exactly the features the model
+was trained on.
+"""
+
+import math
+import re
+
+import numpy as np
+
+
+def split_facilities(facility_string):
+    """Custom tokenizer to split the facilities string by semicolon."""
+    if isinstance(facility_string, str):
+        return [facility.strip() for facility in facility_string.split(";")]
+    return []
+
+
+def clean_price(price_str):
+    if isinstance(price_str, str):
+        numbers = re.findall(r"\d+\.?\d*", price_str)
+        return float(numbers[0]) if numbers else np.nan
+    return np.nan
+
+
+def clean_size(size_str):
+    if isinstance(size_str, str):
+        numbers = re.findall(r"[\d,]+", size_str)
+        if numbers:
+            return float(numbers[0].replace(",", ""))
+    return np.nan
+
+
+def clean_bedrooms(bedrooms_val):
+    if isinstance(bedrooms_val, str) and bedrooms_val.lower() == "studio":
+        return 0
+    try:
+        return int(bedrooms_val)
+    except (ValueError, TypeError):
+        return np.nan
+
+
+def extract_location_parts(location_str):
+    if not isinstance(location_str, str):
+        return "Unknown", "Unknown"
+    parts = [part.strip() for part in location_str.split(",")]
+    if len(parts) >= 3:
+        city = parts[-3]
+        state = parts[-2]
+        return city, state
+    elif len(parts) == 2:
+        return parts[0], parts[1]
+    elif len(parts) == 1:
+        return parts[0], "Unknown"
+    return "Unknown", "Unknown"
+
+
+def engineer_features(listing):
+    """
+    Derives the model's input fields from a raw listing dict (size, bedrooms,
+    bathrooms, property_type, location, description, facilities), the same way the
+    training script prepares its DataFrame.
+    """
+    size = listing.get("size")
+    bathrooms = listing.get("bathrooms")
+    city, state = extract_location_parts(listing.get("location"))
+    try:
+        bathrooms = float(bathrooms)
+    except (TypeError, ValueError):
+        bathrooms = np.nan
+    return {
+        # A plain number is taken as square feet; strings go through clean_size.
+        "size_sqft": (
+            float(size) if isinstance(size, (int, float)) else clean_size(size)
+        ),
+        "bedrooms_cleaned": clean_bedrooms(listing.get("bedrooms")),
+        "bathrooms_cleaned": bathrooms,
+        "property_type": listing.get("property_type"),
+        "city": city,
+        "state": state,
+        "description": listing.get("description") or "",
+        "facilities": listing.get("facilities") or "",
+    }
+
+
+class TextFeatureEncoder:
+    """
+    Encodes engineered listings straight into the fitted ColumnTransformer's output
+    layout, without going through pandas or the transformer itself.
+
+    Everything the transformer learned is read out once, at load time: imputation
+    values, scaler statistics, one-hot column indices per category, and for each
+    TF-IDF vectorizer its analyzer plus a {token: (column, idf)} lookup. Encoding a
+    request is then a few dict lookups plus one pass over each text's tokens.
+    """
+
+    def __init__(self, preprocessor):
+        self.columns = list(preprocessor.get_feature_names_out())
+        self.n_columns = len(self.columns)
+        transformers = {
+            name: (transformer, columns)
+            for name, transformer, columns in preprocessor.transformers_
+        }
+        slices = preprocessor.output_indices_
+
+        self.numeric = []
+        self.categories = []
+        self.texts = []
+        for name, (transformer, columns) in transformers.items():
+            if transformer == "drop" or slices[name].start == slices[name].stop:
+                continue
+            offset = slices[name].start
+            steps = dict(getattr(transformer, "steps", [(name, transformer)]))
+            if "scaler" in steps:
+                imputer, scaler = steps["imputer"], steps["scaler"]
+                for i, feature in enumerate(columns):
+                    self.numeric.append(
+                        (
+                            feature,
+                            offset + i,
+                            imputer.statistics_[i],
+                            scaler.mean_[i],
+                            scaler.scale_[i],
+                        )
+                    )
+            elif "onehot" in steps:
+                imputer, onehot = steps["imputer"], steps["onehot"]
+                for i, feature in enumerate(columns):
+                    index = {
+                        value: offset + j
+                        for j, value in enumerate(onehot.categories_[i])
+                    }
+                    self.categories.append((feature, imputer.statistics_[i], index))
+                    offset += len(onehot.categories_[i])
+            elif hasattr(transformer, "vocabulary_"):
+                self.texts.append(
+                    (columns, *self._compile_vectorizer(transformer, offset))
+                )
+            else:
+                raise ValueError(f"Cannot precompile the '{name}' transformer.")
+
+    @staticmethod
+    def _compile_vectorizer(vectorizer, offset):
+        if vectorizer.norm not in ("l2", "l1", None):
+            raise ValueError(f"Unsupported TF-IDF norm '{vectorizer.norm}'.")
+        idf = vectorizer.idf_ if vectorizer.use_idf else None
+        weights = {
+            token: (offset + index, 1.0 if idf is None else float(idf[index]))
+            for token, index in vectorizer.vocabulary_.items()
+        }
+        options = (vectorizer.binary, vectorizer.sublinear_tf, vectorizer.norm)
+        return vectorizer.build_analyzer(), weights, options
+
+    def encode_batch(self, listings):
+        """Encodes engineered listing dicts into an n_rows x n_columns matrix."""
+        # Non-zero entries are collected as (row, column, value) and written with
+        # one fancy assignment; per-element NumPy writes would dominate otherwise.
+        rows = []
+        columns = []
+        values = []
+        for row, listing in enumerate(listings):
+            for feature, column, fill, mean, scale in self.numeric:
+                value = listing[feature]
+                if value is None or value != value:  # Missing or NaN.
+                    value = fill
+                rows.append(row)
+                columns.append(column)
+                values.append((value - mean) / scale)
+            for feature, fill, index in self.categories:
+                value = listing[feature]
+                column = index.get(fill if value is None else value)
+                if column is not None:  # Unknown values stay all-zero, as in training.
+                    rows.append(row)
+                    columns.append(column)
+                    values.append(1.0)
+            for feature, analyze, weights, options in self.texts:
+                hits = self._tfidf(analyze(listing[feature]), weights, options)
+                rows.extend([row] * len(hits))
+                columns.extend(hits)
+                values.extend(hits.values())
+
+        encoded = np.zeros((len(listings), self.n_columns))
+        encoded[rows, columns] = values
+        return encoded
+
+    @staticmethod
+    def _tfidf(tokens, weights, options):
+        """Returns {column: normalized tf-idf} for one document's tokens."""
+        binary, sublinear_tf, norm = options
+        # Most tokens are outside the vocabulary; count only the ones that hit.
+        counts = {}
+        for token in tokens:
+            hit = weights.get(token)
+            if hit is not None:
+                counts[hit] = counts.get(hit, 0) + 1
+
+        hits = {}
+        for (column, idf), count in counts.items():
+            tf = 1.0 if binary else float(count)
+            if sublinear_tf:
+                tf = math.log(tf) + 1.0
+            hits[column] = tf * idf
+        if hits and norm is not None:
+            if norm == "l2":
+                total = math.sqrt(sum(value * value for value in hits.values()))
+            else:
+                total = sum(abs(value) for value in hits.values())
+            for column in hits:
+                hits[column] /= total
+        return hits
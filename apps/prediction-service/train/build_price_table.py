@@ -0,0 +1,478 @@
+# File Path: apps/prediction-service/train/build_price_table.py
+"""
+Builds the price lookup table main.py answers common /predict requests from.
+
+The served model (loaded exactly as main.py loads it) is evaluated at every point
+of the grid described in price_table.py: the (location, listing_type,
+property_type) groups of the cleaned data, the bedroom and bathroom counts that
+together cover --coverage of its rows, and --area-nodes sizes spaced evenly in
+log(area_sqft) between its --area-quantile and 1 - --area-quantile quantiles.
+
+Every interval between two area nodes is then checked against the model;
+intervals where the interpolated price is anywhere more than --max-deviation
+(relative) off the model are marked invalid, so those requests go to the model
+instead. A tree model's price is a step function of area_sqft, so for models
+served by the tree engine the grid is not evaluated point by point: the trees
+are walked once per (group, bedrooms, bathrooms) with area left free, which
+gives the exact price at every area (see TreeEnsembleModel.step_function), and
+each interval is checked on both sides of every step inside it, which makes
+the check exact. Other models (linear ones, or a pickled model served by
+sklearn) are evaluated at every node and checked at each interval's midpoint
+and at --random-checks random areas inside it. Either way the area of every
+cleaned row inside the grid is checked too.
+
+Expected build time on one CPU, for the usual grid of some 370 groups, 6
+bedroom and 6 bathroom counts and 1024 area nodes: about 40s for train.py's
+default 100-tree Random Forest (some ten million steps), and about a minute
+for a linear model. Evaluating a forest point by point instead would take
+hours at the 12-25k rows/s it runs at.
+
+Finally it reports what the table will do in service: the share of cleaned rows
+it answers (the hit rate to expect), and how far its prices for those rows, and
+for --samples random points it answers (which were not checked), are from the
+model's own predictions. The report is stored in the table's manifest.
+
+Usage (from the directory main.py serves, after train.py):
+    python train/build_price_table.py [--area-nodes 1024] [--output price_table]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# The serving modules live next to main.py.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from data_cleaner import CATEGORICAL_COLUMNS, load_cleaned_data
+from feature_encoder import normalize_category
+from model_registry import load_bundle
+from price_table import PriceTable, save_table
+
+
+def common_values(values, coverage):
+    """The most frequent values that together cover `coverage` of values, sorted."""
+    shares = values.value_counts(normalize=True)
+    shares = shares[shares.index == shares.index.astype(int)]  # Whole counts only.
+    needed = int(np.searchsorted(shares.cumsum().to_numpy(), coverage)) + 1
+    return sorted(int(value) for value in shares.index[:needed])
+
+
+def grid_axes(df, encoder, coverage, area_quantile, area_nodes):
+    """The grid's groups, bedrooms, bathrooms and log-area nodes for df."""
+    groups = [
+        tuple(group)
+        for group in df[CATEGORICAL_COLUMNS]
+        .astype(str)
+        .drop_duplicates()
+        .itertuples(index=False)
+    ]
+    # The table only holds groups the model can price.
+    groups = sorted(
+        group
+        for group in groups
+        if not encoder.find_unknown(dict(zip(CATEGORICAL_COLUMNS, group)))
+    )
+    low, high = df["area_sqft"].quantile([area_quantile, 1 - area_quantile])
+    log_areas = np.linspace(np.log(low), np.log(high), area_nodes)
+    return (
+        groups,
+        common_values(df["bedrooms"], coverage),
+        common_values(df["bathrooms"], coverage),
+        log_areas,
+    )
+
+
+# Area points evaluated per evaluate_grid call while checking intervals, which
+# bounds the dense matrix it builds per group.
+CHECK_CHUNK_POINTS = 256
+
+
+def grid_rows(encoder, group, bedrooms, bathrooms, areas):
+    """One group's encoded rows for every (bedrooms, bathrooms, area) combination."""
+    beds, baths, grid_areas = np.meshgrid(bedrooms, bathrooms, areas, indexing="ij")
+    encoded = np.zeros((beds.size, encoder.n_columns))
+    for name, values in (
+        ("bedrooms", beds),
+        ("bathrooms", baths),
+        ("area_sqft", grid_areas),
+    ):
+        encoded[:, encoder.numeric_index[name]] = values.ravel()
+    for feature, value in zip(CATEGORICAL_COLUMNS, group):
+        encoded[:, encoder.category_index[feature][normalize_category(value)]] = 1
+    return encoded
+
+
+def evaluate_grid(bundle, groups, bedrooms, bathrooms, areas):
+    """The model's price at every grid point, shaped like the table."""
+    prices = np.empty((len(groups), len(bedrooms), len(bathrooms), len(areas)))
+    for i, group in enumerate(groups):
+        encoded = grid_rows(bundle.encoder, group, bedrooms, bathrooms, areas)
+        prices[i] = bundle.predict_matrix(encoded).reshape(prices.shape[1:])
+    return prices
+
+
+def within(table_price, live_price, max_deviation):
+    return np.abs(table_price - live_price) <= max_deviation * np.maximum(
+        live_price, 1.0
+    )
+
+
+def step_grid(bundle, groups, bedrooms, bathrooms, log_areas, max_deviation):
+    """
+    For a tree engine model: (prices, valid, steps) of the grid, from the model's
+    price as a step function of area for every (group, bedrooms, bathrooms) (see
+    TreeEnsembleModel.step_function) rather than from a prediction per point.
+
+    prices are exact at the nodes. Interpolation is linear and the price constant
+    between steps, so an interval is valid when the interpolated price at every
+    step inside it is within max_deviation of the prices on both sides of the
+    step; that covers both ends of every stretch of constant price, so the check
+    is exact. steps counts the steps checked.
+    """
+    shape = (len(groups), len(bedrooms), len(bathrooms))
+    prices = np.empty(shape + (len(log_areas),))
+    valid = np.empty(shape + (len(log_areas) - 1,), dtype=bool)
+    steps = 0
+    # A group at a time: a forest's branches for every row at once would not fit
+    # in memory.
+    for i, group in enumerate(groups):
+        encoded = grid_rows(bundle.encoder, group, bedrooms, bathrooms, [0.0])
+        group_prices, group_valid, group_steps = _step_rows(
+            bundle, encoded, log_areas, max_deviation
+        )
+        prices[i] = group_prices.reshape(prices.shape[1:])
+        valid[i] = group_valid.reshape(valid.shape[1:])
+        steps += group_steps
+    return prices, valid, steps
+
+
+def _step_rows(bundle, encoded, log_areas, max_deviation):
+    """step_grid for the rows of encoded: (prices, valid, steps), a row per row."""
+    rows, boundaries, outputs, below = bundle.model.step_function(
+        encoded, bundle.encoder.numeric_index["area_sqft"]
+    )
+    # As ModelBundle.predict_matrix turns model outputs into prices.
+    step_prices = np.round(np.expm1(outputs), 2)
+    below_prices = np.round(np.expm1(below), 2)
+
+    # The model compares float32 areas, so nodes are placed among the steps as it
+    # sees them: a step at boundary b applies to nodes above b.
+    nodes = np.exp(log_areas).astype(np.float32)
+    n_rows, n_nodes = len(encoded), len(nodes)
+    first_node = np.searchsorted(nodes, boundaries, side="right")
+    # The price at each node is that of the row's last step at or below it.
+    last_step = np.full((n_rows, n_nodes + 1), -1)
+    np.maximum.at(last_step, (rows, first_node), np.arange(len(rows)))
+    last_step = np.maximum.accumulate(last_step[:, :n_nodes], axis=1)
+    prices = np.where(
+        last_step >= 0,
+        step_prices[np.maximum(last_step, 0)],
+        below_prices[:, np.newaxis],
+    )
+
+    # Steps strictly inside the grid, and the interval each falls in.
+    inside = (first_node > 0) & (first_node < n_nodes)
+    interval = first_node[inside] - 1
+    step_rows = rows[inside]
+    first_of_row = np.append(True, rows[1:] != rows[:-1])
+    before = np.where(first_of_row, below_prices[rows], np.roll(step_prices, 1))
+    before, after = before[inside], step_prices[inside]
+    left = prices[step_rows, interval]
+    right = prices[step_rows, interval + 1]
+    fraction = (np.log(boundaries[inside]) - log_areas[interval]) / (
+        log_areas[interval + 1] - log_areas[interval]
+    )
+    interpolated = left + (right - left) * fraction
+    ok = within(interpolated, before, max_deviation) & within(
+        interpolated, after, max_deviation
+    )
+    valid = np.ones((n_rows, n_nodes - 1), dtype=bool)
+    np.logical_and.at(valid, (step_rows, interval), ok)
+    return prices, valid, int(inside.sum())
+
+
+def random_check_points(log_areas, random_checks, seed=42):
+    """(areas, intervals): random_checks random areas per interval, in area order."""
+    rng = np.random.default_rng(seed)
+    intervals = np.repeat(np.arange(len(log_areas) - 1), random_checks)
+    fractions = np.sort(rng.uniform(size=(len(log_areas) - 1, random_checks)))
+    log_points = log_areas[intervals] + fractions.ravel() * (
+        log_areas[intervals + 1] - log_areas[intervals]
+    )
+    return np.exp(log_points), intervals
+
+
+def check_intervals(
+    bundle, prices, groups, bedrooms, bathrooms, log_areas, points, max_deviation
+):
+    """
+    Whether each interval's interpolated prices stay within max_deviation of the
+    model at all of its points (see random_check_points), shaped like the table's
+    validity flags. Points are evaluated CHECK_CHUNK_POINTS at a time.
+    """
+    areas, intervals = points
+    valid = np.ones(prices.shape[:-1] + (prices.shape[-1] - 1,), dtype=bool)
+    for start in range(0, len(areas), CHECK_CHUNK_POINTS):
+        chunk = slice(start, start + CHECK_CHUNK_POINTS)
+        chunk_intervals = intervals[chunk]
+        live = evaluate_grid(bundle, groups, bedrooms, bathrooms, areas[chunk])
+        left = prices[..., chunk_intervals]
+        right = prices[..., chunk_intervals + 1]
+        fraction = (np.log(areas[chunk]) - log_areas[chunk_intervals]) / (
+            log_areas[chunk_intervals + 1] - log_areas[chunk_intervals]
+        )
+        ok = within(left + (right - left) * fraction, live, max_deviation)
+        # An interval is valid only if it is at all of its points.
+        np.logical_and.at(
+            np.moveaxis(valid, -1, 0), chunk_intervals, np.moveaxis(ok, -1, 0)
+        )
+    return valid
+
+
+def data_rows(df, distinct=True):
+    """df's rows as canonical feature dicts (areas in whole sqft)."""
+    requests = df[["area_sqft", "bedrooms", "bathrooms"] + CATEGORICAL_COLUMNS]
+    requests = requests.assign(area_sqft=requests["area_sqft"].round())
+    if distinct:
+        requests = requests.drop_duplicates()
+    return [
+        {
+            "area_sqft": float(row.area_sqft),
+            "bedrooms": row.bedrooms,
+            "bathrooms": row.bathrooms,
+            "location": str(row.location),
+            "listing_type": str(row.listing_type),
+            "property_type": str(row.property_type),
+        }
+        for row in requests.itertuples(index=False)
+    ]
+
+
+def relative_errors(table, bundle, located_rows):
+    """Relative and absolute gaps between the interpolated and the model's price
+    for (row, table.locate(row)) pairs."""
+    interpolated = np.array(
+        [table.interpolate(located) for _, located in located_rows], dtype=float
+    )
+    live = np.array(
+        bundle.predict_rows([row for row, _ in located_rows])[0], dtype=float
+    )
+    absolute = np.abs(interpolated - live)
+    return absolute / np.maximum(live, 1.0), absolute
+
+
+def summarize_deviation(relative, absolute):
+    return {
+        "rows": len(relative),
+        "max_abs_myr": float(absolute.max()),
+        "max_rel": float(relative.max()),
+        "p99_rel": float(np.percentile(relative, 99)),
+        "mean_rel": float(relative.mean()),
+    }
+
+
+def random_grid_rows(table, n, seed=42):
+    """n random requests inside the table's grid, areas in whole sqft."""
+    rng = np.random.default_rng(seed)
+    groups = table.manifest["groups"]
+    low, high = np.log(table.area_range[0]), np.log(table.area_range[1])
+    rows = []
+    for _ in range(n):
+        location, listing_type, property_type = groups[rng.integers(len(groups))]
+        area = np.clip(round(np.exp(rng.uniform(low, high))), *table.area_range)
+        rows.append(
+            {
+                "area_sqft": float(area),
+                "bedrooms": int(rng.choice(table.manifest["bedrooms"])),
+                "bathrooms": int(rng.choice(table.manifest["bathrooms"])),
+                "location": location,
+                "listing_type": listing_type,
+                "property_type": property_type,
+            }
+        )
+    return rows
+
+
+def build_price_table(
+    bundle,
+    df,
+    output="price_table",
+    area_nodes=1024,
+    coverage=0.98,
+    area_quantile=0.01,
+    max_deviation=0.02,
+    samples=20000,
+    random_checks=8,
+):
+    """Evaluates bundle over the grid of df, saves the table and returns its report."""
+    df = df.dropna(subset=CATEGORICAL_COLUMNS + ["area_sqft", "bedrooms", "bathrooms"])
+    df = df[df["area_sqft"] > 0]
+    groups, bedrooms, bathrooms, log_areas = grid_axes(
+        df, bundle.encoder, coverage, area_quantile, area_nodes
+    )
+    start = time.perf_counter()
+    if hasattr(bundle.model, "step_function"):
+        # Exact: every step of the model's price inside an interval is checked.
+        check_method = "steps"
+        prices, valid, check_points = step_grid(
+            bundle, groups, bedrooms, bathrooms, log_areas, max_deviation
+        )
+        evaluate_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+    else:
+        prices = evaluate_grid(bundle, groups, bedrooms, bathrooms, np.exp(log_areas))
+        evaluate_seconds = time.perf_counter() - start
+
+        # Check every interval at its midpoint and at random areas inside it...
+        check_method = "random"
+        start = time.perf_counter()
+        midpoints = evaluate_grid(
+            bundle,
+            groups,
+            bedrooms,
+            bathrooms,
+            np.exp((log_areas[:-1] + log_areas[1:]) / 2),
+        )
+        interpolated = (prices[..., :-1] + prices[..., 1:]) / 2
+        valid = within(interpolated, midpoints, max_deviation)
+        points = random_check_points(log_areas, random_checks)
+        valid &= check_intervals(
+            bundle,
+            prices,
+            groups,
+            bedrooms,
+            bathrooms,
+            log_areas,
+            points,
+            max_deviation,
+        )
+        check_points = len(points[0])
+    manifest = {
+        "model_version": bundle.version,
+        "groups": [list(group) for group in groups],
+        "bedrooms": bedrooms,
+        "bathrooms": bathrooms,
+        "log_area_min": float(log_areas[0]),
+        "log_area_step": float(log_areas[1] - log_areas[0]),
+        "area_nodes": area_nodes,
+        "max_deviation": max_deviation,
+    }
+    table = PriceTable(prices.astype(np.float32), valid, manifest)
+
+    # ...and at the sizes listings actually have (for a tree model, a check of
+    # the table's float32 prices against the model as served).
+    located = [(row, table.locate(row)) for row in data_rows(df)]
+    located = [(row, where) for row, where in located if where is not None]
+    if located:
+        relative, _ = relative_errors(table, bundle, located)
+        for (_, where), error in zip(located, relative):
+            if error > max_deviation:
+                valid[where[:4]] = False
+    check_seconds = time.perf_counter() - start
+
+    answered = [(row, where) for row, where in located if valid[where[:4]]]
+    random_rows = [(row, table.locate(row)) for row in random_grid_rows(table, samples)]
+    random_rows = [(row, where) for row, where in random_rows if valid[where[:4]]]
+    report = {
+        "evaluate_seconds": evaluate_seconds,
+        "check_seconds": check_seconds,
+        # "steps" makes the check exact; "random" samples each interval.
+        "check_method": check_method,
+        "check_points": check_points,
+        "valid_intervals": float(valid.mean()),
+        # Every listing counts, so common requests weigh as much as they occur.
+        "expected_hit_rate": float(
+            np.mean([table.lookup(row) is not None for row in data_rows(df, False)])
+        ),
+        "cleaned_rows": (
+            summarize_deviation(*relative_errors(table, bundle, answered))
+            if answered
+            else None
+        ),
+        "random_grid_points": (
+            summarize_deviation(*relative_errors(table, bundle, random_rows))
+            if random_rows
+            else None
+        ),
+    }
+    manifest["valid_intervals"] = report["valid_intervals"]
+    save_table(output, prices, valid, {**manifest, "report": report})
+    return report
+
+
+def print_report(report):
+    how = (
+        f"at each of the model's {report['check_points']} price steps inside it"
+        if report["check_method"] == "steps"
+        else f"at {report['check_points']} random areas"
+    )
+    print(
+        f"Grid evaluated in {report['evaluate_seconds']:.1f}s and checked {how} "
+        f"in {report['check_seconds']:.1f}s; "
+        f"{report['valid_intervals']:.1%} of its intervals are within the "
+        f"deviation budget."
+    )
+    print(f"The table answers {report['expected_hit_rate']:.1%} of the cleaned rows.")
+    for name in ("cleaned_rows", "random_grid_points"):
+        stats = report[name]
+        if stats is None:
+            continue
+        print(
+            f"Deviation from the model over {stats['rows']} {name.replace('_', ' ')}: "
+            f"max {stats['max_rel']:.2%} ({stats['max_abs_myr']:.2f} MYR), "
+            f"p99 {stats['p99_rel']:.2%}, mean {stats['mean_rel']:.3%}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--artifact-dir", default="model_artifact")
+    parser.add_argument("--model", default="property_price_model.joblib")
+    parser.add_argument("--columns", default="model_columns.joblib")
+    parser.add_argument("--output", default="price_table")
+    parser.add_argument("--area-nodes", type=int, default=1024)
+    parser.add_argument(
+        "--coverage",
+        type=float,
+        default=0.98,
+        help="share of rows the chosen bedroom (and bathroom) counts must cover",
+    )
+    parser.add_argument("--area-quantile", type=float, default=0.01)
+    parser.add_argument(
+        "--max-deviation",
+        type=float,
+        default=0.02,
+        help="largest relative gap from the model an interval may have (default 0.02)",
+    )
+    parser.add_argument("--samples", type=int, default=20000)
+    parser.add_argument(
+        "--random-checks",
+        type=int,
+        default=8,
+        help="random areas each interval is checked at, for models that are not "
+        "trees (default 8)",
+    )
+    args = parser.parse_args()
+
+    bundle = load_bundle(args.artifact_dir, args.model, args.columns)
+    if bundle is None:
+        sys.exit("No trained model found; run train.py first.")
+    report = build_price_table(
+        bundle,
+        load_cleaned_data(),
+        args.output,
+        args.area_nodes,
+        args.coverage,
+        args.area_quantile,
+        args.max_deviation,
+        args.samples,
+        args.random_checks,
+    )
+    print(f"Price table for model version {bundle.version} saved to '{args.output}/'.")
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
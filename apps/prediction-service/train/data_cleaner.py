@@ -1,92 +1,600 @@
 # File Path: apps/prediction-service/data_cleaner.py
+import argparse
+import hashlib
+import os
+import sys
+import time
+
+import numpy as np
 import pandas as pd
-import re
 
+# process_stats lives with the serving modules next to main.py.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from process_stats import peak_rss_bytes
 
-def parse_price(price_str):
-    """Extracts the numeric value from a price string."""
-    if not isinstance(price_str, str):
-        return None
-    price_numeric_str = re.sub(r"[^\d.]", "", price_str.split("/")[0])
-    if price_numeric_str:
-        return float(price_numeric_str)
-    return None
+INPUT_FILES = {"rent": "dataset_for_rent.csv", "sale": "dataset_for_sale.csv"}
+OUTPUT_BASENAME = "properties_cleaned"
+# Feather (Arrow IPC) and Parquet keep the dtypes, and store the categorical columns
+# dictionary-encoded; uncompressed Feather can be memory-mapped on load.
+OUTPUT_FORMATS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+# The only raw columns clean_dataframe reads.
+RAW_COLUMNS = ["price", "size", "bedrooms", "bathrooms", "location", "property_type"]
+CATEGORICAL_COLUMNS = ["location", "listing_type", "property_type"]
+NUMERIC_COLUMNS = ["price", "area_sqft", "bedrooms", "bathrooms"]
+STREAMING_DTYPES = {"bedrooms": float, "bathrooms": float}
+# Source columns that identify a listing and everything clean_dataframe reads, so
+# a listing whose price or size changes gets a new fingerprint.
+FINGERPRINT_COLUMNS = ["project_name", "unit_title", "listing_date"] + RAW_COLUMNS
+# Bump whenever clean_dataframe's output changes, so incremental runs rebuild.
+CLEANER_VERSION = 1
 
+# Everything from the first "/" on (e.g. "/mo"), and any non-numeric character.
+PRICE_JUNK_PATTERN = r"(?s)/.*|[^\d.]"
+SIZE_NUMBER_PATTERN = r"([\d,]+)"
 
-def parse_size(size_str):
-    """Extracts the numeric value from a size string."""
-    if not isinstance(size_str, str):
-        return None
-    match = re.search(r"([\d,]+)", size_str)
-    if match:
-        return float(match.group(1).replace(",", ""))
-    return None
+
+def parse_prices(prices):
+    """Parses price strings such as "RM1,500/mo" into numbers (NaN if there is none)."""
+    digits = prices.str.replace(PRICE_JUNK_PATTERN, "", regex=True)
+    return pd.to_numeric(digits.where(digits != ""), errors="coerce").astype(float)
+
+
+def parse_sizes(sizes):
+    """Parses the first number in size strings such as "1,120 Sqft" (NaN if none)."""
+    digits = sizes.str.extract(SIZE_NUMBER_PATTERN, expand=False).str.replace(",", "")
+    return pd.to_numeric(digits, errors="coerce").astype(float)
+
+
+def parse_bedrooms(counts):
+    """Parses bedroom counts, treating "Studio" as one bedroom."""
+    return pd.to_numeric(counts.replace("Studio", 1), errors="coerce")
+
+
+def primary_locations(locations):
+    """The part of each location before the first comma, e.g. "Panji" for "Panji, Kota Bharu"."""
+    return locations.str.split(",", n=1).str[0].str.strip()
+
+
+def _distinct(values, text_only=True):
+    """
+    Splits a column into (codes, distinct values) so string parsing runs once per
+    distinct value; scraped prices, sizes and locations repeat heavily. Missing
+    values, and with text_only also non-string ones, get code -1 and become NaN.
+    """
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(np.asarray(uniques, dtype=object))
+    is_text = uniques.map(lambda value: isinstance(value, str)).to_numpy(dtype=bool)
+    if text_only and not is_text.all():
+        codes = np.where((codes >= 0) & is_text[codes], codes, -1)
+        uniques = uniques.where(is_text)
+    return codes, uniques
 
 
-def clean_dataframe(df, listing_type):
+def _parse_numbers(values, parse, text_only=True):
+    """Parses distinct values with parse and returns a float column."""
+    if not text_only and pd.api.types.is_numeric_dtype(values):
+        return pd.to_numeric(values, errors="coerce")
+    codes, uniques = _distinct(values, text_only)
+    if uniques.empty:
+        return pd.Series(np.nan, index=values.index)
+    parsed = parse(uniques).to_numpy()
+    if (codes >= 0).all():
+        # Keeps integer columns integer, as pd.to_numeric over the full column would.
+        return pd.Series(parsed[codes], index=values.index)
+    parsed = parsed.astype(float)
+    return pd.Series(np.where(codes >= 0, parsed[codes], np.nan), index=values.index)
+
+
+def _parse_categories(values, parse):
+    """Parses distinct values with parse and returns a categorical column."""
+    codes, uniques = _distinct(values)
+    if uniques.empty:
+        return pd.Series(pd.Categorical([np.nan] * len(values)), index=values.index)
+    parsed_codes, categories = pd.factorize(parse(uniques))
+    return pd.Series(
+        pd.Categorical.from_codes(
+            np.where(codes >= 0, parsed_codes[codes], -1), categories
+        ),
+        index=values.index,
+    )
+
+
+def clean_dataframe(df, listing_type, verbose=True):
     """Applies cleaning functions to a dataframe."""
-    print(f"Cleaning {listing_type} data...")
-    df["listing_type"] = listing_type
-
-    # Apply parsing functions to create new, clean columns
-    df["price_cleaned"] = df["price"].apply(parse_price)
-    df["size_sqft_cleaned"] = df["size"].apply(parse_size)
-    df["bedrooms_cleaned"] = df["bedrooms"].replace("Studio", 1)
-    df["bedrooms_cleaned"] = pd.to_numeric(df["bedrooms_cleaned"], errors="coerce")
-    df["bathrooms_cleaned"] = pd.to_numeric(df["bathrooms"], errors="coerce")
-    df["location_primary"] = df["location"].str.split(",").str[0].str.strip()
-
-    # CORRECTED: Select only the new, cleaned columns with the correct names
-    df_final = df[
-        [
-            "price_cleaned",
-            "size_sqft_cleaned",
-            "bedrooms_cleaned",
-            "bathrooms_cleaned",
-            "location_primary",
-            "listing_type",
-            "property_type",
-        ]
-    ].copy()
-
-    # Rename columns to their final, simple names
-    df_final.columns = [
-        "price",
-        "area_sqft",
-        "bedrooms",
-        "bathrooms",
-        "location",
-        "listing_type",
-        "property_type",
-    ]
+    if verbose:
+        print(f"Cleaning {listing_type} data...")
+    df_final = pd.DataFrame(
+        {
+            "price": _parse_numbers(df["price"], parse_prices),
+            "area_sqft": _parse_numbers(df["size"], parse_sizes),
+            "bedrooms": _parse_numbers(df["bedrooms"], parse_bedrooms, text_only=False),
+            "bathrooms": pd.to_numeric(df["bathrooms"], errors="coerce"),
+            "location": _parse_categories(df["location"], primary_locations),
+            "listing_type": pd.Categorical.from_codes(
+                np.zeros(len(df), dtype=np.int8), [listing_type]
+            ),
+            "property_type": df["property_type"].astype("category"),
+        },
+        index=df.index,
+    )
 
     df_final.dropna(inplace=True)
     return df_final
 
 
-def main():
-    """Loads, cleans, combines, and saves the property datasets."""
-    print("Starting data cleaning process...")
+def clean_in_memory(input_files, output_filename):
+    """
+    Loads every scrape whole, cleans and combines them, and writes output_filename.
+    Returns (raw rows read, the combined cleaned DataFrame).
+    """
+    # Only the columns clean_dataframe uses; the wide free-text ones (description,
+    # keywords, facilities...) are never loaded.
+    frames = {
+        listing_type: pd.read_csv(path, usecols=RAW_COLUMNS)
+        for listing_type, path in input_files.items()
+    }
+    combined_df = pd.concat(
+        [clean_dataframe(df, listing_type) for listing_type, df in frames.items()],
+        ignore_index=True,
+    )
+    write_cleaned(combined_df, output_filename)
+    return sum(len(df) for df in frames.values()), combined_df
+
+
+def output_format(filename):
+    """The OUTPUT_FORMATS key for a cleaned-data filename, from its extension."""
+    extension = os.path.splitext(filename)[1]
+    for name, format_extension in OUTPUT_FORMATS.items():
+        if extension == format_extension:
+            return name
+    raise ValueError(f"Unsupported cleaned-data file '{filename}'.")
+
+
+def arrow_schema():
+    """The typed Arrow schema of the cleaned data (pyarrow is only needed here)."""
+    import pyarrow as pa
+
+    return pa.schema(
+        [(column, pa.float64()) for column in NUMERIC_COLUMNS]
+        + [
+            (column, pa.dictionary(pa.int32(), pa.string()))
+            for column in CATEGORICAL_COLUMNS
+        ]
+    )
+
+
+def _to_arrow(df):
+    import pyarrow as pa
+
+    return pa.Table.from_pandas(
+        df[NUMERIC_COLUMNS + CATEGORICAL_COLUMNS].astype(
+            {column: float for column in NUMERIC_COLUMNS}
+        ),
+        preserve_index=False,
+    ).cast(arrow_schema())
+
+
+def write_cleaned(df, output_filename, fmt=None):
+    """Writes cleaned data as CSV, Parquet or Feather, by default by file extension."""
+    fmt = fmt or output_format(output_filename)
+    if fmt == "csv":
+        df.to_csv(output_filename, index=False)
+        return
+
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    table = _to_arrow(df).unify_dictionaries()
+    if fmt == "parquet":
+        pq.write_table(table, output_filename)
+    else:
+        # Uncompressed, so readers can memory-map the columns instead of copying.
+        feather.write_feather(table, output_filename, compression="uncompressed")
+
+
+def _clean_chunks(input_files, chunksize):
+    """Yields (raw rows, cleaned DataFrame) for each chunk of each scrape."""
+    for listing_type, path in input_files.items():
+        print(f"Cleaning {listing_type} data in chunks of {chunksize} rows...")
+        for chunk in pd.read_csv(path, usecols=RAW_COLUMNS, chunksize=chunksize):
+            cleaned = clean_dataframe(chunk, listing_type, verbose=False)
+            # A chunk without missing values would otherwise parse counts as
+            # integers and write "2" where other chunks write "2.0".
+            yield len(chunk), cleaned.astype(STREAMING_DTYPES)
+
+
+def clean_streaming(input_files, output_filename, chunksize):
+    """
+    Cleans each scrape chunksize rows at a time, appending every cleaned chunk to
+    output_filename, so memory use depends on the chunk size, not the file size.
+    Returns (raw rows read, cleaned rows written).
+    """
+    fmt = output_format(output_filename)
+    if fmt == "feather":
+        # A Feather file holds a single dictionary per column, which is only known
+        # once every chunk has been seen.
+        raise ValueError("Streaming writes CSV or Parquet; convert to Feather after.")
+
+    rows_read = rows_written = 0
+    # Write next to the destination and rename at the end, so an interrupted run
+    # never leaves a truncated cleaned file behind.
+    tmp_filename = f"{output_filename}.tmp"
+    if fmt == "csv":
+        with open(tmp_filename, "w", newline="") as output:
+            for raw_rows, cleaned in _clean_chunks(input_files, chunksize):
+                cleaned.to_csv(output, header=rows_read == 0, index=False)
+                rows_read += raw_rows
+                rows_written += len(cleaned)
+    else:
+        import pyarrow.parquet as pq
+
+        # Each chunk becomes its own row group with its own dictionaries.
+        with pq.ParquetWriter(tmp_filename, arrow_schema()) as writer:
+            for raw_rows, cleaned in _clean_chunks(input_files, chunksize):
+                writer.write_table(_to_arrow(cleaned))
+                rows_read += raw_rows
+                rows_written += len(cleaned)
+    os.replace(tmp_filename, output_filename)
+    return rows_read, rows_written
+
+
+def cleaned_data_path(basename=OUTPUT_BASENAME):
+    """
+    The newest of <basename>.feather/.parquet/.csv. Raises FileNotFoundError if
+    none exists.
+    """
+    candidates = [
+        basename + extension
+        for extension in OUTPUT_FORMATS.values()
+        if os.path.exists(basename + extension)
+    ]
+    if not candidates:
+        raise FileNotFoundError(f"No '{basename}.csv' (or .parquet/.feather) found.")
+    return max(candidates, key=os.path.getmtime)
+
+
+def load_cleaned_data(basename=OUTPUT_BASENAME):
+    """
+    Loads the newest of <basename>.feather/.parquet/.csv as a DataFrame with float
+    numeric columns and categorical location/listing_type/property_type columns.
+    Feather files are memory-mapped. Raises FileNotFoundError if none exists.
+    """
+    return read_cleaned(cleaned_data_path(basename))
+
+
+def read_cleaned(path):
+    """Reads one cleaned-data file; see load_cleaned_data."""
+    fmt = output_format(path)
+    if fmt == "csv":
+        df = pd.read_csv(
+            path,
+            dtype={
+                **{column: "float64" for column in NUMERIC_COLUMNS},
+                **{column: "category" for column in CATEGORICAL_COLUMNS},
+            },
+        )
+    elif fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        df = pq.read_table(path, memory_map=True).to_pandas()
+    else:
+        import pyarrow.feather as feather
+
+        df = feather.read_table(path, memory_map=True).to_pandas()
+
+    # Sorted categories make get_dummies/OneHotEncoder columns come out in the same
+    # order whichever format was loaded (and as they did from plain strings).
+    for column in CATEGORICAL_COLUMNS:
+        df[column] = df[column].cat.reorder_categories(
+            sorted(df[column].cat.categories)
+        )
+    return df
+
+
+def fingerprint_rows(chunk, listing_type, occurrences):
+    """
+    64-bit fingerprints of source rows. Identical rows are common in the scrapes,
+    so the n-th copy of a row is fingerprinted as (row, n); occurrences carries
+    the copies counted so far across the chunks of one file.
+    """
+    keys = chunk.reindex(columns=FINGERPRINT_COLUMNS).assign(listing_type=listing_type)
+    row_hashes = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+    codes, uniques = pd.factorize(row_hashes)
+    earlier = np.array([occurrences.get(h, 0) for h in uniques.tolist()], dtype=int)
+    occurrence = earlier[codes] + pd.Series(codes).groupby(codes).cumcount().to_numpy()
+    occurrences.update(zip(uniques.tolist(), (earlier + np.bincount(codes)).tolist()))
+
+    return pd.util.hash_pandas_object(
+        pd.DataFrame({"row": row_hashes, "occurrence": occurrence}), index=False
+    ).to_numpy()
+
+
+def _contains(sorted_values, values):
+    """np.isin for an already sorted, unique haystack, without re-sorting it."""
+    if not len(sorted_values):
+        return np.zeros(len(values), dtype=bool)
+    positions = np.searchsorted(sorted_values, values)
+    positions[positions == len(sorted_values)] = 0
+    return sorted_values[positions] == values
+
+
+def _manifest_filename(output_filename):
+    return f"{output_filename}.manifest.npz"
+
+
+def _load_manifest(output_filename):
+    """The manifest of output_filename, or None if a full rebuild is needed."""
     try:
-        df_rent = pd.read_csv("dataset_for_rent.csv")
-        df_sale = pd.read_csv("dataset_for_sale.csv")
-    except FileNotFoundError as e:
-        print(f"Error: {e}.")
+        manifest = np.load(_manifest_filename(output_filename))
+    except (OSError, ValueError):
+        return None
+    # Anything else touching the output (a full run, an interrupted append) or a
+    # newer cleaner invalidates the manifest.
+    if (
+        int(manifest["cleaner_version"]) != CLEANER_VERSION
+        or not os.path.exists(output_filename)
+        or int(manifest["output_size"]) != os.path.getsize(output_filename)
+        or int(manifest["output_mtime_ns"]) != os.stat(output_filename).st_mtime_ns
+    ):
+        return None
+    return manifest
+
+
+def _save_manifest(output_filename, seen, output_fingerprints, sources):
+    tmp_filename = f"{output_filename}.manifest.tmp.npz"
+    source_arrays = {}
+    for listing_type, (size, digest, occurrences) in sources.items():
+        source_arrays[f"{listing_type}_size"] = size
+        source_arrays[f"{listing_type}_digest"] = digest
+        source_arrays[f"{listing_type}_row_hashes"] = np.fromiter(
+            occurrences.keys(), dtype=np.uint64, count=len(occurrences)
+        )
+        source_arrays[f"{listing_type}_row_counts"] = np.fromiter(
+            occurrences.values(), dtype=np.int64, count=len(occurrences)
+        )
+    np.savez(
+        tmp_filename,
+        cleaner_version=CLEANER_VERSION,
+        output_size=os.path.getsize(output_filename),
+        output_mtime_ns=os.stat(output_filename).st_mtime_ns,
+        seen=seen,
+        output_fingerprints=output_fingerprints,
+        **source_arrays,
+    )
+    os.replace(tmp_filename, _manifest_filename(output_filename))
+
+
+def _hash_file(path, prefix_size):
+    """Returns (digest of the first prefix_size bytes, digest of the whole file)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        remaining = prefix_size
+        while remaining > 0:
+            block = f.read(min(1 << 20, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+        prefix_digest = digest.copy().hexdigest()
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return prefix_digest, digest.hexdigest()
+
+
+def _complete_size(path):
+    """The file size if it ends on a line break, else 0 (a row may still grow)."""
+    size = os.path.getsize(path)
+    if size == 0:
+        return 0
+    with open(path, "rb") as f:
+        f.seek(size - 1)
+        return size if f.read(1) == b"\n" else 0
+
+
+def _read_fingerprint_columns(path, offset, chunksize):
+    """Yields chunks of a scrape's FINGERPRINT_COLUMNS, starting at byte offset."""
+    options = dict(
+        usecols=lambda column: column in FINGERPRINT_COLUMNS,
+        # Strings throughout, so fingerprints do not depend on per-chunk dtypes.
+        dtype=str,
+        chunksize=chunksize,
+    )
+    if offset == 0:
+        yield from pd.read_csv(path, **options)
         return
+    names = list(pd.read_csv(path, nrows=0).columns)
+    with open(path, "rb") as f:
+        f.seek(offset)
+        if not f.read(1):
+            return
+        f.seek(offset)
+        yield from pd.read_csv(f, header=None, names=names, **options)
+
+
+def clean_incremental(input_files, output_filename, chunksize):
+    """
+    Cleans only source rows whose fingerprint is not in the manifest, appends them
+    to output_filename, and drops cleaned rows whose source row has disappeared or
+    changed. Without a usable manifest this is a full (chunked) rebuild.
+
+    When every scrape has only grown since the last run (its old contents are an
+    unchanged prefix), only the appended bytes are parsed. Otherwise all sources
+    are re-scanned for fingerprints, but still only new rows are cleaned. New
+    rows go at the end, so the row order can differ from a full rebuild; the set
+    of rows is the same. Returns a dict of row counts.
+    """
+    manifest = _load_manifest(output_filename)
+    seen = manifest["seen"] if manifest is not None else np.empty(0, dtype=np.uint64)
+
+    digests = {}
+    appended_only = manifest is not None
+    for listing_type, path in input_files.items():
+        key = f"{listing_type}_size"
+        previous_size = int(manifest[key]) if appended_only and key in manifest else 0
+        prefix_digest, digests[listing_type] = _hash_file(path, previous_size)
+        appended_only = (
+            appended_only
+            and previous_size > 0
+            and prefix_digest == str(manifest[f"{listing_type}_digest"])
+        )
+
+    source_fingerprints = []
+    new_frames = []
+    new_fingerprints = []
+    sources = {}
+    rows_read = rows_cleaned = 0
+    for listing_type, path in input_files.items():
+        if appended_only:
+            offset = int(manifest[f"{listing_type}_size"])
+            occurrences = dict(
+                zip(
+                    manifest[f"{listing_type}_row_hashes"].tolist(),
+                    manifest[f"{listing_type}_row_counts"].tolist(),
+                )
+            )
+            print(f"Reading {listing_type} listings appended since the last run...")
+        else:
+            offset = 0
+            occurrences = {}
+            print(f"Scanning {listing_type} data for new listings...")
+
+        for chunk in _read_fingerprint_columns(path, offset, chunksize):
+            fingerprints = fingerprint_rows(chunk, listing_type, occurrences)
+            source_fingerprints.append(fingerprints)
+            rows_read += len(chunk)
+            is_new = ~_contains(seen, fingerprints)
+            if not is_new.any():
+                continue
+            rows_cleaned += int(is_new.sum())
+            cleaned = clean_dataframe(chunk[is_new], listing_type, verbose=False)
+            new_frames.append(cleaned.astype(STREAMING_DTYPES))
+            positions = chunk.index.get_indexer(cleaned.index)
+            new_fingerprints.append(fingerprints[positions])
+        sources[listing_type] = (
+            _complete_size(path),
+            digests[listing_type],
+            occurrences,
+        )
+
+    source_fingerprints = np.unique(np.concatenate(source_fingerprints or [seen[:0]]))
+    new_fingerprints = np.concatenate(new_fingerprints or [seen[:0]])
+    if new_frames:
+        new_rows = pd.concat(new_frames, ignore_index=True)
+    else:
+        new_rows = pd.DataFrame(columns=NUMERIC_COLUMNS + CATEGORICAL_COLUMNS)
 
-    rent_cleaned = clean_dataframe(df_rent, "rent")
-    sale_cleaned = clean_dataframe(df_sale, "sale")
+    if manifest is None:
+        kept_fingerprints = seen[:0]
+        stale = np.zeros(0, dtype=bool)
+    else:
+        kept_fingerprints = manifest["output_fingerprints"]
+        if appended_only:
+            # Only the appended rows were scanned; nothing can have gone away.
+            stale = np.zeros(len(kept_fingerprints), dtype=bool)
+            added = source_fingerprints[~_contains(seen, source_fingerprints)]
+            source_fingerprints = np.insert(seen, np.searchsorted(seen, added), added)
+        else:
+            stale = ~_contains(source_fingerprints, kept_fingerprints)
 
-    combined_df = pd.concat([rent_cleaned, sale_cleaned], ignore_index=True)
+    fmt = output_format(output_filename)
+    if manifest is not None and fmt == "csv" and not stale.any():
+        # The common nightly case: nothing changed, only rows to append.
+        if len(new_rows):
+            new_rows.to_csv(output_filename, mode="a", header=False, index=False)
+    elif manifest is None or stale.any() or len(new_rows):
+        frames = [new_rows]
+        if manifest is not None:
+            existing = read_cleaned(output_filename)
+            frames.insert(0, existing[~stale].astype(STREAMING_DTYPES))
+        combined = pd.concat(
+            [frame for frame in frames if len(frame)] or [new_rows], ignore_index=True
+        )
+        tmp_filename = f"{output_filename}.tmp"
+        write_cleaned(combined, tmp_filename, fmt)
+        os.replace(tmp_filename, output_filename)
+        kept_fingerprints = kept_fingerprints[~stale]
 
-    output_filename = "properties_cleaned.csv"
-    combined_df.to_csv(output_filename, index=False)
+    output_fingerprints = np.concatenate([kept_fingerprints, new_fingerprints])
+    _save_manifest(output_filename, source_fingerprints, output_fingerprints, sources)
+    return {
+        "rows_read": rows_read,
+        "rows_cleaned": rows_cleaned,
+        "rows_added": len(new_fingerprints),
+        "rows_removed": int(stale.sum()),
+        "rows_total": len(output_fingerprints),
+        "rebuilt": manifest is None,
+        "appended_only": appended_only,
+    }
 
+
+def main():
+    """Loads, cleans, combines, and saves the property datasets."""
+    parser = argparse.ArgumentParser(description="Clean the scraped listings.")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="clean in chunks with bounded memory (for scrapes larger than RAM)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="clean only source rows added or changed since the last incremental run",
+    )
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument(
+        "--format",
+        choices=sorted(OUTPUT_FORMATS),
+        default="csv",
+        help="output format (Feather is fastest to load; not with --stream)",
+    )
+    args = parser.parse_args()
+    output_filename = OUTPUT_BASENAME + OUTPUT_FORMATS[args.format]
+    if args.stream and args.format == "feather":
+        parser.error("--stream writes csv or parquet; convert to feather afterwards.")
+    if args.stream and args.incremental:
+        parser.error("--incremental already reads in chunks; drop --stream.")
+
+    print("Starting data cleaning process...")
+    for path in INPUT_FILES.values():
+        if not os.path.exists(path):
+            print(f"Error: [Errno 2] No such file or directory: '{path}'.")
+            return
+
+    start = time.perf_counter()
+    combined_df = None
+    if args.incremental:
+        counts = clean_incremental(INPUT_FILES, output_filename, args.chunksize)
+        rows_read, rows_written = counts["rows_read"], counts["rows_total"]
+        notes = []
+        if counts["rebuilt"]:
+            notes.append("No usable manifest; rebuilt from scratch.")
+        elif counts["appended_only"]:
+            notes.append("Scrapes were only appended to; parsed the new rows only.")
+        notes.append(
+            f"Cleaned {counts['rows_cleaned']} new or changed rows: "
+            f"{counts['rows_added']} added, {counts['rows_removed']} removed."
+        )
+        print(" ".join(notes))
+    elif args.stream:
+        rows_read, rows_written = clean_streaming(
+            INPUT_FILES, output_filename, args.chunksize
+        )
+    else:
+        rows_read, combined_df = clean_in_memory(INPUT_FILES, output_filename)
+        rows_written = len(combined_df)
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"\nData cleaning complete! Saved {rows_written} properties to '{output_filename}'"
+    )
     print(
-        f"\nData cleaning complete! Saved {len(combined_df)} properties to '{output_filename}'"
+        f"Processed {rows_read} raw rows in {elapsed:.2f}s "
+        f"({rows_read / elapsed:,.0f} rows/s); peak RSS {peak_rss_bytes() / 1e6:.0f} MB."
     )
-    print("Dataset preview:")
-    print(combined_df.head())
+    if combined_df is not None:
+        print("Dataset preview:")
+        print(combined_df.head())
 
 
 if __name__ == "__main__":
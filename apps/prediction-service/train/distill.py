@@ -0,0 +1,164 @@
+# File Path: apps/prediction-service/train/distill.py
+"""
+Distills the model train.py picks into a much smaller student model for serving.
+
+Students learn the teacher's log-price predictions, not the raw labels. The
+transfer set is the training split plus `augment` copies of every row with its
+floor area jittered, so students also see how the teacher prices the sizes
+between the observed ones. Every candidate student is scored on the test split
+like the teacher. The smallest one (by tree nodes) whose R² drop and relative
+RMSE increase stay within the budget replaces the teacher; if none does, the
+teacher is served unchanged.
+
+Students are single trees and small ensembles, so they go through the same
+artifact format and tree engine as any other model.
+"""
+
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.base import clone
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.tree import DecisionTreeRegressor
+
+from feature_matrix import model_input
+from model_artifact import artifact_size_bytes, export_artifact
+from tree_engine import compile_estimator, flatten_estimator
+
+# Candidate students; the smallest one within budget wins.
+STUDENTS = {
+    "Decision Tree (depth 12)": DecisionTreeRegressor(
+        max_depth=12, min_samples_leaf=2, random_state=42
+    ),
+    "Decision Tree (depth 16)": DecisionTreeRegressor(
+        max_depth=16, min_samples_leaf=2, random_state=42
+    ),
+    "Decision Tree (depth 22)": DecisionTreeRegressor(max_depth=22, random_state=42),
+    "Gradient Boosting (200 x depth 6)": GradientBoostingRegressor(
+        n_estimators=200, max_depth=6, random_state=42
+    ),
+    "Random Forest (10 x depth 20)": RandomForestRegressor(
+        n_estimators=10, max_depth=20, random_state=42, n_jobs=-1
+    ),
+}
+
+
+def transfer_set(X, area_column, augment, seed=42):
+    """X plus `augment` copies of it with area_sqft scaled by up to about +-20%."""
+    if augment <= 0:
+        return X
+    rng = np.random.default_rng(seed)
+    row_of_entry = np.repeat(np.arange(X.shape[0]), np.diff(X.indptr))
+    is_area = X.indices == area_column
+    copies = [X]
+    for _ in range(augment):
+        jittered = X.copy()
+        factors = np.exp(rng.normal(0.0, 0.1, X.shape[0]))
+        jittered.data[is_area] *= factors[row_of_entry[is_area]]
+        copies.append(jittered)
+    return sp.vstack(copies, format="csr")
+
+
+def score(model, X_test, y_test_log):
+    """(R², RMSE) of a log-price model on actual prices, as train.py reports them."""
+    predictions = np.expm1(model.predict(model_input(model, X_test)))
+    actual = np.expm1(y_test_log)
+    return (
+        r2_score(actual, predictions),
+        np.sqrt(mean_squared_error(actual, predictions)),
+    )
+
+
+def serving_cost(model, columns, X_rows, iterations=200):
+    """
+    Size of the model's artifact and its latency in the tree engine main.py uses:
+    (artifact bytes, node count, single-row ms, ms per batch of X_rows).
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        export_artifact(model, columns, directory)
+        size = artifact_size_bytes(directory)
+    n_nodes = flatten_estimator(model)[0].get("n_nodes", 0)
+    engine = compile_estimator(model, columns)
+    rows = X_rows.toarray() if sp.issparse(X_rows) else np.asarray(X_rows)
+
+    single = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        engine.predict(rows[i % len(rows)][None, :])
+        single.append(time.perf_counter() - start)
+    batch = []
+    for _ in range(max(iterations // 20, 3)):
+        start = time.perf_counter()
+        engine.predict(rows)
+        batch.append(time.perf_counter() - start)
+    return size, n_nodes, np.median(single) * 1000, np.median(batch) * 1000
+
+
+def distill(
+    teacher,
+    X_train,
+    X_test,
+    y_test_log,
+    columns,
+    max_r2_drop=0.01,
+    max_rmse_increase=0.05,
+    augment=2,
+):
+    """
+    Fits every student on the teacher's predictions. Returns (name, student,
+    report): the smallest student within budget, or None, None when there is
+    none, and a DataFrame comparing the teacher with every student.
+    """
+    X_transfer = transfer_set(X_train, columns.index("area_sqft"), augment)
+    y_transfer = teacher.predict(model_input(teacher, X_transfer))
+    X_rows = X_test[:1000]
+
+    teacher_r2, teacher_rmse = score(teacher, X_test, y_test_log)
+    size, n_nodes, single_ms, batch_ms = serving_cost(teacher, columns, X_rows)
+    rows = {
+        "Teacher": {
+            "R²": teacher_r2,
+            "RMSE": teacher_rmse,
+            "nodes": n_nodes,
+            "artifact MB": size / 1e6,
+            "1-row ms": single_ms,
+            f"{X_rows.shape[0]}-row ms": batch_ms,
+            "within budget": True,
+        }
+    }
+    candidates = []
+    for name, template in STUDENTS.items():
+        student = clone(template)
+        student.fit(model_input(student, X_transfer), y_transfer)
+        r2, rmse = score(student, X_test, y_test_log)
+        size, n_nodes, single_ms, batch_ms = serving_cost(student, columns, X_rows)
+        accepted = (
+            teacher_r2 - r2 <= max_r2_drop
+            and rmse / teacher_rmse - 1 <= max_rmse_increase
+        )
+        rows[name] = {
+            "R²": r2,
+            "RMSE": rmse,
+            "nodes": n_nodes,
+            "artifact MB": size / 1e6,
+            "1-row ms": single_ms,
+            f"{X_rows.shape[0]}-row ms": batch_ms,
+            "within budget": accepted,
+        }
+        if accepted:
+            candidates.append((n_nodes, name, student))
+
+    report = pd.DataFrame(rows).T
+    if not candidates:
+        return None, None, report
+    _, name, student = min(candidates, key=lambda candidate: candidate[0])
+    return name, student, report
+
+
+def is_distillable(model):
+    """Only multi-tree ensembles are worth shrinking."""
+    return len(getattr(model, "estimators_", [])) > 1
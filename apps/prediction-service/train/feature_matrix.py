@@ -0,0 +1,90 @@
+# File Path: apps/prediction-service/train/feature_matrix.py
+"""
+Sparse one-hot feature matrices for training.
+
+pd.get_dummies(..., dtype=int) materializes a dense int64 column for every
+location, and train_test_split and each estimator then copy it again. Instead,
+encode_features builds a CSR matrix directly from the pandas category codes: each
+row stores its numeric features plus one 1.0 per categorical feature, so memory
+grows with the number of rows, not rows x distinct locations.
+
+The column names and order are exactly those get_dummies produced, so
+model_columns.joblib and the serving FeatureEncoder are unchanged.
+"""
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+
+# Same order as the non-dummy columns pd.get_dummies kept in front.
+NUMERIC_FEATURES = ["area_sqft", "bedrooms", "bathrooms"]
+CATEGORICAL_FEATURES = ["location", "listing_type", "property_type"]
+
+
+def feature_columns(df):
+    """The model column names, in the order get_dummies would have produced."""
+    columns = list(NUMERIC_FEATURES)
+    for feature in CATEGORICAL_FEATURES:
+        columns += [f"{feature}_{value}" for value in df[feature].cat.categories]
+    return columns
+
+
+def encode_features(df, dtype=np.float64):
+    """
+    Encodes the cleaned frame's features into (CSR matrix, column names).
+
+    The categorical columns must be pandas categoricals (as load_cleaned_data
+    returns them) with no missing values.
+    """
+    n_rows = len(df)
+    columns = feature_columns(df)
+    row_width = len(NUMERIC_FEATURES) + len(CATEGORICAL_FEATURES)
+
+    data = np.ones((n_rows, row_width), dtype=dtype)
+    indices = np.empty((n_rows, row_width), dtype=np.int32)
+    for i, feature in enumerate(NUMERIC_FEATURES):
+        data[:, i] = df[feature].to_numpy(dtype=dtype)
+        indices[:, i] = i
+
+    offset = len(NUMERIC_FEATURES)
+    for i, feature in enumerate(CATEGORICAL_FEATURES, start=len(NUMERIC_FEATURES)):
+        # Codes are int8 for small vocabularies; widen before adding the offset.
+        codes = df[feature].cat.codes.to_numpy(dtype=np.int32)
+        if (codes < 0).any():
+            raise ValueError(f"'{feature}' has missing values; clean the data first.")
+        indices[:, i] = offset + codes
+        offset += len(df[feature].cat.categories)
+
+    # Every row has the same number of stored entries, already in column order.
+    indptr = np.arange(0, n_rows * row_width + 1, row_width, dtype=np.int64)
+    matrix = sp.csr_matrix(
+        (data.ravel(), indices.ravel(), indptr), shape=(n_rows, len(columns))
+    )
+    return matrix, columns
+
+
+def prefers_dense(estimator):
+    """
+    True if the estimator should be fitted on a dense matrix.
+
+    That is every estimator that rejects sparse input, plus the random forests:
+    they accept CSR, but sklearn's sparse splitter makes fitting several times
+    slower than on the dense float32 matrix the trees work on internally.
+    """
+    return not estimator.__sklearn_tags__().input_tags.sparse or isinstance(
+        estimator, (RandomForestRegressor, ExtraTreesRegressor)
+    )
+
+
+def model_input(estimator, X):
+    """X as the estimator should receive it: CSR as is, or dense float32."""
+    if sp.issparse(X) and prefers_dense(estimator):
+        return X.astype(np.float32).toarray()
+    return X
+
+
+def matrix_nbytes(X):
+    """Bytes held by a dense array or the three arrays of a CSR matrix."""
+    if sp.issparse(X):
+        return X.data.nbytes + X.indices.nbytes + X.indptr.nbytes
+    return X.nbytes
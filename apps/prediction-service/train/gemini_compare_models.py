@@ -1,8 +1,10 @@
 import pandas as pd
-import numpy as np
-import re
+import os
+import sys
 import time
 
+from joblib import Memory, Parallel, delayed
+from sklearn.base import clone
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
 from sklearn.compose import ColumnTransformer
@@ -18,7 +20,16 @@ import xgboost as xgb
 import lightgbm as lgb
 import catboost as cb
 
+# text_features lives next to main.py, which serves the text-aware model.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# Fitted preprocessing output is cached here, keyed on the preprocessor's
+# parameters and the exact train/test split.
+CACHE_DIR = ".preprocess_cache"
+stage_times = {}
+
 # --- 1. Load and Inspect Data ---
+stage_start = time.perf_counter()
 try:
     df = pd.read_csv("dataset.csv")
     print("\u2705 Dataset loaded successfully.")
@@ -28,49 +39,22 @@ except FileNotFoundError:
         "\u274c Error: dataset.csv not found. Please make sure the file is in the same directory."
     )
     exit()
+stage_times["Load data"] = time.perf_counter() - stage_start
 
 
 # --- 2. Data Cleaning and Feature Engineering Functions ---
-def clean_price(price_str):
-    if isinstance(price_str, str):
-        numbers = re.findall(r"\d+\.?\d*", price_str)
-        return float(numbers[0]) if numbers else np.nan
-    return np.nan
-
-
-def clean_size(size_str):
-    if isinstance(size_str, str):
-        numbers = re.findall(r"[\d,]+", size_str)
-        if numbers:
-            return float(numbers[0].replace(",", ""))
-    return np.nan
-
-
-def clean_bedrooms(bedrooms_val):
-    if isinstance(bedrooms_val, str) and bedrooms_val.lower() == "studio":
-        return 0
-    try:
-        return int(bedrooms_val)
-    except (ValueError, TypeError):
-        return np.nan
-
-
-def extract_location_parts(location_str):
-    if not isinstance(location_str, str):
-        return "Unknown", "Unknown"
-    parts = [part.strip() for part in location_str.split(",")]
-    if len(parts) >= 3:
-        city = parts[-3]
-        state = parts[-2]
-        return city, state
-    elif len(parts) == 2:
-        return parts[0], parts[1]
-    elif len(parts) == 1:
-        return parts[0], "Unknown"
-    return "Unknown", "Unknown"
-
+# The ones the served text-aware model is trained with, so the comparison
+# scores the same features.
+from text_features import (
+    clean_bedrooms,
+    clean_price,
+    clean_size,
+    extract_location_parts,
+    split_facilities,
+)
 
 # --- 3. Apply Cleaning and Create Features ---
+stage_start = time.perf_counter()
 df["price_numeric"] = df["price"].apply(clean_price)
 df["size_sqft"] = df["size"].apply(clean_size)
 df["bedrooms_cleaned"] = df["bedrooms"].apply(clean_bedrooms)
@@ -83,6 +67,7 @@ df = pd.concat([df, location_df], axis=1)
 df["description"] = df["description"].fillna("")
 df["facilities"] = df["facilities"].fillna("")
 df.dropna(subset=["price_numeric"], inplace=True)
+stage_times["Clean and engineer features"] = time.perf_counter() - stage_start
 
 # --- 4. Prepare Data for Modeling ---
 X = df.drop("price_numeric", axis=1)
@@ -119,57 +104,89 @@ preprocessor = ColumnTransformer(
             TfidfVectorizer(max_features=100, stop_words="english"),
             text_features,
         ),
-        ("fac", TfidfVectorizer(tokenizer=lambda x: x.split(";")), facility_features),
+        ("fac", TfidfVectorizer(tokenizer=split_facilities), facility_features),
     ],
     remainder="drop",
 )
 
-# --- 6. Define Models to Compare ---
-models = {
-    "Linear Regression": LinearRegression(n_jobs=-1),
-    "Random Forest": RandomForestRegressor(random_state=42, n_jobs=-1),
-    "XGBoost": xgb.XGBRegressor(random_state=42, n_jobs=-1),
-    "LightGBM": lgb.LGBMRegressor(random_state=42, n_jobs=-1),
-    "CatBoost": cb.CatBoostRegressor(random_state=42, verbose=0),
-}
 
-# --- 7. Train and Evaluate All Models ---
-results = {}
+# The preprocessor only depends on the split, not on the model, so it is fitted
+# once and every model trains on the same transformed matrices. joblib Memory
+# keeps them on disk, so re-running the comparison skips the text vectorization.
+def fit_transform_split(preprocessor, X_train, X_test):
+    fitted = clone(preprocessor)
+    return fitted.fit_transform(X_train), fitted.transform(X_test)
 
-for name, model in models.items():
-    print(f"\u2699\ufe0f  Training {name}...")
-    start_time = time.time()
 
-    # Create the full pipeline with the current model
-    model_pipeline = Pipeline(
-        steps=[("preprocessor", preprocessor), ("regressor", model)]
-    )
+cached_fit_transform = Memory(CACHE_DIR, verbose=0).cache(fit_transform_split)
 
-    # Train the model
-    model_pipeline.fit(X_train, y_train)
+stage_start = time.perf_counter()
+was_cached = cached_fit_transform.check_call_in_cache(preprocessor, X_train, X_test)
+X_train_features, X_test_features = cached_fit_transform(preprocessor, X_train, X_test)
+stage_times["Preprocess (cached)" if was_cached else "Preprocess (fit once)"] = (
+    time.perf_counter() - stage_start
+)
+print(
+    f"\u2705 Preprocessed features: {X_train_features.shape[1]} columns"
+    f"{' (from cache)' if was_cached else ''}."
+)
 
-    # Make predictions
-    y_pred = model_pipeline.predict(X_test)
+# --- 6. Define Models to Compare ---
+# Each model is fitted single-threaded: the comparison runs the models in
+# parallel worker processes instead, which keeps the cores busy without
+# oversubscribing them.
+models = {
+    "Linear Regression": LinearRegression(),
+    "Random Forest": RandomForestRegressor(random_state=42, n_jobs=1),
+    "XGBoost": xgb.XGBRegressor(random_state=42, n_jobs=1),
+    "LightGBM": lgb.LGBMRegressor(random_state=42, n_jobs=1),
+    "CatBoost": cb.CatBoostRegressor(random_state=42, verbose=0, thread_count=1),
+}
 
-    # Calculate metrics
-    mae = mean_absolute_error(y_test, y_pred)
-    r2 = r2_score(y_test, y_pred)
-    end_time = time.time()
 
-    # Store results
-    results[name] = {
-        "R-squared (R�)": r2,
-        "Mean Absolute Error (MAE)": mae,
-        "Training Time (s)": end_time - start_time,
+# --- 7. Train and Evaluate All Models ---
+def fit_and_evaluate(name, model, X_train, y_train, X_test, y_test):
+    """Fits one model on the preprocessed features; runs in a worker process."""
+    start_time = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    y_pred = model.predict(X_test)
+    predict_time = time.perf_counter() - start_time
+
+    return name, {
+        "R-squared (R�)": r2_score(y_test, y_pred),
+        "Mean Absolute Error (MAE)": mean_absolute_error(y_test, y_pred),
+        "Fit Time (s)": fit_time,
+        "Predict Time (s)": predict_time,
     }
-    print(f"\u2705 {name} trained in {end_time - start_time:.2f} seconds.")
+
+
+print(f"\u2699\ufe0f  Training {len(models)} models in parallel...")
+stage_start = time.perf_counter()
+results = dict(
+    Parallel(n_jobs=-1)(
+        delayed(fit_and_evaluate)(
+            name, model, X_train_features, y_train, X_test_features, y_test
+        )
+        for name, model in models.items()
+    )
+)
+stage_times["Fit and evaluate models (wall)"] = time.perf_counter() - stage_start
+for name, result in results.items():
+    print(f"\u2705 {name} trained in {result['Fit Time (s)']:.2f} seconds.")
 
 # --- 8. Display Final Comparison ---
+print("\n\n--- Stage Timings ---")
+for stage, seconds in stage_times.items():
+    print(f"{stage:<34}{seconds:>8.2f}s")
+
 results_df = pd.DataFrame(results).T
 results_df = results_df.sort_values(by="Mean Absolute Error (MAE)", ascending=True)
 
-print("\n\n--- Final Model Performance Comparison ---")
-print(results_df)
+print("\n--- Final Model Performance Comparison ---")
+print(results_df.to_string())
 print("\n--- Conclusion ---")
 print(
     f"\U0001f3c6 The best performing model is '{results_df.index[0]}' with an MAE of RM {results_df.iloc[0]['Mean Absolute Error (MAE)']:.2f} and an R� of {results_df.iloc[0]['R-squared (R�)']:.2f}."
@@ -1,7 +1,8 @@
 import pandas as pd
 import numpy as np
-import re
 import joblib
+import os
+import sys
 
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
@@ -12,6 +13,9 @@ from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_absolute_error, r2_score
 
+# text_features lives next to main.py, which serves this model.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
 # --- 1. Load Data ---
 try:
     df = pd.read_csv("dataset.csv")
@@ -23,54 +27,15 @@ except FileNotFoundError:
     exit()
 
 # --- 2. Data Cleaning and Feature Engineering Functions ---
-
-
-# NEW: Define a named function to handle facility splitting
-def split_facilities(facility_string):
-    """Custom tokenizer to split the facilities string by semicolon."""
-    if isinstance(facility_string, str):
-        return [facility.strip() for facility in facility_string.split(";")]
-    return []
-
-
-def clean_price(price_str):
-    if isinstance(price_str, str):
-        numbers = re.findall(r"\d+\.?\d*", price_str)
-        return float(numbers[0]) if numbers else np.nan
-    return np.nan
-
-
-def clean_size(size_str):
-    if isinstance(size_str, str):
-        numbers = re.findall(r"[\d,]+", size_str)
-        if numbers:
-            return float(numbers[0].replace(",", ""))
-    return np.nan
-
-
-def clean_bedrooms(bedrooms_val):
-    if isinstance(bedrooms_val, str) and bedrooms_val.lower() == "studio":
-        return 0
-    try:
-        return int(bedrooms_val)
-    except (ValueError, TypeError):
-        return np.nan
-
-
-def extract_location_parts(location_str):
-    if not isinstance(location_str, str):
-        return "Unknown", "Unknown"
-    parts = [part.strip() for part in location_str.split(",")]
-    if len(parts) >= 3:
-        city = parts[-3]
-        state = parts[-2]
-        return city, state
-    elif len(parts) == 2:
-        return parts[0], parts[1]
-    elif len(parts) == 1:
-        return parts[0], "Unknown"
-    return "Unknown", "Unknown"
-
+# Shared with the prediction service, which applies them to each request; the
+# pickled pipeline references split_facilities from there.
+from text_features import (
+    clean_bedrooms,
+    clean_price,
+    clean_size,
+    extract_location_parts,
+    split_facilities,
+)
 
 # --- 3. Apply Cleaning and Create Features ---
 df["price_numeric"] = df["price"].apply(clean_price)
@@ -151,8 +116,9 @@ print("-----------------------------")
 
 # --- 7. Save the Model to a File ---
 # The model is saved to a file for later use in predictions.
-# The .joblib file contains the entire pipeline (preprocessor + model).
-MODEL_FILENAME = "property_price_model.joblib"
+# The .joblib file contains the entire pipeline (preprocessor + model). main.py
+# serves it on /predict/listing; it is named apart from train.py's model.
+MODEL_FILENAME = "text_price_model.joblib"
 print(f"\n💾 Saving the final model to '{MODEL_FILENAME}'...")
 joblib.dump(final_model_pipeline, MODEL_FILENAME)
 print(f"✅ Model saved successfully.")
@@ -10,8 +10,11 @@ from sklearn.linear_model import LinearRegression
 from sklearn.tree import DecisionTreeRegressor
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 
+from data_cleaner import load_cleaned_data
+
 # === Load dataset ===
-df = pd.read_csv("properties_cleaned.csv")
+# The newest of properties_cleaned.feather/.parquet/.csv, with typed columns.
+df = load_cleaned_data()
 
 # Features and target
 X = df.drop("price", axis=1)
@@ -0,0 +1,239 @@
+# File Path: apps/prediction-service/train/hyperparameter_search.py
+"""
+K-fold cross-validated hyperparameter sweeps for the models train.py compares.
+
+The encoded feature matrix is written once to .npy files (the three arrays of
+a CSR matrix, or one dense array) and every worker process memory-maps them, so
+no worker repeats the encoding or receives a pickled copy of the data. Each
+(model, params, fold) result is written to its own small JSON file as soon as it
+finishes; re-running the same sweep skips results that already exist, so an
+interrupted search resumes where it stopped. A result is keyed on every
+parameter of the estimator it was fitted with (the fixed ones in ESTIMATORS
+too) and on the sklearn version, so changing either runs the fold again.
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+import sklearn
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression, Ridge
+from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.model_selection import KFold, ParameterGrid
+
+from feature_matrix import model_input
+
+# Every estimator is fitted single-threaded: the sweep parallelizes across
+# configurations and folds instead, which keeps all cores busy without
+# oversubscribing them.
+ESTIMATORS = {
+    # Tight tolerances: sparse input uses iterative solvers (see train.py).
+    "Linear Regression": (LinearRegression, {"tol": 1e-10}),
+    "Ridge Regression": (Ridge, {"tol": 1e-8}),
+    "Random Forest": (RandomForestRegressor, {"random_state": 42, "n_jobs": 1}),
+    "Gradient Boosting": (GradientBoostingRegressor, {"random_state": 42}),
+}
+
+SEARCH_SPACE = {
+    "Linear Regression": {},
+    "Ridge Regression": {"alpha": [0.1, 1.0, 10.0, 100.0]},
+    "Random Forest": {
+        "n_estimators": [100, 300],
+        "max_depth": [None, 20],
+        "min_samples_leaf": [1, 2],
+    },
+    "Gradient Boosting": {
+        "n_estimators": [100, 300],
+        "learning_rate": [0.05, 0.1],
+        "max_depth": [3, 5],
+    },
+}
+
+
+def build_estimator(name, params):
+    """Creates an unfitted estimator for a search configuration."""
+    estimator_class, fixed_params = ESTIMATORS[name]
+    return estimator_class(**fixed_params, **params)
+
+
+# The arrays a CSR feature matrix is stored as, in scipy's constructor order.
+CSR_ARRAYS = ("X_data", "X_indices", "X_indptr")
+
+
+def _matrix_arrays(X):
+    """The named arrays X is saved as: its CSR components, or X itself."""
+    if sp.issparse(X):
+        X = sp.csr_matrix(X)
+        X.sort_indices()
+        return {
+            "X_data": np.ascontiguousarray(X.data, dtype=np.float64),
+            "X_indices": X.indices,
+            "X_indptr": X.indptr,
+            "X_shape": np.array(X.shape),
+        }
+    return {"X": np.ascontiguousarray(X, dtype=np.float64)}
+
+
+def _data_fingerprint(arrays, y, n_folds, seed):
+    digest = hashlib.sha256()
+    for name in sorted(arrays):
+        digest.update(name.encode())
+        digest.update(arrays[name].tobytes())
+    digest.update(np.ascontiguousarray(y).tobytes())
+    digest.update(f"{n_folds}:{seed}".encode())
+    return digest.hexdigest()[:16]
+
+
+def _task_key(name, params, fold):
+    estimator = build_estimator(name, params)
+    payload = json.dumps(
+        [
+            name,
+            type(estimator).__name__,
+            estimator.get_params(),
+            sklearn.__version__,
+            fold,
+        ],
+        sort_keys=True,
+        # Parameters such as a boosting init estimator are not JSON values.
+        default=repr,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def prepare_shared_data(X, y, cache_dir, n_folds=5, seed=42):
+    """
+    Writes X, y and the fold assignment under cache_dir/<fingerprint>/ once and
+    returns that directory; workers memory-map the files from there.
+    """
+    arrays = _matrix_arrays(X)
+    y = np.ascontiguousarray(y, dtype=np.float64)
+    data_dir = os.path.join(cache_dir, _data_fingerprint(arrays, y, n_folds, seed))
+    os.makedirs(os.path.join(data_dir, "results"), exist_ok=True)
+    if not os.path.exists(os.path.join(data_dir, "fold_of_row.npy")):
+        fold_of_row = np.empty(len(y), dtype=np.int8)
+        splitter = KFold(n_splits=n_folds, shuffle=True, random_state=seed)
+        for fold, (_, test_index) in enumerate(splitter.split(y)):
+            fold_of_row[test_index] = fold
+        for name, array in arrays.items():
+            np.save(os.path.join(data_dir, f"{name}.npy"), array)
+        np.save(os.path.join(data_dir, "y.npy"), y)
+        # Saved last: its presence marks the directory as complete.
+        np.save(os.path.join(data_dir, "fold_of_row.npy"), fold_of_row)
+    return data_dir
+
+
+# Per-process cache of memory-mapped arrays, so each worker maps the data once.
+_shared_data = {}
+
+
+def _load_shared_data(data_dir):
+    def load(name):
+        return np.load(os.path.join(data_dir, f"{name}.npy"), mmap_mode="r")
+
+    if data_dir not in _shared_data:
+        if os.path.exists(os.path.join(data_dir, "X_indptr.npy")):
+            X = sp.csr_matrix(
+                tuple(load(name) for name in CSR_ARRAYS),
+                shape=tuple(load("X_shape")),
+                copy=False,
+            )
+        else:
+            X = load("X")
+        _shared_data[data_dir] = (X, load("y"), load("fold_of_row"))
+    return _shared_data[data_dir]
+
+
+def _run_fold(data_dir, name, params, fold, result_path):
+    """Fits and scores one configuration on one fold; runs in a worker process."""
+    X, y, fold_of_row = _load_shared_data(data_dir)
+    train_rows = fold_of_row != fold
+    start_time = time.perf_counter()
+
+    model = build_estimator(name, params)
+    model.fit(model_input(model, X[train_rows]), y[train_rows])
+    predictions = np.expm1(model.predict(model_input(model, X[~train_rows])))
+    actual = np.expm1(y[~train_rows])
+
+    result = {
+        "model": name,
+        "params": params,
+        "fold": fold,
+        "r2": float(r2_score(actual, predictions)),
+        "rmse": float(np.sqrt(mean_squared_error(actual, predictions))),
+        "seconds": time.perf_counter() - start_time,
+    }
+    tmp_path = f"{result_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(result, f)
+    os.replace(tmp_path, result_path)
+    return result
+
+
+def run_search(X, y, cache_dir, n_folds=5, n_jobs=None, search_space=None):
+    """
+    Cross-validates every configuration in search_space (default SEARCH_SPACE)
+    and returns the leaderboard DataFrame, best configuration first.
+    """
+    search_space = SEARCH_SPACE if search_space is None else search_space
+    data_dir = prepare_shared_data(X, y, cache_dir, n_folds)
+
+    results = []
+    pending = []
+    for name, grid in search_space.items():
+        for params in ParameterGrid(grid):
+            for fold in range(n_folds):
+                key = _task_key(name, params, fold)
+                result_path = os.path.join(data_dir, "results", f"{key}.json")
+                if os.path.exists(result_path):
+                    with open(result_path) as f:
+                        results.append(json.load(f))
+                else:
+                    pending.append((data_dir, name, params, fold, result_path))
+
+    print(
+        f"Search: {len(results) + len(pending)} fits over {n_folds} folds "
+        f"({len(results)} cached, {len(pending)} to run)."
+    )
+    if pending:
+        start_time = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=n_jobs or os.cpu_count()) as pool:
+            futures = [pool.submit(_run_fold, *task) for task in pending]
+            for done, future in enumerate(as_completed(futures), start=1):
+                result = future.result()
+                results.append(result)
+                print(
+                    f"  [{done}/{len(pending)}] {result['model']} "
+                    f"{result['params']} fold {result['fold']}: "
+                    f"R² {result['r2']:.4g} ({result['seconds']:.1f}s)"
+                )
+        print(f"Search finished in {time.perf_counter() - start_time:.1f}s.")
+
+    return build_leaderboard(results)
+
+
+def build_leaderboard(results):
+    """Averages fold results per configuration and ranks them by mean R²."""
+    rows = pd.DataFrame(results)
+    rows["params"] = rows["params"].map(lambda p: json.dumps(p, sort_keys=True))
+    leaderboard = (
+        rows.groupby(["model", "params"])
+        .agg(
+            r2_mean=("r2", "mean"),
+            r2_std=("r2", "std"),
+            rmse_mean=("rmse", "mean"),
+            folds=("fold", "count"),
+            total_seconds=("seconds", "sum"),
+        )
+        .sort_values("r2_mean", ascending=False)
+        .reset_index()
+    )
+    leaderboard.index = leaderboard.index + 1
+    leaderboard.index.name = "rank"
+    return leaderboard
@@ -0,0 +1,428 @@
+# File Path: apps/prediction-service/train/out_of_core.py
+"""
+Trains on the cleaned data in chunks, so memory does not grow with the data.
+
+train.py holds the cleaned frame, its one-hot matrix and a dense float32 copy for
+each forest in memory at once. Here the cleaned file is read as chunks of rows
+(byte ranges of a CSV, row groups of a Parquet file, slices of a memory-mapped
+Feather file), about --chunk-rows at a time:
+
+1. One pass over the prices gives train.py's 1%/99% outlier bounds, from a
+   reservoir sample of --max-sample-rows prices (exact below that).
+2. One pass over the rows inside the bounds fixes the category vocabulary, so
+   every chunk is encoded into the same model columns, and the means and
+   standard deviations of the numeric features.
+3. One training pass adds each chunk's X'X and X'y to ridge regression's normal
+   equations (columns x columns floats however many rows there are), solved at
+   the end for what Ridge finds on all the rows at once, and fills a uniform
+   reservoir sample of at most --max-sample-rows training rows stored as float32
+   numerics and category codes (28 bytes a row with the label).
+   HistGradientBoostingRegressor bins that sample and fits it with location,
+   listing_type and property_type as native categorical features; below the
+   cap it is every training row.
+4. A last pass scores both on the test split, and the better one is saved and
+   published like train.py's best model, with input ranges from the sample.
+
+Rows are assigned to the 20% test split by a generator seeded with their chunk,
+so every pass agrees on the split without storing it.
+
+Usage (from the directory main.py serves):
+    python train/train.py --out-of-core [--chunk-rows 100000]
+        [--max-sample-rows 1000000]
+"""
+
+import io
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.linear_model import Ridge
+
+# The serving modules live next to main.py.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from category_codes import CategoryCodeRegressor
+from data_cleaner import (
+    CATEGORICAL_COLUMNS,
+    NUMERIC_COLUMNS,
+    cleaned_data_path,
+    output_format,
+)
+from feature_matrix import NUMERIC_FEATURES, encode_features
+from input_validation import input_ranges, save_input_ranges
+from model_artifact import artifact_size_bytes, publish_artifact
+from process_stats import peak_rss_bytes
+
+DEFAULT_CHUNK_ROWS = 100_000
+DEFAULT_MAX_SAMPLE_ROWS = 1_000_000
+TEST_SIZE = 0.2
+# HistGradientBoostingRegressor handles at most max_bins (255) categories per
+# feature; rarer locations beyond that are passed to it as missing.
+MAX_CATEGORY_CODES = 255
+
+
+class CleanedBlocks:
+    """A cleaned-data file as blocks of about block_rows rows, read one at a time."""
+
+    def __init__(self, path, block_rows):
+        self.path = path
+        self.format = output_format(path)
+        if self.format == "csv":
+            self.blocks = self._csv_blocks(block_rows)
+        elif self.format == "parquet":
+            import pyarrow.parquet as pq
+
+            # A row group is read whole, so the writer's row groups bound memory;
+            # the streaming cleaner writes one per chunk.
+            self._file = pq.ParquetFile(path)
+            self.blocks = list(range(self._file.num_row_groups))
+        else:
+            import pyarrow.feather as feather
+
+            self._table = feather.read_table(path, memory_map=True)
+            self.blocks = [
+                (start, min(block_rows, self._table.num_rows - start))
+                for start in range(0, self._table.num_rows, block_rows)
+            ]
+
+    def _csv_blocks(self, block_rows):
+        """Byte ranges of about block_rows lines each, split at line ends."""
+        size = os.path.getsize(self.path)
+        with open(self.path, "rb") as f:
+            header = f.readline()
+            self._names = header.decode().strip().split(",")
+            sample = f.read(1 << 16)
+            line_bytes = len(sample) / max(sample.count(b"\n"), 1)
+            block_bytes = max(int(line_bytes * block_rows), 1)
+            blocks = []
+            start = len(header)
+            while start < size:
+                f.seek(min(start + block_bytes, size))
+                f.readline()
+                end = min(f.tell(), size)
+                blocks.append((start, end))
+                start = end
+        return blocks
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def read(self, i, columns=None):
+        """Block i as a DataFrame of float numeric and string categorical columns."""
+        columns = columns or NUMERIC_COLUMNS + CATEGORICAL_COLUMNS
+        if self.format == "csv":
+            start, end = self.blocks[i]
+            with open(self.path, "rb") as f:
+                f.seek(start)
+                data = f.read(end - start)
+            return pd.read_csv(
+                io.BytesIO(data),
+                header=None,
+                names=self._names,
+                usecols=columns,
+                dtype={
+                    column: "float64" if column in NUMERIC_COLUMNS else "str"
+                    for column in columns
+                },
+            )
+        if self.format == "parquet":
+            table = self._file.read_row_group(self.blocks[i], columns=columns)
+        else:
+            table = self._table.slice(*self.blocks[i]).select(columns)
+        df = table.to_pandas()
+        return df.astype(
+            {column: "str" for column in columns if column in CATEGORICAL_COLUMNS}
+        )
+
+
+class Vocabulary:
+    """
+    The categories every chunk is encoded with: sorted, as get_dummies orders
+    them, for the one-hot model columns, and by frequency for the category
+    codes (the first MAX_CATEGORY_CODES of each feature get one).
+    """
+
+    def __init__(self, counts):
+        self.categories = {
+            feature: sorted(counts[feature]) for feature in CATEGORICAL_COLUMNS
+        }
+        self.codes = {
+            feature: sorted(counts[feature], key=lambda v: (-counts[feature][v], v))[
+                :MAX_CATEGORY_CODES
+            ]
+            for feature in CATEGORICAL_COLUMNS
+        }
+        self.columns = list(NUMERIC_FEATURES) + [
+            f"{feature}_{value}"
+            for feature in CATEGORICAL_COLUMNS
+            for value in self.categories[feature]
+        ]
+
+    def encode(self, df):
+        """The one-hot CSR matrix of df in the vocabulary's columns."""
+        fixed = df.assign(
+            **{
+                feature: pd.Categorical(
+                    df[feature], categories=self.categories[feature]
+                )
+                for feature in CATEGORICAL_COLUMNS
+            }
+        )
+        return encode_features(fixed)[0]
+
+    def coded(self, df):
+        """float32 rows of the numeric features then one code per category."""
+        coded = np.empty(
+            (len(df), len(NUMERIC_FEATURES) + len(CATEGORICAL_COLUMNS)),
+            dtype=np.float32,
+        )
+        for i, feature in enumerate(NUMERIC_FEATURES):
+            coded[:, i] = df[feature].to_numpy()
+        for i, feature in enumerate(CATEGORICAL_COLUMNS, start=len(NUMERIC_FEATURES)):
+            codes = pd.Categorical(df[feature], categories=self.codes[feature]).codes
+            coded[:, i] = np.where(codes >= 0, codes, np.nan)
+        return coded
+
+
+class Scores:
+    """R² and RMSE on actual prices, accumulated over chunks of test rows."""
+
+    def __init__(self):
+        self.n = 0
+        self.total = 0.0
+        self.total_squares = 0.0
+        self.squared_error = 0.0
+
+    def add(self, actual, predicted):
+        self.n += len(actual)
+        self.total += actual.sum()
+        self.total_squares += (actual**2).sum()
+        self.squared_error += ((actual - predicted) ** 2).sum()
+
+    def r2(self):
+        variance = self.total_squares - self.total**2 / self.n
+        return 1 - self.squared_error / variance
+
+    def rmse(self):
+        return float(np.sqrt(self.squared_error / self.n))
+
+
+class Reservoir:
+    """A uniform sample of at most `size` rows of a stream (Algorithm R)."""
+
+    def __init__(self, size, width, seed, dtype=np.float32):
+        self.rows = np.empty((size, width), dtype=dtype)
+        self.seen = 0
+        self.rng = np.random.default_rng(seed)
+
+    def add(self, rows):
+        size = len(self.rows)
+        positions = self.seen + np.arange(len(rows))
+        slots = positions.copy()
+        full = positions >= size
+        slots[full] = self.rng.integers(0, positions[full] + 1)
+        keep = slots < size
+        self.rows[slots[keep]] = rows[keep]
+        self.seen += len(rows)
+
+    def sample(self):
+        return self.rows[: min(self.seen, len(self.rows))]
+
+
+def split_block(blocks, i, bounds, seed, columns=None):
+    """(train rows, test rows) of block i inside the price bounds."""
+    df = blocks.read(i, columns).dropna()
+    is_test = np.random.default_rng([seed, i]).random(len(df)) < TEST_SIZE
+    keep = (df["price"] >= bounds[0]) & (df["price"] <= bounds[1])
+    return df[keep & ~is_test], df[keep & is_test]
+
+
+def price_bounds(blocks, sample_rows, seed):
+    """train.py's 1%/99% price quantiles, from a reservoir sample of the prices."""
+    reservoir = Reservoir(sample_rows, 1, seed, np.float64)
+    for i in range(len(blocks)):
+        prices = blocks.read(i, ["price"])["price"].dropna().to_numpy()
+        reservoir.add(prices[:, None])
+    return tuple(np.quantile(reservoir.sample()[:, 0], [0.01, 0.99]))
+
+
+def scan(blocks, bounds, seed):
+    """Category counts, numeric means and standard deviations, and split sizes."""
+    counts = {feature: {} for feature in CATEGORICAL_COLUMNS}
+    sums = np.zeros(len(NUMERIC_FEATURES))
+    squares = np.zeros(len(NUMERIC_FEATURES))
+    n_train = n_test = 0
+    for i in range(len(blocks)):
+        train, test = split_block(blocks, i, bounds, seed)
+        for df in (train, test):
+            for feature in CATEGORICAL_COLUMNS:
+                for value, count in df[feature].value_counts().items():
+                    counts[feature][value] = counts[feature].get(value, 0) + count
+        numeric = train[NUMERIC_FEATURES].to_numpy()
+        sums += numeric.sum(axis=0)
+        squares += (numeric**2).sum(axis=0)
+        n_train, n_test = n_train + len(train), n_test + len(test)
+    mean = sums / n_train
+    std = np.sqrt(np.maximum(squares / n_train - mean**2, 0.0))
+    return Vocabulary(counts), mean, np.where(std > 0, std, 1.0), n_train, n_test
+
+
+def standardized(df, mean, std):
+    return df.assign(
+        **{
+            feature: (df[feature] - mean[i]) / std[i]
+            for i, feature in enumerate(NUMERIC_FEATURES)
+        }
+    )
+
+
+class NormalEquations:
+    """
+    Ridge regression's sufficient statistics, accumulated a chunk at a time.
+
+    The numeric features are standardized as they come in, which keeps X'X well
+    conditioned whatever their scale; solve() penalizes their coefficients as
+    Ridge would on the raw values and folds the scaling back out, so the result
+    takes raw features.
+    """
+
+    def __init__(self, n_columns, mean, std):
+        self.mean, self.std = mean, std
+        self.gram = np.zeros((n_columns, n_columns))
+        self.xty = np.zeros(n_columns)
+        self.column_sums = np.zeros(n_columns)
+        self.y_sum = 0.0
+        self.n = 0
+
+    def add(self, vocabulary, df, y):
+        X = vocabulary.encode(standardized(df, self.mean, self.std))
+        self.gram += (X.T @ X).toarray()
+        self.xty += X.T @ y
+        self.column_sums += np.asarray(X.sum(axis=0)).ravel()
+        self.y_sum += y.sum()
+        self.n += len(y)
+
+    def solve(self, alpha=1.0):
+        """A Ridge(alpha) fitted to every row added, as if by Ridge.fit."""
+        x_mean = self.column_sums / self.n
+        y_mean = self.y_sum / self.n
+        # With an intercept, Ridge fits the centered data.
+        covariance = self.gram - self.n * np.outer(x_mean, x_mean)
+        cross = self.xty - self.n * x_mean * y_mean
+        penalty = np.full(len(x_mean), alpha)
+        penalty[: len(NUMERIC_FEATURES)] /= self.std**2
+        coef = np.linalg.solve(covariance + np.diag(penalty), cross)
+        intercept = y_mean - x_mean @ coef
+
+        coef[: len(NUMERIC_FEATURES)] /= self.std
+        model = Ridge(alpha=alpha)
+        model.coef_ = coef
+        model.intercept_ = intercept - coef[: len(NUMERIC_FEATURES)] @ self.mean
+        model.n_features_in_ = len(coef)
+        return model
+
+
+def train_out_of_core(
+    path=None,
+    chunk_rows=DEFAULT_CHUNK_ROWS,
+    max_sample_rows=DEFAULT_MAX_SAMPLE_ROWS,
+    seed=42,
+):
+    """
+    Trains ridge regression and histogram gradient boosting in chunks from the
+    cleaned-data file at path (by default the newest one), saves and publishes
+    the better, and returns {model name: {"R²", "RMSE", "Time (s)"}}.
+    """
+    path = path or cleaned_data_path()
+    blocks = CleanedBlocks(path, chunk_rows)
+    print(f"Training out of core on '{path}' in {len(blocks)} chunks.")
+
+    start = time.perf_counter()
+    bounds = price_bounds(blocks, max_sample_rows, seed)
+    vocabulary, mean, std, n_train, n_test = scan(blocks, bounds, seed)
+    print(
+        f"Prices kept between {bounds[0]:.0f} and {bounds[1]:.0f}; {n_train} "
+        f"training and {n_test} test rows, {len(vocabulary.columns)} features "
+        f"({time.perf_counter() - start:.1f}s to scan)."
+    )
+
+    equations = NormalEquations(len(vocabulary.columns), mean, std)
+    # Coded features plus the log price in the last column.
+    n_coded = len(NUMERIC_FEATURES) + len(CATEGORICAL_COLUMNS)
+    reservoir = Reservoir(min(max_sample_rows, n_train), n_coded + 1, seed)
+    ridge_seconds = 0.0
+    for i in range(len(blocks)):
+        train, _ = split_block(blocks, i, bounds, seed)
+        y = np.log1p(train["price"].to_numpy())
+        reservoir.add(np.column_stack([vocabulary.coded(train), y]))
+        fit_start = time.perf_counter()
+        equations.add(vocabulary, train, y)
+        ridge_seconds += time.perf_counter() - fit_start
+    fit_start = time.perf_counter()
+    models = {"Ridge Regression": equations.solve()}
+    times = {"Ridge Regression": ridge_seconds + time.perf_counter() - fit_start}
+
+    sample = reservoir.sample()
+    print(f"Fitting histogram gradient boosting on {len(sample)} sampled rows...")
+    fit_start = time.perf_counter()
+    boosting = HistGradientBoostingRegressor(
+        max_iter=500,
+        max_leaf_nodes=63,
+        categorical_features=list(range(len(NUMERIC_FEATURES), n_coded)),
+        random_state=seed,
+    )
+    boosting.fit(sample[:, :-1], sample[:, -1])
+    ranges = input_ranges(
+        {feature: sample[:, j] for j, feature in enumerate(NUMERIC_FEATURES)}
+    )
+    del reservoir, sample
+    times["Histogram Gradient Boosting"] = time.perf_counter() - fit_start
+    models["Histogram Gradient Boosting"] = CategoryCodeRegressor(
+        boosting, vocabulary.columns, vocabulary.codes
+    )
+    # Both are scored through the one-hot columns they are served with.
+    scores = {name: Scores() for name in models}
+    for i in range(len(blocks)):
+        _, test = split_block(blocks, i, bounds, seed)
+        if test.empty:
+            continue
+        X = vocabulary.encode(test)
+        actual = test["price"].to_numpy()
+        for name, model in models.items():
+            scores[name].add(actual, np.expm1(model.predict(X)))
+
+    results = {
+        name: {"R²": score.r2(), "RMSE": score.rmse(), "Time (s)": times[name]}
+        for name, score in scores.items()
+    }
+    print("\n--- Model Comparison ---")
+    results_df = pd.DataFrame(results).T
+    print(results_df.sort_values(by="R²", ascending=False))
+
+    best_model_name = results_df["R²"].idxmax()
+    best_model = models[best_model_name]
+    features = vocabulary.columns
+    print(f"\nBest performing model: {best_model_name}")
+
+    model_filename = "property_price_model.joblib"
+    columns_filename = "model_columns.joblib"
+    ranges_filename = "model_input_ranges.json"
+    save_input_ranges(ranges_filename, ranges)
+    joblib.dump(best_model, model_filename)
+    joblib.dump(features, columns_filename)
+    print(f"Best model ('{best_model_name}') saved to '{model_filename}'")
+    print(f"Model columns saved to '{columns_filename}'")
+    print(f"Training input ranges (from the sample) saved to '{ranges_filename}'")
+
+    manifest, artifact_dir = publish_artifact(
+        best_model, features, "model_artifact", input_ranges=ranges
+    )
+    print(
+        f"Compact model artifact version {manifest['version']} saved to "
+        f"'{artifact_dir}/' ({artifact_size_bytes(artifact_dir) / 1e6:.1f} MB)"
+    )
+    print(f"Peak memory: {peak_rss_bytes() / 1e6:.0f} MB")
+    return results
@@ -0,0 +1,317 @@
+# File Path: apps/prediction-service/train/segments.py
+"""
+Trains one model per segment of the listings, in parallel processes.
+
+train.py fits a single model over rent and sale listings, where listing_type is
+one one-hot column among hundreds and sale prices are two orders of magnitude
+above rents, so the trees spend much of their depth telling the two apart. Here
+the cleaned data is split by --segment-by (listing_type by default; any of the
+categorical columns, e.g. "listing_type property_type") and every segment with
+at least --min-segment-rows rows gets its own model comparison, in a process of
+its own, alongside the global model for reference.
+
+Outliers are removed with train.py's global price bounds and every model is
+tested on the rows of train.py's own 20% test split, so the segment models and
+the global model are compared on exactly the same listings. Each segment's best
+model is published like train.py's (pickle, columns, input ranges and compact
+artifact) into <output>/<segment>/, and <output>/manifest.json lists the
+segments for main.py (see segment_models.py), with the comparison report:
+accuracy per segment and overall, artifact size and single-row latency of every
+served model against the global one's.
+
+Usage (from the directory main.py serves):
+    python train/train.py --segment-by listing_type [--jobs 2]
+        [--min-segment-rows 500]
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.model_selection import train_test_split
+
+# The serving modules live next to main.py.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from data_cleaner import CATEGORICAL_COLUMNS, load_cleaned_data
+from feature_matrix import NUMERIC_FEATURES, encode_features, model_input
+from input_validation import input_ranges, save_input_ranges
+from model_artifact import artifact_size_bytes, publish_artifact
+from model_registry import load_bundle
+from segment_models import (
+    FORMAT_VERSION,
+    GLOBAL_SEGMENT,
+    MANIFEST_FILENAME,
+    segment_files,
+    segment_name,
+)
+
+DEFAULT_SEGMENT_BY = ["listing_type"]
+DEFAULT_MIN_SEGMENT_ROWS = 500
+# Test rows each served model is timed on, one predict_row call at a time.
+LATENCY_ROWS = 500
+
+
+def _score(actual, predicted):
+    return {
+        "R²": float(r2_score(actual, predicted)),
+        "RMSE": float(np.sqrt(mean_squared_error(actual, predicted))),
+    }
+
+
+def _latency_ms(bundle, rows):
+    """p50/p99 of bundle.predict_row over rows, in milliseconds."""
+    for row in rows[:20]:
+        bundle.predict_row(row)
+    samples = np.empty(len(rows))
+    for i, row in enumerate(rows):
+        start = time.perf_counter()
+        bundle.predict_row(row)
+        samples[i] = (time.perf_counter() - start) * 1000
+    return {
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p99_ms": float(np.percentile(samples, 99)),
+    }
+
+
+def train_segment(name, df, is_test, directory, n_jobs):
+    """
+    Fits train.py's default models on the training rows of df, keeps the one with
+    the best test R², publishes it into directory and measures it as served.
+    Runs in a worker process; returns the segment's report with its test
+    predictions, aligned with the test rows of df.
+    """
+    # train.py imports this module for its CLI.
+    from train import default_models
+
+    start = time.perf_counter()
+    df = df.assign(
+        **{c: df[c].cat.remove_unused_categories() for c in CATEGORICAL_COLUMNS}
+    )
+    X, features = encode_features(df)
+    y = np.log1p(df["price"].to_numpy())
+    X_train, X_test = X[~is_test], X[is_test]
+    y_train, actual = y[~is_test], df["price"].to_numpy()[is_test]
+
+    models = {}
+    for model_name, model in default_models().items():
+        if "n_jobs" in model.get_params():
+            model.set_params(n_jobs=n_jobs)
+        model.fit(model_input(model, X_train), y_train)
+        predicted = np.expm1(model.predict(model_input(model, X_test)))
+        models[model_name] = (model, predicted, _score(actual, predicted))
+    best_name = max(models, key=lambda model_name: models[model_name][2]["R²"])
+    best_model, predicted, score = models[best_name]
+    fit_seconds = time.perf_counter() - start
+
+    files = segment_files(directory)
+    os.makedirs(directory, exist_ok=True)
+    joblib.dump(best_model, files["model"])
+    joblib.dump(features, files["columns"])
+    ranges = input_ranges({c: df[c].to_numpy() for c in NUMERIC_FEATURES})
+    save_input_ranges(files["ranges"], ranges)
+    manifest, artifact_dir = publish_artifact(
+        best_model, features, files["artifact"], input_ranges=ranges
+    )
+
+    # Timed as main.py serves it: the artifact, through the tree engine.
+    bundle = load_bundle(files["artifact"], files["model"], files["columns"])
+    rows = (
+        df.loc[is_test, NUMERIC_FEATURES + CATEGORICAL_COLUMNS]
+        .head(LATENCY_ROWS)
+        .astype({c: str for c in CATEGORICAL_COLUMNS})
+        .astype({"bedrooms": int, "bathrooms": int})
+        .to_dict("records")
+    )
+    return {
+        "name": name,
+        "model": best_name,
+        "model_version": bundle.version,
+        "train_rows": int((~is_test).sum()),
+        "test_rows": int(is_test.sum()),
+        "n_columns": len(features),
+        **score,
+        "all_models": {model_name: m[2] for model_name, m in models.items()},
+        "artifact_bytes": artifact_size_bytes(artifact_dir),
+        "pickle_bytes": os.path.getsize(files["model"]),
+        "latency": _latency_ms(bundle, rows),
+        "fit_seconds": fit_seconds,
+        "predictions": predicted,
+    }
+
+
+def _write_manifest(directory, manifest):
+    with open(os.path.join(directory, MANIFEST_FILENAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def _publish(staging, output):
+    """Replaces output with the staged segment models, as save_table does."""
+    old_path = f"{output}.old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(output):
+        os.replace(output, old_path)
+    os.replace(staging, output)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def print_report(report):
+    rows = {}
+    for name, segment in report["segments"].items():
+        rows[name] = {
+            "model": segment["model"],
+            "test rows": segment["test_rows"],
+            "R²": segment["R²"],
+            "global R²": segment["global"]["R²"],
+            "RMSE": segment["RMSE"],
+            "global RMSE": segment["global"]["RMSE"],
+        }
+    rows["all (routed)"] = {
+        "model": "",
+        "test rows": report["overall"]["test_rows"],
+        "R²": report["overall"]["segmented"]["R²"],
+        "global R²": report["overall"]["global"]["R²"],
+        "RMSE": report["overall"]["segmented"]["RMSE"],
+        "global RMSE": report["overall"]["global"]["RMSE"],
+    }
+    print("\n--- Test accuracy: segment models against the global model ---")
+    print(pd.DataFrame(rows).T.to_string(float_format="{:.4g}".format))
+
+    served = {
+        name: {
+            "model": model["model"],
+            "columns": model["n_columns"],
+            "artifact MB": model["artifact_bytes"] / 1e6,
+            "pickle MB": model["pickle_bytes"] / 1e6,
+            "p50 ms": model["latency"]["p50_ms"],
+            "p99 ms": model["latency"]["p99_ms"],
+        }
+        for name, model in [
+            *report["segments"].items(),
+            (GLOBAL_SEGMENT, report["global"]),
+        ]
+    }
+    print("\n--- Served models (single-row predict_row) ---")
+    print(pd.DataFrame(served).T.to_string(float_format="{:.3g}".format))
+
+
+def train_segments(
+    segment_by=None,
+    output="segment_models",
+    min_segment_rows=DEFAULT_MIN_SEGMENT_ROWS,
+    jobs=None,
+):
+    """
+    Trains and publishes a model per segment of the cleaned data (see the module
+    docstring) and returns the comparison report stored in the manifest.
+    """
+    segment_by = list(segment_by or DEFAULT_SEGMENT_BY)
+    unknown = [c for c in segment_by if c not in CATEGORICAL_COLUMNS]
+    if unknown:
+        raise ValueError(
+            f"Cannot segment by {', '.join(unknown)}; the cleaned data's categorical "
+            f"columns are {', '.join(CATEGORICAL_COLUMNS)}."
+        )
+
+    df = load_cleaned_data()
+    lower_bound = df["price"].quantile(0.01)
+    upper_bound = df["price"].quantile(0.99)
+    df = df[(df["price"] >= lower_bound) & (df["price"] <= upper_bound)]
+    df = df.reset_index(drop=True)
+    # The same rows train.py tests on: it splits a matrix of this many rows with
+    # the same seed.
+    _, test_index = train_test_split(np.arange(len(df)), test_size=0.2, random_state=42)
+    is_test = np.zeros(len(df), dtype=bool)
+    is_test[test_index] = True
+
+    groups = df.groupby(segment_by, observed=True).indices
+    segments = {}
+    for values, index in sorted(groups.items(), key=lambda item: -len(item[1])):
+        values = values if isinstance(values, tuple) else (values,)
+        values = dict(zip(segment_by, (str(value) for value in values)))
+        if len(index) < min_segment_rows or not is_test[index].any():
+            print(
+                f"Segment {values} has {len(index)} rows; it is left to the global model."
+            )
+            continue
+        segments[segment_name(values)] = (values, np.sort(index))
+
+    staging = f"{output}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    global_dir = tempfile.mkdtemp(prefix="global-", dir=staging)
+    tasks = {GLOBAL_SEGMENT: (np.arange(len(df)), global_dir)}
+    for name, (_, index) in segments.items():
+        tasks[name] = (index, os.path.join(staging, name))
+
+    workers = jobs or min(len(tasks), os.cpu_count() or 1)
+    # Every worker fits its own forest; together they should not oversubscribe.
+    n_jobs = max((os.cpu_count() or 1) // workers, 1)
+    print(
+        f"Training {len(segments)} segment models by {', '.join(segment_by)} and the "
+        f"global model in {workers} processes..."
+    )
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            name: pool.submit(
+                train_segment, name, df.iloc[index], is_test[index], directory, n_jobs
+            )
+            for name, (index, directory) in tasks.items()
+        }
+        results = {name: future.result() for name, future in futures.items()}
+    print(f"Trained in {time.perf_counter() - start:.1f}s.")
+    shutil.rmtree(global_dir)
+
+    # Each segment's test rows priced by the global model, and all test rows
+    # priced by the model their segment routes to.
+    global_result = results.pop(GLOBAL_SEGMENT)
+    global_predictions = pd.Series(
+        global_result.pop("predictions"), index=np.flatnonzero(is_test)
+    )
+    routed = global_predictions.copy()
+    report = {"segments": {}}
+    for name, (values, index) in segments.items():
+        result = results[name]
+        test_rows = index[is_test[index]]
+        routed.loc[test_rows] = result.pop("predictions")
+        actual = df["price"].to_numpy()[test_rows]
+        result["global"] = _score(actual, global_predictions.loc[test_rows].to_numpy())
+        result["values"] = values
+        report["segments"][name] = result
+    actual = df["price"].to_numpy()[is_test]
+    report["global"] = global_result
+    report["overall"] = {
+        "test_rows": int(is_test.sum()),
+        "segmented": _score(actual, routed.to_numpy()),
+        "global": _score(actual, global_predictions.to_numpy()),
+    }
+    print_report(report)
+
+    _write_manifest(
+        staging,
+        {
+            "format_version": FORMAT_VERSION,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "segment_by": segment_by,
+            "segments": {
+                name: {
+                    "values": segment["values"],
+                    "train_rows": segment["train_rows"],
+                    "model_version": segment["model_version"],
+                }
+                for name, segment in report["segments"].items()
+            },
+            "report": report,
+        },
+    )
+    _publish(staging, output)
+    print(f"\n{len(segments)} segment models published to '{output}/'.")
+    return report
@@ -5,20 +5,91 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.linear_model import LinearRegression, Ridge
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.metrics import mean_squared_error, r2_score
+import argparse
 import joblib
+import json
 import numpy as np
+import os
+import sys
 import time
 
+# The serving modules (e.g. the compact artifact format) live next to main.py.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from model_artifact import artifact_size_bytes, publish_artifact
+from input_validation import input_ranges, save_input_ranges
+from data_cleaner import CATEGORICAL_COLUMNS, load_cleaned_data
+from feature_matrix import NUMERIC_FEATURES, encode_features, matrix_nbytes, model_input
+from hyperparameter_search import build_estimator, run_search
+from distill import distill, is_distillable
+from build_price_table import build_price_table, print_report
+from model_registry import load_bundle
+from out_of_core import (
+    DEFAULT_CHUNK_ROWS,
+    DEFAULT_MAX_SAMPLE_ROWS,
+    train_out_of_core,
+)
+from segments import DEFAULT_MIN_SEGMENT_ROWS, train_segments
 
-def train_and_evaluate():
+
+def default_models():
+    """The fixed-hyperparameter models compared when no search is requested."""
+    return {
+        # On the sparse matrix these use iterative solvers (lsqr, sparse_cg);
+        # their default tolerances stop short of the dense solution.
+        "Linear Regression": LinearRegression(tol=1e-10),
+        "Ridge Regression": Ridge(tol=1e-8),
+        "Random Forest": RandomForestRegressor(
+            n_estimators=100, random_state=42, n_jobs=-1
+        ),
+        "Gradient Boosting": GradientBoostingRegressor(
+            n_estimators=100, random_state=42
+        ),
+    }
+
+
+def tuned_models(leaderboard):
+    """The best cross-validated configuration of each model in the leaderboard."""
+    models = {}
+    for _, best in leaderboard.groupby("model", sort=False).head(1).iterrows():
+        model = build_estimator(best["model"], json.loads(best["params"]))
+        if "n_jobs" in model.get_params():
+            model.set_params(n_jobs=-1)  # The final fit runs alone; use every core.
+        models[f"{best['model']} (tuned)"] = model
+    return models
+
+
+def train_and_evaluate(
+    search=False,
+    n_folds=5,
+    n_jobs=None,
+    cache_dir=".search_cache",
+    distill_best=False,
+    max_r2_drop=0.01,
+    max_rmse_increase=0.05,
+    price_table=False,
+):
     """
     Loads cleaned data, removes outliers, trains multiple models, and saves the best one.
+    Returns {model name: {"R²", "RMSE", "Time (s)"}} for the models compared.
+
+    With search=True, each model's hyperparameters are first tuned by k-fold
+    cross-validation on the training split (see hyperparameter_search), and the
+    best configuration of each is what gets compared on the test split.
+
+    With distill_best=True, a winning tree ensemble is distilled into a smaller
+    student (see distill), which is saved and served instead if its test R² and
+    RMSE stay within max_r2_drop and max_rmse_increase of the teacher's.
+
+    With price_table=True, the published model is then evaluated over the common
+    feature grid into the lookup table main.py answers from (see
+    build_price_table; about 40s for the default Random Forest).
     """
     print("Starting model evaluation and training process...")
 
     # 1. Load the Cleaned Data
     try:
-        df = pd.read_csv("properties_cleaned.csv")
+        # The newest of properties_cleaned.feather/.parquet/.csv.
+        df = load_cleaned_data()
         print(f"Successfully loaded {len(df)} cleaned properties.")
     except FileNotFoundError:
         print("Error: 'properties_cleaned.csv' not found.")
@@ -32,41 +103,44 @@ def train_and_evaluate():
 
     original_rows = len(df)
     df_filtered = df[(df["price"] >= lower_bound) & (df["price"] <= upper_bound)]
+    # Categories that only outliers used would otherwise become all-zero columns.
+    df_filtered = df_filtered.assign(
+        **{
+            c: df_filtered[c].cat.remove_unused_categories()
+            for c in CATEGORICAL_COLUMNS
+        }
+    )
     print(
         f"Removed {original_rows - len(df_filtered)} outliers based on price. Training with {len(df_filtered)} properties."
     )
 
     # 2. Feature Engineering
     print("Performing feature engineering (One-Hot Encoding)...")
-    df_engineered = pd.get_dummies(
-        df_filtered, columns=["location", "listing_type", "property_type"], dtype=int
+    # A sparse CSR matrix with the same columns pd.get_dummies would produce.
+    X, features = encode_features(df_filtered)
+    y = np.log1p(df_filtered["price"].to_numpy())
+    print(
+        f"Encoded features: {matrix_nbytes(X) / 1e6:.1f} MB sparse vs "
+        f"{X.shape[0] * X.shape[1] * 8 / 1e6:.1f} MB as dense int64 dummies."
     )
-    df_engineered["price_log"] = np.log1p(df_engineered["price"])
-
-    target = "price_log"
-    features = [
-        col for col in df_engineered.columns if col not in ["price", "price_log"]
-    ]
-
-    X = df_engineered[features]
-    y = df_engineered[target]
 
     X_train, X_test, y_train_log, y_test_log = train_test_split(
         X, y, test_size=0.2, random_state=42
     )
-    print(f"Training with {len(X_train)} data points and {len(features)} features.")
+    print(f"Training with {X_train.shape[0]} data points and {len(features)} features.")
 
     # 3. Define Models to Compare
-    models = {
-        "Linear Regression": LinearRegression(),
-        "Ridge Regression": Ridge(),
-        "Random Forest": RandomForestRegressor(
-            n_estimators=100, random_state=42, n_jobs=-1
-        ),
-        "Gradient Boosting": GradientBoostingRegressor(
-            n_estimators=100, random_state=42
-        ),
-    }
+    if search:
+        leaderboard = run_search(
+            X_train, y_train_log, cache_dir, n_folds=n_folds, n_jobs=n_jobs
+        )
+        print("\n--- Cross-Validation Leaderboard ---")
+        print(leaderboard.to_string(float_format="{:.4g}".format))
+        leaderboard.to_csv("search_leaderboard.csv")
+        print("Leaderboard saved to 'search_leaderboard.csv'")
+        models = tuned_models(leaderboard)
+    else:
+        models = default_models()
 
     results = {}
     best_model = None
@@ -77,9 +151,11 @@ def train_and_evaluate():
         print(f"\n--- Training {name} ---")
         start_time = time.time()
 
-        model.fit(X_train, y_train_log)
+        # Linear models and boosting take the CSR matrix as is; the rest get
+        # dense float32 (see feature_matrix.prefers_dense).
+        model.fit(model_input(model, X_train), y_train_log)
 
-        log_predictions = model.predict(X_test)
+        log_predictions = model.predict(model_input(model, X_test))
         predictions = np.expm1(log_predictions)
         y_test_original = np.expm1(y_test_log)
 
@@ -103,17 +179,155 @@ def train_and_evaluate():
     best_model_name = results_df["R²"].idxmax()
     print(f"\nBest performing model: {best_model_name}")
 
-    # 6. Save the Best Model
+    # 6. Distill the Best Model into a Smaller One for Serving
+    if distill_best and best_model is not None and is_distillable(best_model):
+        print(f"\nDistilling '{best_model_name}' into a smaller serving model...")
+        student_name, student, report = distill(
+            best_model,
+            X_train,
+            X_test,
+            y_test_log,
+            features,
+            max_r2_drop=max_r2_drop,
+            max_rmse_increase=max_rmse_increase,
+        )
+        print(report.to_string(float_format="{:.4g}".format))
+        if student is None:
+            print("No student stayed within the accuracy budget; keeping the teacher.")
+        else:
+            joblib.dump(best_model, "teacher_model.joblib")
+            print(
+                f"Serving '{student_name}' in place of '{best_model_name}' "
+                f"(teacher kept in 'teacher_model.joblib')."
+            )
+            best_model = student
+            best_model_name = f"{student_name}, distilled from {best_model_name}"
+
+    # 7. Save the Best Model
     if best_model:
         model_filename = "property_price_model.joblib"
         columns_filename = "model_columns.joblib"
+        ranges_filename = "model_input_ranges.json"
 
+        # The ranges go first: a watcher reloads when the model files change.
+        ranges = input_ranges({c: df_filtered[c].to_numpy() for c in NUMERIC_FEATURES})
+        save_input_ranges(ranges_filename, ranges)
         joblib.dump(best_model, model_filename)
-        joblib.dump(X_train.columns.tolist(), columns_filename)
+        joblib.dump(features, columns_filename)
 
         print(f"Best model ('{best_model_name}') saved to '{model_filename}'")
         print(f"Model columns saved to '{columns_filename}'")
+        print(f"Training input ranges saved to '{ranges_filename}'")
+
+        # Also publish the compact, memory-mappable artifact that main.py prefers.
+        manifest, artifact_dir = publish_artifact(
+            best_model, features, "model_artifact", input_ranges=ranges
+        )
+        print(
+            f"Compact model artifact version {manifest['version']} saved to "
+            f"'{artifact_dir}/' "
+            f"({artifact_size_bytes(artifact_dir) / 1e6:.1f} MB vs "
+            f"{os.path.getsize(model_filename) / 1e6:.1f} MB pickled)"
+        )
+
+        # 8. Precompute the Price Lookup Table
+        if price_table:
+            print("\nPrecomputing the price lookup table for the new model...")
+            bundle = load_bundle(artifact_dir, model_filename, columns_filename)
+            print_report(build_price_table(bundle, df_filtered))
+
+    return results
 
 
 if __name__ == "__main__":
-    train_and_evaluate()
+    parser = argparse.ArgumentParser(description="Train the property price model.")
+    parser.add_argument(
+        "--search",
+        action="store_true",
+        help="tune each model with a cross-validated hyperparameter sweep first",
+    )
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument(
+        "--jobs", type=int, default=None, help="worker processes (default: all cores)"
+    )
+    parser.add_argument(
+        "--distill",
+        action="store_true",
+        help="serve a smaller student model fit on the best model's predictions",
+    )
+    parser.add_argument(
+        "--max-r2-drop",
+        type=float,
+        default=0.01,
+        help="largest test R² loss a distilled student may have (default 0.01)",
+    )
+    parser.add_argument(
+        "--max-rmse-increase",
+        type=float,
+        default=0.05,
+        help="largest relative test RMSE increase of a student (default 0.05)",
+    )
+    parser.add_argument(
+        "--price-table",
+        action="store_true",
+        help="also precompute the price lookup table main.py serves common requests from",
+    )
+    parser.add_argument(
+        "--out-of-core",
+        action="store_true",
+        help="stream the cleaned data in chunks instead of loading it (see out_of_core)",
+    )
+    parser.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=DEFAULT_CHUNK_ROWS,
+        help=f"rows in memory at once with --out-of-core (default {DEFAULT_CHUNK_ROWS})",
+    )
+    parser.add_argument(
+        "--max-sample-rows",
+        type=int,
+        default=DEFAULT_MAX_SAMPLE_ROWS,
+        help="largest sample the boosting model is fit on with --out-of-core",
+    )
+    parser.add_argument(
+        "--segment-by",
+        nargs="+",
+        metavar="COLUMN",
+        help="train a model per segment of these categorical columns (e.g. "
+        "listing_type) in parallel, for main.py to route to (see segments)",
+    )
+    parser.add_argument(
+        "--min-segment-rows",
+        type=int,
+        default=DEFAULT_MIN_SEGMENT_ROWS,
+        help="smaller segments are left to the global model "
+        f"(default {DEFAULT_MIN_SEGMENT_ROWS})",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=".search_cache",
+        help="where fold results are kept so an interrupted search can resume",
+    )
+    args = parser.parse_args()
+    if args.segment_by:
+        train_segments(
+            segment_by=args.segment_by,
+            min_segment_rows=args.min_segment_rows,
+            jobs=args.jobs,
+        )
+    elif args.out_of_core:
+        train_out_of_core(
+            chunk_rows=args.chunk_rows,
+            max_sample_rows=args.max_sample_rows,
+        )
+    else:
+        train_and_evaluate(
+            search=args.search,
+            n_folds=args.folds,
+            n_jobs=args.jobs,
+            cache_dir=args.cache_dir,
+            distill_best=args.distill,
+            max_r2_drop=args.max_r2_drop,
+            max_rmse_increase=args.max_rmse_increase,
+            price_table=args.price_table,
+        )
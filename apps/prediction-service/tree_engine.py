@@ -0,0 +1,437 @@
+# File Path: apps/prediction-service/tree_engine.py
+"""
+Array-backed inference engine for the regressors train.py produces.
+
+Trees are flattened into one node table (see flatten_estimator) and evaluated
+with NumPy alone, so the serving path needs neither sklearn's estimator objects
+nor its per-call input validation. Leaves point to themselves with an infinite
+threshold, which lets every (row, tree) pair take one step per level without
+checking whether it has already finished.
+"""
+
+import numpy as np
+
+NODE_ARRAYS = ["children_left", "children_right", "feature", "threshold", "value"]
+
+# Finished pairs are dropped from the working set every this many levels; checking
+# every level costs more than stepping a few already-finished pairs in place.
+COMPACT_EVERY = 6
+
+
+def _flatten_trees(trees):
+    """Concatenates sklearn Tree objects into one node table with global indices."""
+    arrays = {name: [] for name in NODE_ARRAYS}
+    roots = []
+    offset = 0
+    for tree in trees:
+        n_nodes = tree.node_count
+        node_ids = np.arange(offset, offset + n_nodes)
+        is_leaf = tree.children_left == -1
+        roots.append(offset)
+        arrays["children_left"].append(
+            np.where(is_leaf, node_ids, tree.children_left + offset)
+        )
+        arrays["children_right"].append(
+            np.where(is_leaf, node_ids, tree.children_right + offset)
+        )
+        arrays["feature"].append(np.where(is_leaf, 0, tree.feature))
+        arrays["threshold"].append(np.where(is_leaf, np.inf, tree.threshold))
+        arrays["value"].append(tree.value.reshape(n_nodes, -1)[:, 0])
+        offset += n_nodes
+
+    # Node indices are stored as intp: NumPy converts any other index dtype on
+    # every gather, which costs more than the extra bytes on disk.
+    flat = {
+        name: np.concatenate(parts).astype(np.intp)
+        for name, parts in arrays.items()
+        if name in ("children_left", "children_right", "feature")
+    }
+    flat["threshold"] = np.concatenate(arrays["threshold"]).astype(np.float64)
+    flat["value"] = np.concatenate(arrays["value"]).astype(np.float64)
+    flat["roots"] = np.asarray(roots, dtype=np.intp)
+    return flat
+
+
+def _in_bitset(bitsets, row, value):
+    value = int(value)
+    return bool((bitsets[row, value // 32] >> (value % 32)) & 1)
+
+
+def _hist_inputs(model):
+    """
+    For each feature the fitted trees split on: (index of the model's input
+    feature, the sorted raw values an ordinal encoder numbered its categories
+    from, or None). Since scikit-learn 1.4 categorical features come first and
+    are ordinal-encoded; before that, trees split on the raw codes directly.
+    """
+    preprocessor = getattr(model, "_preprocessor", None)
+    if preprocessor is None:
+        return [(i, None) for i in range(model.n_features_in_)]
+    features = np.arange(model.n_features_in_)
+    encoder = preprocessor.named_transformers_["encoder"]
+    categorical = features[model.is_categorical_]
+    return [
+        (int(i), np.asarray(categories, dtype=np.float64))
+        for i, categories in zip(categorical, encoder.categories_)
+    ] + [(int(i), None) for i in features[~model.is_categorical_]]
+
+
+def _flatten_hist_predictors(model, feature_columns):
+    """
+    Flattens HistGradientBoostingRegressor's trees onto the model columns.
+
+    feature_columns[i] describes the model's input feature i: the index of the
+    column it reads, or (columns, codes) for a categorical feature one-hot encoded
+    into those columns, codes[j] being the category code of columns[j] (NaN if it
+    has none). A categorical split becomes a chain of one-column tests for the
+    smaller side of the split, ending on the other side; chains share subtrees,
+    so the node table is a DAG and max_depth its longest path.
+    """
+    known_bitsets, bitset_row = model._bin_mapper.make_known_categories_bitsets()
+    inputs = _hist_inputs(model)
+    arrays = {name: [] for name in NODE_ARRAYS}
+    roots, depths = [], []
+
+    def add_node(feature, threshold, left, right, value=0.0):
+        arrays["feature"].append(feature)
+        arrays["threshold"].append(threshold)
+        arrays["children_left"].append(left)
+        arrays["children_right"].append(right)
+        arrays["value"].append(value)
+        return len(arrays["value"]) - 1
+
+    for (predictor,) in model._predictors:
+        nodes = predictor.nodes
+        offset = len(arrays["value"])
+        roots.append(offset)
+        # Reserve the tree's own nodes first so their children are offset + index.
+        for _ in range(len(nodes)):
+            add_node(0, np.inf, 0, 0)
+        for i, node in enumerate(nodes):
+            node_id = offset + i
+            if node["is_leaf"]:
+                arrays["children_left"][node_id] = node_id
+                arrays["children_right"][node_id] = node_id
+                arrays["value"][node_id] = float(node["value"])
+                continue
+            left, right = offset + int(node["left"]), offset + int(node["right"])
+            feature, categories = inputs[node["feature_idx"]]
+            target = feature_columns[feature]
+            if not node["is_categorical"]:
+                arrays["feature"][node_id] = target
+                arrays["threshold"][node_id] = float(node["num_threshold"])
+                arrays["children_left"][node_id] = left
+                arrays["children_right"][node_id] = right
+                continue
+
+            # Which side each one-hot column's category goes, as sklearn decides it.
+            columns, codes = target
+            if categories is not None:
+                # Raw codes as the ordinal encoder numbers them; unknown ones NaN.
+                position = np.searchsorted(categories, codes).clip(
+                    0, len(categories) - 1
+                )
+                codes = np.where(categories[position] == codes, position, np.nan)
+            goes_left = np.empty(len(columns), dtype=bool)
+            for j, code in enumerate(codes):
+                if np.isnan(code):
+                    goes_left[j] = node["missing_go_to_left"]
+                elif _in_bitset(
+                    predictor.raw_left_cat_bitsets, node["bitset_idx"], code
+                ):
+                    goes_left[j] = True
+                elif _in_bitset(known_bitsets, bitset_row[node["feature_idx"]], code):
+                    goes_left[j] = False
+                else:  # Unseen in training: treated as missing.
+                    goes_left[j] = node["missing_go_to_left"]
+            if goes_left.sum() <= (~goes_left).sum():
+                tested, hit, miss = columns[goes_left], left, right
+            else:
+                tested, hit, miss = columns[~goes_left], right, left
+            if len(tested) == 0:
+                arrays["children_left"][node_id] = miss
+                arrays["children_right"][node_id] = miss
+                continue
+            # A hot column (1.0 > 0.5) goes to hit; a row none of them match falls
+            # through the chain to miss. Built from the end, so each test knows
+            # the next one.
+            following = miss
+            for column in tested[:0:-1]:
+                following = add_node(int(column), 0.5, following, hit)
+            arrays["feature"][node_id] = int(tested[0])
+            arrays["threshold"][node_id] = 0.5
+            arrays["children_left"][node_id] = following
+            arrays["children_right"][node_id] = hit
+
+    flat = {
+        name: np.asarray(arrays[name], dtype=np.intp)
+        for name in ("children_left", "children_right", "feature")
+    }
+    flat["threshold"] = np.asarray(arrays["threshold"], dtype=np.float64)
+    flat["value"] = np.asarray(arrays["value"], dtype=np.float64)
+    flat["roots"] = np.asarray(roots, dtype=np.intp)
+
+    # Longest root-to-leaf path; children always come after their parent except
+    # the reserved nodes of a chain's subtrees, so walk the DAG with a memo.
+    depth = np.full(len(flat["value"]), -1, dtype=np.intp)
+    for root in roots:
+        stack = [root]
+        while stack:
+            node_id = stack[-1]
+            left, right = (
+                flat["children_left"][node_id],
+                flat["children_right"][node_id],
+            )
+            if left == node_id:
+                depth[node_id] = 0
+                stack.pop()
+                continue
+            pending = [child for child in (left, right) if depth[child] < 0]
+            if pending:
+                stack.extend(pending)
+                continue
+            depth[node_id] = 1 + max(depth[left], depth[right])
+            stack.pop()
+        depths.append(int(depth[root]))
+    return flat, max(depths, default=0)
+
+
+def _hist_boosting_fields(model):
+    if model.loss != "squared_error":
+        raise ValueError(
+            f"The tree engine cannot evaluate a HistGradientBoostingRegressor with "
+            f"the {model.loss} loss."
+        )
+    return {
+        "kind": "tree_ensemble",
+        "aggregation": "sum",
+        "base_score": float(np.ravel(model._baseline_prediction)[0]),
+        # Leaf values already include the learning rate.
+        "learning_rate": 1.0,
+    }
+
+
+def flatten_estimator(model):
+    """Returns (manifest fields, arrays) describing a supported sklearn regressor."""
+    name = type(model).__name__
+    if name in ("RandomForestRegressor", "ExtraTreesRegressor"):
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        fields = {"kind": "tree_ensemble", "aggregation": "mean", "base_score": 0.0}
+    elif name == "DecisionTreeRegressor":
+        trees = [model.tree_]
+        fields = {"kind": "tree_ensemble", "aggregation": "mean", "base_score": 0.0}
+    elif name == "GradientBoostingRegressor":
+        trees = [estimator.tree_ for estimator in model.estimators_[:, 0]]
+        if model.init_ == "zero":
+            base_score = 0.0
+        else:
+            base_score = float(np.ravel(model.init_.constant_)[0])
+        fields = {
+            "kind": "tree_ensemble",
+            "aggregation": "sum",
+            "base_score": base_score,
+            "learning_rate": float(model.learning_rate),
+        }
+    elif name in ("HistGradientBoostingRegressor", "CategoryCodeRegressor"):
+        if name == "CategoryCodeRegressor":
+            regressor = model.regressor
+            feature_columns = list(model.numeric_columns) + list(model.blocks)
+        else:
+            regressor = model
+            feature_columns = list(range(model.n_features_in_))
+        if type(regressor).__name__ != "HistGradientBoostingRegressor":
+            raise ValueError(
+                f"The tree engine cannot evaluate a {type(regressor).__name__}."
+            )
+        fields = _hist_boosting_fields(regressor)
+        arrays, max_depth = _flatten_hist_predictors(regressor, feature_columns)
+        fields["n_trees"] = len(arrays["roots"])
+        fields["n_nodes"] = int(len(arrays["value"]))
+        fields["max_depth"] = max_depth
+        return fields, arrays
+    elif hasattr(model, "coef_") and hasattr(model, "intercept_"):
+        fields = {"kind": "linear", "intercept": float(np.ravel(model.intercept_)[0])}
+        return fields, {"coef": np.ravel(model.coef_).astype(np.float64)}
+    else:
+        raise ValueError(f"The tree engine cannot evaluate a {name}.")
+
+    arrays = _flatten_trees(trees)
+    fields["n_trees"] = len(trees)
+    fields["n_nodes"] = int(len(arrays["value"]))
+    fields["max_depth"] = int(max(tree.max_depth for tree in trees))
+    return fields, arrays
+
+
+class TreeEnsembleModel:
+    """Evaluates a flattened tree ensemble for a whole batch of rows at once."""
+
+    def __init__(self, manifest, arrays):
+        self.manifest = manifest
+        self.columns = manifest["columns"]
+        self.aggregation = manifest["aggregation"]
+        self.base_score = manifest["base_score"]
+        self.learning_rate = manifest.get("learning_rate", 1.0)
+        self.max_depth = manifest["max_depth"]
+        for name in NODE_ARRAYS + ["roots"]:
+            setattr(self, name, arrays[name])
+
+    def predict(self, X):
+        # sklearn evaluates trees on float32 inputs; match it so splits agree exactly.
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        n_trees = len(self.roots)
+        flat_X = X.ravel()
+
+        # node[k] is where (row, tree) pair k currently is; row_offset[k] locates
+        # that row in flat_X so the split feature is a single gather.
+        node = np.tile(self.roots, n_rows)
+        row_offset = np.repeat(np.arange(n_rows) * n_features, n_trees)
+        pair = np.arange(n_rows * n_trees)
+        leaves = np.empty(n_rows * n_trees, dtype=np.intp)
+
+        depth = 0
+        while len(node):
+            for _ in range(COMPACT_EVERY):
+                go_left = (
+                    flat_X[row_offset + self.feature[node]] <= self.threshold[node]
+                )
+                node = np.where(
+                    go_left, self.children_left[node], self.children_right[node]
+                )
+            depth += COMPACT_EVERY
+
+            done = self.children_left[node] == node
+            if depth >= self.max_depth:
+                done[:] = True
+            leaves[pair[done]] = node[done]
+            walking = ~done
+            node, row_offset, pair = node[walking], row_offset[walking], pair[walking]
+
+        return self.combine(self.value[leaves].reshape(n_rows, n_trees).sum(axis=1))
+
+    def combine(self, total):
+        """The model's output for rows whose leaf values summed over trees to total."""
+        if self.aggregation == "mean":
+            return total / len(self.roots)
+        return self.base_score + self.learning_rate * total
+
+    def step_function(self, X, column):
+        """
+        The model's output for each row of X as a function of the column-th
+        feature, all other features fixed: a tree ensemble only changes its output
+        where a tree splits on that feature, so this is exact and costs one walk
+        down every branch a row can take, instead of one prediction per threshold.
+
+        Returns (rows, boundaries, values, below). For row r, below[r] is the
+        output while the feature is at or below its first boundary; each
+        (rows[i], boundaries[i], values[i]) entry, sorted by row and boundary, says
+        the output is values[i] once the feature is above boundaries[i] (compared
+        in float32, as predict does) and up to that row's next boundary.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        flat_X = X.ravel()
+        node = np.tile(self.roots, n_rows)
+        row = np.repeat(np.arange(n_rows), len(self.roots))
+        # Each (row, tree) branch holds for feature values in (low, high].
+        low = np.full(len(node), -np.inf)
+        high = np.full(len(node), np.inf)
+        leaf_rows, leaf_lows, leaf_highs, leaf_values = [], [], [], []
+        while len(node):
+            done = self.children_left[node] == node
+            leaf_rows.append(row[done])
+            leaf_lows.append(low[done])
+            leaf_highs.append(high[done])
+            leaf_values.append(self.value[node[done]])
+            walking = ~done
+            node, row, low, high = (
+                node[walking],
+                row[walking],
+                low[walking],
+                high[walking],
+            )
+
+            feature = self.feature[node]
+            threshold = self.threshold[node]
+            free = feature == column
+            go_left = flat_X[row * n_features + feature] <= threshold
+            # A split on the free feature sends the branch both ways when its
+            # threshold falls inside the branch's range.
+            left = np.where(free, low < threshold, go_left)
+            right = np.where(free, threshold < high, ~go_left)
+            node = np.concatenate(
+                [self.children_left[node[left]], self.children_right[node[right]]]
+            )
+            row = np.concatenate([row[left], row[right]])
+            low, high = (
+                np.concatenate(
+                    [low[left], np.where(free[right], threshold[right], low[right])]
+                ),
+                np.concatenate(
+                    [np.where(free[left], threshold[left], high[left]), high[right]]
+                ),
+            )
+
+        row = np.concatenate(leaf_rows)
+        low = np.concatenate(leaf_lows)
+        high = np.concatenate(leaf_highs)
+        value = np.concatenate(leaf_values)
+        # The summed leaf values change by +value where a branch starts and by
+        # -value where it ends.
+        below = np.bincount(row[low == -np.inf], value[low == -np.inf], n_rows)
+        starts, ends = low > -np.inf, high < np.inf
+        event_rows = np.concatenate([row[starts], row[ends]])
+        event_boundaries = np.concatenate([low[starts], high[ends]])
+        deltas = np.concatenate([value[starts], -value[ends]])
+        order = np.lexsort((event_boundaries, event_rows))
+        event_rows, event_boundaries = event_rows[order], event_boundaries[order]
+        running = np.cumsum(deltas[order])
+        # Restart the running sum at every row, then keep the last event of each
+        # (row, boundary).
+        first_of_row = np.searchsorted(event_rows, np.arange(n_rows))
+        before_row = np.concatenate([[0.0], running])[first_of_row]
+        running = running - before_row[event_rows]
+        last = np.append(
+            (event_rows[1:] != event_rows[:-1])
+            | (event_boundaries[1:] != event_boundaries[:-1]),
+            True,
+        )
+        rows = event_rows[last]
+        return (
+            rows,
+            event_boundaries[last],
+            self.combine(below[rows] + running[last]),
+            self.combine(below),
+        )
+
+
+class LinearModel:
+    """Evaluates the exported coefficients of a linear model."""
+
+    def __init__(self, manifest, arrays):
+        self.manifest = manifest
+        self.columns = manifest["columns"]
+        self.coef = arrays["coef"]
+        self.intercept = manifest["intercept"]
+
+    def predict(self, X):
+        return np.asarray(X, dtype=np.float64) @ self.coef + self.intercept
+
+
+def build_model(manifest, arrays):
+    """Creates the engine model described by a manifest and its node arrays."""
+    if manifest["kind"] == "tree_ensemble":
+        return TreeEnsembleModel(manifest, arrays)
+    return LinearModel(manifest, arrays)
+
+
+def compile_estimator(model, columns, target_transform="log1p"):
+    """Converts a fitted sklearn regressor into an in-memory engine model."""
+    fields, arrays = flatten_estimator(model)
+    manifest = {
+        "estimator": type(model).__name__,
+        **fields,
+        "target_transform": target_transform,
+        "columns": list(columns),
+    }
+    return build_model(manifest, arrays)